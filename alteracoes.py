@@ -0,0 +1,172 @@
+from collections import deque
+import datetime
+import threading
+import numpy as np
+import pandas as pd
+from base_dados import limpar_base, totais_grupo, COLS_TOTAIS
+from regras_saude import avaliar_regras
+from cache_versao import memorizar
+from taxonomia import taxonomia_vigente
+
+# ---------------------------------------------------------
+# CARGA INCREMENTAL E FEED DE ALTERAÇÕES
+# ---------------------------------------------------------
+# Cada linha vira um hash (chave = Projeto). Numa nova versão do arquivo só as
+# linhas novas ou com hash diferente são recalculadas; as demais são
+# reaproveitadas da versão anterior. Os totais por (ADM, Status) dos KPIs são
+# ajustados pela diferença das linhas alteradas. Mudança de colunas, Projeto
+# duplicado (nesta versão ou na anterior), coluna que mudou de tipo ou
+# taxonomia nova (muda o que é ADM) força a carga completa. Usada em dois lugares:
+#   - base_publicacao, no processo que publica o cache compartilhado: recebe a
+#     Sheet1 crua e só as linhas alteradas passam por limpar_base;
+#   - base_incremental / base_historico, nas páginas: recebem a base já limpa
+#     do cache compartilhado e só as linhas alteradas passam pelas regras
+#     (E_Critico); o diff também alimenta o feed da Gestão.
+MAX_FEED = 50
+
+def _hash_linhas(bruto):
+    return pd.util.hash_pandas_object(bruto, index=False).to_numpy()
+
+def _iguais(a, b):
+    if pd.isna(a) and pd.isna(b): return True
+    try: return bool(a == b)
+    except (TypeError, ValueError): return False
+
+class BaseIncremental:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.versao = None
+        self.sequencia = 0
+        self.colunas = None
+        self.tipos = None       # dtypes das colunas: coluna que muda de tipo muda o hash de todas as linhas
+        self.taxonomia = None   # chave da taxonomia usada nos totais (ADM x obras)
+        self.bruto = None       # linhas recebidas na versão atual (cruas ou limpas), índice = Projeto
+        self.hashes = None      # hash por Projeto
+        self.df = None          # base limpa (mesma ordem do arquivo)
+        self.totais = None
+        self.meta_regras = None
+        self.regras = None      # avaliar_regras por Projeto, com meta_regras
+        self.feed = deque(maxlen=MAX_FEED)
+
+    def atualizar(self, df, versao, limpar=None):
+        """Base limpa da versão, recalculando só as linhas alteradas. Com limpar (limpar_base), df é a
+        Sheet1 crua e só as linhas novas/alteradas passam pela limpeza; sem, df já chega limpo."""
+        with self.lock:
+            if versao != self.versao: self._aplicar(df, versao, limpar or (lambda linhas: linhas))
+            df = self.df.copy()
+        df.attrs["versao"] = versao
+        return df
+
+    def _aplicar(self, bruto, versao, limpar):
+        bruto.columns = bruto.columns.str.strip()
+        chaves = bruto['Projeto'].astype(str)
+        linhas = bruto.assign(Projeto=chaves)  # código numérico ou texto no Excel: o mesmo hash
+        hashes = pd.Series(_hash_linhas(linhas), index=chaves.to_numpy())
+        tipos, anteriores_tipos = list(linhas.dtypes), self.tipos
+        self.tipos = tipos
+        if (self.df is None or chaves.duplicated().any() or not self.hashes.index.is_unique or list(bruto.columns) != self.colunas
+                or tipos != anteriores_tipos or taxonomia_vigente().chave != self.taxonomia):
+            self._carga_completa(bruto, chaves, hashes, versao, limpar)
+            return
+
+        anteriores = self.hashes.reindex(chaves.to_numpy())
+        novo = anteriores.isna().to_numpy()
+        alterado = (anteriores.to_numpy() != hashes.to_numpy()) | novo
+        removidos = self.hashes.index.difference(chaves)
+        afetados = chaves[alterado].tolist() + removidos.tolist()
+        df_antigo = self.df.set_index('Projeto', drop=False)
+
+        # Linhas reaproveitadas + linhas recalculadas, de volta na ordem do arquivo.
+        reaproveitadas = df_antigo.loc[chaves[~alterado]]
+        if alterado.any():
+            novas = limpar(bruto[alterado].copy())
+            df = pd.concat([reaproveitadas, novas.set_index(novas['Projeto'].to_numpy())])
+            posicoes = np.concatenate([np.flatnonzero(~alterado), np.flatnonzero(alterado)])
+            df = df.iloc[np.argsort(posicoes, kind='stable')]
+        else:
+            novas = self.df.iloc[0:0]
+            df = reaproveitadas
+
+        antigas_afetadas = df_antigo.loc[df_antigo.index.intersection(afetados)]
+        self.totais = (self.totais.sub(totais_grupo(antigas_afetadas), fill_value=0)
+                                  .add(totais_grupo(novas), fill_value=0))
+        self.totais = self.totais[self.totais['Qtd'] > 0]
+        if self.meta_regras is not None:
+            regras_novas = avaliar_regras(novas, meta_margem=self.meta_regras).set_index(novas['Projeto'].to_numpy())
+            self.regras = pd.concat([self.regras.drop(index=afetados, errors='ignore'), regras_novas])
+
+        self._registrar(bruto, chaves, alterado, novo, removidos, antigas_afetadas, novas, versao)
+        self.df = df.reset_index(drop=True)
+        self.bruto = bruto.set_index(chaves.to_numpy())
+        self.hashes = hashes
+        self.versao = versao
+
+    def _carga_completa(self, bruto, chaves, hashes, versao, limpar):
+        primeira = self.df is None
+        self.df = limpar(bruto.copy())
+        self.totais = totais_grupo(self.df)
+        if self.meta_regras is not None:
+            self.regras = avaliar_regras(self.df, meta_margem=self.meta_regras).set_index(self.df['Projeto'].to_numpy())
+        self.colunas = list(bruto.columns)
+        self.taxonomia = taxonomia_vigente().chave
+        self.bruto = bruto.set_index(chaves.to_numpy())
+        self.hashes = hashes
+        self.versao = versao
+        if not primeira:
+            self.sequencia += 1
+            self.feed.appendleft({"sequencia": self.sequencia, "quando": datetime.datetime.now(), "versao": versao,
+                                  "completa": True, "novos": [], "removidos": [], "alterados": [], "delta": {}})
+
+    def _registrar(self, bruto, chaves, alterado, novo, removidos, antigas, novas, versao):
+        if not alterado.any() and removidos.empty: return
+        editado = alterado & ~novo
+        alterados = []
+        for projeto, linha_nova in zip(chaves[editado], bruto[editado].itertuples(index=False)):
+            linha_antiga = self.bruto.loc[projeto]
+            campos = [(col, linha_antiga[col], novo_valor) for col, novo_valor in zip(bruto.columns, linha_nova) if not _iguais(linha_antiga[col], novo_valor)]
+            alterados.append({"Projeto": projeto, "campos": campos})
+        self.sequencia += 1
+        self.feed.appendleft({
+            "sequencia": self.sequencia, "quando": datetime.datetime.now(), "versao": versao, "completa": False,
+            "novos": chaves[novo].tolist(),
+            "removidos": removidos.tolist(), "alterados": alterados,
+            "delta": {col: float(novas[col].sum() - antigas[col].sum()) for col in COLS_TOTAIS},
+        })
+
+    # --- consultas (alinhadas ao df devolvido por atualizar) ---
+    def totais_de(self, df):
+        with self.lock:
+            if df.attrs.get("versao") == self.versao and len(df) == len(self.df) and self.totais is not None: return self.totais
+        return memorizar(df, "totais_grupo", lambda: totais_grupo(df))  # recorte (escopo do usuário)
+
+    def regras_de(self, df, meta_margem):
+        with self.lock:
+            if df.attrs.get("versao") == self.versao:
+                if self.meta_regras != meta_margem:
+                    self.meta_regras = meta_margem
+                    self.regras = avaliar_regras(self.df, meta_margem=meta_margem).set_index(self.df['Projeto'].to_numpy())
+                regras = self.regras
+            else: regras = None
+        if regras is None or not regras.index.is_unique: return avaliar_regras(df, meta_margem=meta_margem)
+        return regras.reindex(df['Projeto'].astype(str).to_numpy()).set_axis(df.index)
+
+    def alteracoes_desde(self, sequencia):
+        with self.lock: return [e for e in self.feed if e["sequencia"] > sequencia]
+
+base_incremental = BaseIncremental()  # obras ativas (feed da Gestão)
+base_historico = BaseIncremental()    # ativas + arquivo (particao.py), para quem precisa do histórico
+base_publicacao = BaseIncremental()   # Sheet1 crua -> limpa, no processo eleito para publicar
+
+def limpar_incremental(bruto, versao):
+    """limpar_base só nas linhas novas/alteradas desde a última versão publicada por este processo
+    (para carregar_planilha). Processo recém-eleito faz uma carga completa."""
+    return base_publicacao.atualizar(bruto, versao, limpar_base)
+
+def ler_base_compartilhada(base):
+    destino = base_historico if base.get("historico") else base_incremental
+    return destino.atualizar(base["dados"], base["versao"])
+
+def regras_de(df, meta_margem):
+    """avaliar_regras alinhado ao df, pela base incremental de onde ele veio."""
+    origem = base_historico if df.attrs.get("versao") == base_historico.versao else base_incremental
+    return origem.regras_de(df, meta_margem)
@@ -0,0 +1,181 @@
+"""API HTTP somente leitura com os números do dashboard (JSON ou Arrow).
+
+Uso:
+    python api_kpis.py --porta 8502 --secrets .streamlit/secrets.toml
+
+Rotas (GET):
+    /v1/versao                    versão dos dados (md5 do arquivo no Drive)
+    /v1/carteira/kpis             cards da Gestão da Carteira
+    /v1/projetos                  métricas do Painel de Obra de todos os projetos
+    /v1/projetos/<projeto>        métricas de um projeto
+    /v1/insights/<agregado>       ranking_planta | ranking_cliente | ranking_cidade | segmentos | custos_internos
+
+Formato: ?formato=json (padrão) ou ?formato=arrow (também via Accept:
+application/vnd.apache.arrow.stream). Toda resposta leva um ETag ligado à
+versão dos dados; um If-None-Match igual devolve 304 sem corpo.
+
+A API enxerga a carteira inteira (não aplica o escopo por usuário das
+páginas): por padrão só escuta em 127.0.0.1 e qualquer outro --host exige
+[api] token no secrets.toml (Authorization: Bearer <token>).
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, unquote
+import argparse
+import hashlib
+import io
+import ipaddress
+import json
+import threading
+import time
+import tomllib
+import pandas as pd
+from cache_compartilhado import obter_planilha
+from base_dados import kpis_carteira, metricas_projetos, agregados_insights
+
+TTL_S = 30
+MAX_RESPOSTAS = 256  # corpos prontos por versão (LRU); rotas inexistentes não entram
+MIME_ARROW = "application/vnd.apache.arrow.stream"
+MIME_JSON = "application/json; charset=utf-8"
+
+# ---------------------------------------------------------
+# CACHE DA BASE (uma cópia por processo, recarrega só se a versão mudar)
+# ---------------------------------------------------------
+class CacheBase:
+    def __init__(self, creds_info):
+        self.creds_info = creds_info
+        self.lock = threading.Lock()
+        self.base = None
+        self.verificado_em = 0.0
+        self.respostas = {}
+
+    def obter(self):
+        with self.lock:
+            if self.base is None or time.monotonic() - self.verificado_em > TTL_S:
+                self._atualizar()
+            return self.base
+
+    def _atualizar(self):
+        # Mesmo cache compartilhado das páginas: a API não soma chamadas ao Drive.
+        base = obter_planilha(self.creds_info, historico=True)
+        if base is None: raise LookupError("Arquivo .xlsx não encontrado")
+        if self.base is None or base["versao"] != self.base["versao"]:
+            self.base = base
+            self.respostas = {}
+        self.verificado_em = time.monotonic()
+
+    def resposta(self, chave, gerar):
+        """Memoriza o corpo já serializado por (versão, rota, formato); None (404) não é memorizado."""
+        base = self.obter()
+        chave = (base["versao"],) + chave
+        with self.lock:
+            corpo = self.respostas.pop(chave, None)
+            if corpo is not None: self.respostas[chave] = corpo  # volta para o fim: mais recente
+        if corpo is None:
+            corpo = gerar(base)
+            if corpo is None: return base["versao"], None
+            with self.lock:
+                if len(self.respostas) >= MAX_RESPOSTAS: self.respostas.pop(next(iter(self.respostas)))
+                self.respostas[chave] = corpo
+        return base["versao"], corpo
+
+# ---------------------------------------------------------
+# SERIALIZAÇÃO
+# ---------------------------------------------------------
+def para_json(obj):
+    if isinstance(obj, pd.DataFrame): return obj.to_json(orient="records", force_ascii=False).encode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, default=lambda o: o.item() if hasattr(o, "item") else str(o)).encode("utf-8")
+
+def para_arrow(obj):
+    import pyarrow as pa
+    df = obj if isinstance(obj, pd.DataFrame) else pd.DataFrame([obj])
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    saida = io.BytesIO()
+    with pa.ipc.new_stream(saida, tabela.schema) as writer: writer.write_table(tabela)
+    return saida.getvalue()
+
+def consultar(rota, base):
+    """Rota -> DataFrame ou dict; None se não existir."""
+    partes = [unquote(p) for p in rota.strip("/").split("/")]
+    df, metas = base["dados"], base["metas"]
+    if partes == ["v1", "versao"]: return {"versao": base["publicada"]}
+    if partes == ["v1", "carteira", "kpis"]: return kpis_carteira(df, metas)
+    if partes == ["v1", "projetos"]: return metricas_projetos(df, metas)
+    if len(partes) == 3 and partes[:2] == ["v1", "projetos"]:
+        m = metricas_projetos(df[df['Projeto'] == partes[2]], metas)
+        return m.iloc[0].to_dict() if not m.empty else None
+    if len(partes) == 3 and partes[:2] == ["v1", "insights"]:
+        return agregados_insights(df).get(partes[2])
+    return None
+
+# ---------------------------------------------------------
+# SERVIDOR
+# ---------------------------------------------------------
+class Handler(BaseHTTPRequestHandler):
+    cache = None
+    token = None
+
+    def _enviar(self, codigo, corpo=b"", tipo=MIME_JSON, etag=None):
+        self.send_response(codigo)
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        if codigo != 304:
+            self.send_header("Content-Type", tipo)
+            self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        if codigo != 304: self.wfile.write(corpo)
+
+    def _erro(self, codigo, mensagem):
+        self._enviar(codigo, json.dumps({"erro": mensagem}, ensure_ascii=False).encode("utf-8"))
+
+    def do_GET(self):
+        if self.token and self.headers.get("Authorization") != f"Bearer {self.token}":
+            return self._erro(401, "não autorizado")
+        url = urlparse(self.path)
+        formato = parse_qs(url.query).get("formato", [""])[0]
+        if not formato: formato = "arrow" if MIME_ARROW in self.headers.get("Accept", "") else "json"
+        if formato not in ("json", "arrow"): return self._erro(400, "formato deve ser json ou arrow")
+        serializar = para_arrow if formato == "arrow" else para_json
+
+        def gerar(base):
+            obj = consultar(url.path, base)
+            return None if obj is None else serializar(obj)
+
+        try:
+            # 304 sai antes de qualquer cálculo: só depende da versão, rota e formato.
+            versao = self.cache.obter()["versao"]
+            etag = '"' + hashlib.sha1(f"{versao}|{url.path}|{formato}".encode()).hexdigest()[:20] + '"'
+            if etag in [t.strip() for t in self.headers.get("If-None-Match", "").split(",")]:
+                return self._enviar(304, etag=etag)
+            versao, corpo = self.cache.resposta((url.path, formato), gerar)
+        except Exception as e:
+            return self._erro(503, f"dados indisponíveis: {e}")
+        if corpo is None: return self._erro(404, "rota ou projeto não encontrado")
+        etag = '"' + hashlib.sha1(f"{versao}|{url.path}|{formato}".encode()).hexdigest()[:20] + '"'
+        self._enviar(200, corpo, MIME_ARROW if formato == "arrow" else MIME_JSON, etag)
+
+    def log_message(self, fmt, *args): pass
+
+def _local(host):
+    if host == "localhost": return True
+    try: return ipaddress.ip_address(host).is_loopback
+    except ValueError: return False
+
+def main():
+    parser = argparse.ArgumentParser(description="API de KPIs do Dashboard Obras")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8502)
+    parser.add_argument("--secrets", default=".streamlit/secrets.toml")
+    args = parser.parse_args()
+
+    with open(args.secrets, "rb") as f: secrets = tomllib.load(f)
+    Handler.cache = CacheBase(dict(secrets["gcp_service_account"]))
+    Handler.token = secrets.get("api", {}).get("token")
+    if not Handler.token and not _local(args.host):
+        parser.error(f"--host {args.host} expõe a carteira inteira na rede: defina [api] token no secrets.toml")
+    servidor = ThreadingHTTPServer((args.host, args.porta), Handler)
+    print(f"API de KPIs em http://{args.host}:{args.porta}/v1/")
+    servidor.serve_forever()
+
+if __name__ == "__main__":
+    main()
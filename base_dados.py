@@ -0,0 +1,271 @@
+import pandas as pd
+import numpy as np
+from conexao_google import cliente_drive, md5_arquivo
+from regras_saude import calcular_indicadores, avaliar_regras
+from valor_agregado import valor_agregado
+from cache_versao import memorizar
+from taxonomia import ler_taxonomia, definir_taxonomia, classes_projetos, taxonomia_vigente, CLASSE_ADM
+
+# ---------------------------------------------------------
+# CARGA E LIMPEZA DA PLANILHA (compartilhado pelas páginas, API e CLI)
+# ---------------------------------------------------------
+STATUS_VENDA = ['Não iniciado', 'Em andamento', 'Finalizado', 'Apresentado']
+STATUS_CONCLUIDO = ['Finalizado', 'Apresentado']
+STATUS_ABERTO = ['Em andamento', 'Não iniciado']
+
+COLS_NUMERICAS = ['Vendido', 'Faturado', 'Mat_Real', 'Desp_Real', 'HH_Real_Vlr', 'Impostos', 'Mat_Orc', 'Desp_Orc', 'HH_Orc_Vlr', 'Conclusao_%']
+COLS_HORAS = ['HH_Orc_Qtd', 'HH_Real_Qtd']
+
+def clean_google_number(x):
+    if isinstance(x, (int, float)): return float(x)
+    if x is None: return 0.0
+    s = str(x).strip()
+    if s == "": return 0.0
+    try:
+        s = s.replace('R$', '').replace('%', '').replace(' ', '').replace('.', '').replace(',', '.')
+        return float(s)
+    except: return 0.0
+
+def clean_excel_time(x):
+    try:
+        if isinstance(x, (int, float)): return float(x) * 24.0
+        s = str(x).strip()
+        if s == "" or s.lower() in ["nan", "nat"]: return 0.0
+        if ":" in s:
+            if "day" in s: return pd.to_timedelta(s).total_seconds() / 3600.0
+            parts = s.split(":")
+            return float(parts[0]) + (float(parts[1])/60.0) + (float(parts[2])/3600.0)
+        return float(s.replace(',', '.')) * 24.0
+    except: return 0.0
+
+def fix_percentage_scale(x): return x * 100 if 0 < x <= 1.5 else x
+
+def parse_valor(val):
+    if isinstance(val, (int, float)): return float(val)
+    s = str(val).replace('R$', '').replace('%', '').strip()
+    s = s.replace('.', '').replace(',', '.')  # Formato BR para US
+    try: return float(s)
+    except: return 0.0
+
+def limpar_base(df):
+    """Sheet1 crua -> colunas numéricas, horas em h, % em 0-100 e indicadores derivados."""
+    df.columns = df.columns.str.strip()
+    df['Projeto'] = df['Projeto'].astype(str)
+    for col in COLS_NUMERICAS:
+        if col in df.columns: df[col] = df[col].apply(clean_google_number)
+        else: df[col] = 0.0
+    for col in COLS_HORAS:
+        if col in df.columns: df[col] = df[col].astype(str).apply(clean_excel_time)
+        else: df[col] = 0.0
+    df['Conclusao_%'] = df['Conclusao_%'].apply(fix_percentage_scale)
+    if 'Tipo' not in df.columns: df['Tipo'] = "Não Classificado"
+    else: df['Tipo'] = df['Tipo'].replace("", "Não Classificado")
+    calcular_indicadores(df)
+    df['Lucro'] = df['Vendido'] - df['Custo_Total']
+    return df
+
+def ler_base(planilha, versao, limpar=None):
+    """Sheet1 limpa; planilha = pd.ExcelFile já aberto (o arquivo é lido uma vez para as três abas).
+    limpar(bruto, versao) troca a limpeza completa (ex.: alteracoes.limpar_incremental)."""
+    bruto = planilha.parse(0)
+    df = limpar_base(bruto) if limpar is None else limpar(bruto, versao)
+    # Versão = md5 do arquivo (igual ao md5Checksum do Drive); chave dos caches derivados.
+    df.attrs["versao"] = versao
+    return df
+
+def ler_metas(planilha):
+    """Sheet2: primeira linha de dados, na ordem Vendas | Margem | Adm."""
+    zeros = {"meta_vendas": 0.0, "meta_margem": 0.0, "meta_custo_adm": 0.0}
+    df_conf = planilha.parse('Sheet2')
+    if df_conf.empty: return zeros
+    row = df_conf.iloc[0]
+    return {
+        "meta_vendas": parse_valor(row.iloc[0]),
+        "meta_margem": parse_valor(row.iloc[1]),
+        "meta_custo_adm": parse_valor(row.iloc[2])
+    }
+
+def metas_percentuais(config):
+    """Metas da Sheet2 com margem/adm sempre em % (aceita 0.25 do Excel ou 25)."""
+    meta_margem = float(config["meta_margem"])
+    if meta_margem <= 1.0: meta_margem *= 100
+    meta_adm = float(config["meta_custo_adm"])
+    if meta_adm <= 1.0: meta_adm *= 100
+    return {
+        "META_VENDAS": float(config["meta_vendas"]),
+        "META_MARGEM_BRUTA": meta_margem,
+        "META_CUSTO_ADM": meta_adm,
+        "META_MARGEM_LIQUIDA": meta_margem - meta_adm,
+    }
+
+def carregar_planilha(creds_info, limpar=None):
+    """Baixa o arquivo uma vez e devolve base limpa, metas, taxonomia e a versão (md5 do Drive).
+    limpar: ver ler_base."""
+    drive = cliente_drive(creds_info)
+    arquivo = drive.localizar_arquivo(campos="id, name, md5Checksum, modifiedTime")
+    if arquivo is None: return None
+    with drive.baixar(arquivo['id'], arquivo.get('md5Checksum')) as file_io, pd.ExcelFile(file_io) as planilha:
+        # Taxonomia antes da base: a limpeza incremental separa ADM x obras nos totais.
+        taxonomia = ler_taxonomia(planilha)
+        definir_taxonomia(taxonomia)
+        df = ler_base(planilha, md5_arquivo(file_io), limpar)
+        metas = ler_metas(planilha)
+    return {"dados": df, "metas": metas, "taxonomia": taxonomia, "versao": arquivo.get('md5Checksum') or arquivo.get('modifiedTime', '')}
+
+# ---------------------------------------------------------
+# CÁLCULOS DA CARTEIRA
+# ---------------------------------------------------------
+def mascara_adm(df): return classes_projetos(df) == CLASSE_ADM
+
+def _calcular_mascaras(df):
+    adm = mascara_adm(df).to_numpy(dtype=bool)
+    status = df['Status']
+    return {"adm": adm, "obras": ~adm, "concluidas": ~adm & status.isin(STATUS_CONCLUIDO).to_numpy(),
+            "abertas": ~adm & status.isin(STATUS_ABERTO).to_numpy()}
+
+def mascaras_carteira(df):
+    """Máscaras booleanas (numpy) dos recortes usados pelas páginas, uma vez por versão dos dados.
+    As páginas trabalham sobre o df inteiro com elas, sem copiar subconjuntos a cada rerun."""
+    return memorizar(df, "mascaras_carteira", lambda: _calcular_mascaras(df), taxonomia_vigente().chave)
+
+def somar(df, col, mascara):
+    """Soma de uma coluna numérica só nas linhas da máscara (sem materializar o recorte)."""
+    return float(np.add.reduce(df[col].to_numpy(dtype=float, na_value=0.0), where=mascara))
+
+def _margem(venda, custo): return ((venda - custo) / venda * 100) if venda > 0 else 0.0
+
+COLS_TOTAIS = ['Vendido', 'Faturado', 'Custo_Total', 'Mat_Real', 'Desp_Real', 'HH_Real_Vlr']
+
+def totais_grupo(df):
+    """Somas por (ADM, Status): tudo o que os KPIs da carteira precisam."""
+    chaves = [mascara_adm(df).rename('ADM'), df['Status']]
+    return df[COLS_TOTAIS].assign(Qtd=1).groupby(chaves, dropna=False).sum()
+
+def kpis_de_totais(totais, metas):
+    """Números dos cards da Gestão da Carteira a partir de totais_grupo."""
+    m = metas_percentuais(metas)
+    adm = totais.index.get_level_values('ADM').to_numpy(dtype=bool)
+    status = totais.index.get_level_values('Status')
+    df_adm, df_obras = totais[adm], totais[~adm]
+    status_obras = status[~adm]
+    custo_adm_total = float(df_adm[['Mat_Real', 'Desp_Real', 'HH_Real_Vlr']].to_numpy().sum())
+
+    valor_vendido_total = float(df_obras.loc[status_obras.isin(STATUS_VENDA), 'Vendido'].sum())
+    concluido = status_obras.isin(STATUS_CONCLUIDO)
+    valor_concluido = float(df_obras.loc[concluido, 'Vendido'].sum())
+    valor_faturado_total = float(df_obras['Faturado'].sum())
+    custo_obras_total = float(df_obras['Custo_Total'].sum())
+
+    lucro_liquido_final = valor_vendido_total - custo_obras_total - custo_adm_total
+    return {
+        "valor_vendido_total": valor_vendido_total,
+        "valor_faturado_total": valor_faturado_total,
+        "valor_concluido": valor_concluido,
+        "custo_adm_total": custo_adm_total,
+        "overhead_pct": (custo_adm_total / valor_vendido_total * 100) if valor_vendido_total > 0 else 0.0,
+        "mg_geral": _margem(float(df_obras['Vendido'].sum()), custo_obras_total),
+        "mg_concluida": _margem(valor_concluido, float(df_obras.loc[concluido, 'Custo_Total'].sum())),
+        "mg_liquida_pos_adm": (lucro_liquido_final / valor_vendido_total * 100) if valor_vendido_total > 0 else 0.0,
+        "pct_meta_venda": (valor_vendido_total / m["META_VENDAS"] * 100) if m["META_VENDAS"] > 0 else 0.0,
+        "qtd_aberto": int(df_obras.loc[status_obras.isin(STATUS_ABERTO), 'Qtd'].sum()),
+        "qtd_total": int(df_obras['Qtd'].sum()),
+        **m,
+    }
+
+CATEGORIAS_CUSTO = {'Mat_Real': 'Materiais', 'Desp_Real': 'Despesas', 'HH_Real_Vlr': 'Mão de obra'}
+
+def simular_totais(totais, fatores, status, incluir_adm=False):
+    """totais_grupo com os custos das categorias multiplicados (fatores = {coluna: 1.08, ...})
+    nos grupos dos status escolhidos (e nos custos internos, se incluir_adm). Só mexe nas poucas
+    linhas de (ADM, Status): cabe num arraste de slider."""
+    adm = totais.index.get_level_values('ADM').to_numpy(dtype=bool)
+    alvo = ~adm & totais.index.get_level_values('Status').isin(status)
+    if incluir_adm: alvo |= adm
+    simulado = totais.copy()
+    for col, fator in fatores.items():
+        delta = np.where(alvo, simulado[col].to_numpy() * (fator - 1), 0.0)
+        simulado[col] += delta
+        simulado['Custo_Total'] += delta
+    return simulado
+
+def kpis_carteira(df, metas):
+    return kpis_de_totais(totais_grupo(df), metas)
+
+COLS_METRICAS = ['Projeto', 'Descricao', 'Cliente', 'Cidade', 'Status', 'Vendido', 'Faturado', 'Custo_Total', 'Lucro', 'Margem_%',
+                 'Conclusao_%', 'HH_Orc_Qtd', 'HH_Real_Qtd', 'HH_Progresso', 'Mat_Orc', 'Mat_Real', 'Desp_Orc', 'Desp_Real', 'HH_Orc_Vlr', 'HH_Real_Vlr', 'Impostos']
+
+def metricas_projetos(df, metas):
+    """Métricas do Painel de Obra para todos os projetos (uma linha por projeto)."""
+    m = metas_percentuais(metas)
+    cols = [c for c in COLS_METRICAS if c in df.columns]
+    saida = df[cols].join(avaliar_regras(df, meta_margem=m["META_MARGEM_BRUTA"])).join(valor_agregado(df))
+    return saida.reset_index(drop=True)
+
+COLS_TABELA = ['Projeto', 'Classe', 'Descricao', 'Cliente', 'Cidade', 'Status', 'Vendido', 'Faturado', 'Custo_Total', 'Lucro', 'Margem_%',
+               'Conclusao_%', 'HH_Progresso', 'Mat_%', 'CPI', 'IP_HH', 'EAC', 'VAC', 'E_Critico']
+
+def _calcular_tabela(df, meta_margem):
+    mat_orc = df['Mat_Orc'].to_numpy(dtype=float)
+    mat_pct = np.divide(df['Mat_Real'].to_numpy(dtype=float) * 100, mat_orc, out=np.zeros_like(mat_orc), where=mat_orc > 0)
+    tabela = df.assign(**{'Classe': classes_projetos(df), 'Mat_%': mat_pct}).join(valor_agregado(df)[['CPI', 'IP_HH', 'EAC', 'VAC']])
+    tabela['E_Critico'] = avaliar_regras(df, meta_margem=meta_margem)['E_Critico']
+    return tabela[[c for c in COLS_TABELA if c in tabela.columns]]
+
+def tabela_carteira(df, meta_margem):
+    """Todas as colunas numéricas e derivadas da visão em tabela (índice do df), uma vez por versão dos dados.
+    Filtro, ordenação e paginação são feitos pela página sobre posições desta tabela."""
+    return memorizar(df, "tabela_carteira", lambda: _calcular_tabela(df, meta_margem), float(meta_margem), taxonomia_vigente().chave)
+
+def _somas_por_grupo(df, coluna, cols, mascara=None, chaves=None):
+    """Somas de cols (e Qtd) por grupo, só nas linhas da máscara; chaves substitui df[coluna]."""
+    chaves = df[coluna].to_numpy() if chaves is None else np.asarray(chaves)
+    linhas = slice(None) if mascara is None else np.flatnonzero(mascara)
+    codigos, grupos = pd.factorize(chaves[linhas], sort=True)
+    validos = codigos >= 0
+    codigos = codigos[validos]
+    somas = {col: np.bincount(codigos, weights=df[col].to_numpy(dtype=float)[linhas][validos], minlength=len(grupos)) for col in cols}
+    return pd.DataFrame({coluna: grupos, **somas, 'Qtd': np.bincount(codigos, minlength=len(grupos))})
+
+def agrupar_ranking(df, coluna, mascara=None, chaves=None):
+    df_grp = _somas_por_grupo(df, coluna, ['Vendido', 'Lucro'], mascara, chaves).drop(columns='Qtd')
+    df_grp['Margem_%'] = (df_grp['Lucro'] / df_grp['Vendido'] * 100).fillna(0)
+    return df_grp
+
+def agrupar_segmentos(df, mascara=None):
+    df_tipo = _somas_por_grupo(df, 'Tipo', ['Vendido', 'Lucro'], mascara).rename(columns={'Qtd': 'Projeto'})
+    df_tipo['Margem_Media'] = (df_tipo['Lucro'] / df_tipo['Vendido'] * 100).fillna(0)
+    return df_tipo
+
+def ranking_top_n(df_grp, coluna, n=10, inicio=0):
+    """Fatia [inicio, inicio+n) do ranking por Vendido + uma barra 'Outros' com o restante abaixo dela."""
+    ordenado = df_grp.sort_values('Vendido', ascending=False, kind='stable')
+    fatia = ordenado.iloc[inicio:inicio + n]
+    resto = ordenado.iloc[inicio + n:]
+    if not resto.empty:
+        vendido, lucro = float(resto['Vendido'].sum()), float(resto['Lucro'].sum())
+        outros = pd.DataFrame({coluna: [f"Outros ({len(resto)})"], 'Vendido': [vendido], 'Lucro': [lucro],
+                               'Margem_%': [(lucro / vendido * 100) if vendido else 0.0]})
+        fatia = pd.concat([fatia, outros], ignore_index=True)
+    return fatia
+
+def coluna_cliente_local(df):
+    cidade = df['Cidade'].fillna("").astype(str).str.strip()
+    return np.where(cidade != "", df['Cliente'].astype(str) + " (" + cidade + ")", df['Cliente'])
+
+def cliente_local(df):
+    """coluna_cliente_local memorizada por versão dos dados."""
+    return memorizar(df, "cliente_local", lambda: coluna_cliente_local(df))
+
+def agregados_insights(df):
+    """Agregados da página Dados & Insights (rankings, segmentos e custos internos)."""
+    m = mascaras_carteira(df)
+    fin = m["concluidas"]
+    consumo = pd.DataFrame({'Categoria': ['Pessoal', 'Despesas', 'Materiais'],
+                            'Valor': [somar(df, col, m["adm"]) for col in ('HH_Real_Vlr', 'Desp_Real', 'Mat_Real')]})
+    return {
+        "ranking_planta": agrupar_ranking(df, 'Cliente_Local', fin, chaves=cliente_local(df)),
+        "ranking_cliente": agrupar_ranking(df, 'Cliente', fin),
+        "ranking_cidade": agrupar_ranking(df, 'Cidade', fin),
+        "segmentos": agrupar_segmentos(df, fin),
+        "custos_internos": consumo,
+    }
@@ -0,0 +1,279 @@
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import pandas as pd
+from conexao_google import cliente_drive
+from base_dados import carregar_planilha
+from alteracoes import limpar_incremental
+from taxonomia import definir_taxonomia, PADRAO
+from particao import particionar, agregados_arquivo
+log = logging.getLogger(__name__)
+
+try: import fcntl
+except ImportError: fcntl = None  # Windows: cada processo atualiza por conta própria
+
+# ---------------------------------------------------------
+# CACHE COMPARTILHADO ENTRE PROCESSOS (MESMA MÁQUINA)
+# ---------------------------------------------------------
+# Várias réplicas do Streamlit (e a API) leem a mesma base publicada em Arrow
+# IPC num diretório em memória (/dev/shm). Só um processo por vez, eleito por
+# flock, fala com o Drive: confere o md5Checksum do arquivo a cada TTL_S e só
+# baixa/processa quando a versão muda. Os demais leem o selo (versao.json,
+# poucos bytes) e só abrem o .arrow (memory-map) quando a versão mudou.
+# Enquanto alguém atualiza, quem já tem uma versão segue com ela.
+#
+# O intervalo entre conferências é adaptativo e fica gravado no selo:
+#   arquivo mudou                  -> INTERVALO_MIN_S (alguém está editando)
+#   sem mudança, sessões ativas    -> cresce x1,5 até INTERVALO_ATIVO_S
+#   sem mudança, nenhuma sessão    -> cresce x2 até INTERVALO_MAX_S
+# Uma sessão que aparece com o intervalo longo volta a usar no máximo
+# INTERVALO_ATIVO_S. Sessões ativas = arquivos em sessoes/ tocados pelo
+# main.py nos últimos JANELA_SESSAO_S. As chamadas ao Drive da última hora
+# também ficam no selo: o intervalo nunca é menor que o que a cota permite
+# e, com a cota esgotada, segue-se com a versão publicada. Conferência que
+# falha (Drive fora do ar, arquivo não encontrado) também grava o selo: as
+# chamadas contam na cota e o intervalo dobra, senão cada rerun de cada
+# sessão voltaria a chamar o Drive.
+#
+# A base é publicada em duas partes (particao.py): base.arrow com as obras
+# ativas e os agregados do arquivo nos metadados, e arquivo_<versao>.arrow com
+# as concluídas antigas, que só é aberto com historico=True.
+#
+# O que se publica já é a base limpa: a partição e os agregados do arquivo
+# dependem de Status, Data_Conclusao e valores limpos, e células cruas de
+# tipos misturados não passam pelo Arrow sem mudar a leitura (o número 1234.5
+# viraria o texto "1234.5", que clean_google_number lê como 12345). A limpeza
+# no processo eleito é incremental (alteracoes.limpar_incremental): só as
+# linhas novas ou alteradas desde a última publicação passam por limpar_base.
+INTERVALO_MIN_S = 15
+INTERVALO_INICIAL_S = 30
+INTERVALO_ATIVO_S = 60
+INTERVALO_MAX_S = 600
+JANELA_SESSAO_S = 300
+COTA_DRIVE_HORA = int(os.environ.get("DASHBOARD_COTA_DRIVE_HORA", 360))
+CUSTO_DOWNLOAD = 2   # localizar + get_media (blocos extras não contam)
+TTL_LOCAL_S = 5      # st.cache_data das páginas: só relê o selo
+NOME_BASE = "base.arrow"
+NOME_SELO = "versao.json"
+NOME_TRAVA = "atualizacao.lock"
+NOME_SESSOES = "sessoes"
+PREFIXO_ARQUIVO = "arquivo_"
+
+def diretorio_cache(creds_info):
+    raiz = os.environ.get("DASHBOARD_CACHE_DIR") or ("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir())
+    conta = hashlib.md5(str(creds_info.get("client_email", "")).encode()).hexdigest()[:12]
+    caminho = os.path.join(raiz, f"dashboard_obras_{conta}")
+    os.makedirs(caminho, exist_ok=True)
+    return caminho
+
+def _gravar_atomico(caminho, escrever):
+    temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temporario, "wb") as f: escrever(f)
+        os.replace(temporario, caminho)
+    finally:
+        with contextlib.suppress(FileNotFoundError): os.remove(temporario)
+
+def ler_selo(diretorio):
+    try:
+        with open(os.path.join(diretorio, NOME_SELO), "rb") as f: return json.load(f)
+    except (OSError, ValueError): return None
+
+def _gravar_selo(diretorio, selo):
+    _gravar_atomico(os.path.join(diretorio, NOME_SELO), lambda f: f.write(json.dumps(selo).encode()))
+
+# --- sessões ativas e controle do intervalo ---
+_ultimo_registro = {}
+
+def registrar_sessao(creds_info, sessao_id):
+    """Marca a sessão como ativa (no máximo a cada 10s por sessão)."""
+    agora = time.monotonic()
+    if agora - _ultimo_registro.get(sessao_id, -10.0) < 10: return
+    if len(_ultimo_registro) > 1000: _ultimo_registro.clear()
+    _ultimo_registro[sessao_id] = agora
+    pasta = os.path.join(diretorio_cache(creds_info), NOME_SESSOES)
+    os.makedirs(pasta, exist_ok=True)
+    caminho = os.path.join(pasta, sessao_id)
+    with open(caminho, "a"): os.utime(caminho)
+
+def sessoes_ativas(diretorio, limpar=False):
+    pasta = os.path.join(diretorio, NOME_SESSOES)
+    agora, ativas = time.time(), 0
+    try: entradas = list(os.scandir(pasta))
+    except OSError: return 0
+    for entrada in entradas:
+        try: recente = agora - entrada.stat().st_mtime < JANELA_SESSAO_S
+        except OSError: continue
+        if recente: ativas += 1
+        elif limpar:
+            with contextlib.suppress(OSError): os.remove(entrada.path)
+    return ativas
+
+def chamadas_ultima_hora(selo, agora=None):
+    agora = time.time() if agora is None else agora
+    return [t for t in (selo or {}).get("chamadas", []) if agora - t < 3600]
+
+def proximo_intervalo(intervalo, mudou, sessoes):
+    if mudou: novo = INTERVALO_MIN_S
+    elif sessoes: novo = min(intervalo * 1.5, INTERVALO_ATIVO_S)
+    else: novo = min(intervalo * 2, INTERVALO_MAX_S)
+    return max(novo, INTERVALO_MIN_S, 3600 / max(COTA_DRIVE_HORA, 1))
+
+def intervalo_efetivo(diretorio, selo):
+    intervalo = selo.get("intervalo", INTERVALO_INICIAL_S)
+    if intervalo > INTERVALO_ATIVO_S and sessoes_ativas(diretorio): intervalo = INTERVALO_ATIVO_S
+    return intervalo
+
+# --- publicação / leitura da base em Arrow IPC ---
+def _tabela_arrow(df):
+    import pyarrow as pa
+    try: return pa.Table.from_pandas(df)
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        # Coluna de texto com números misturados (célula digitada como número): vira texto.
+        mistas = {c: df[c].map(lambda v: v if pd.isna(v) else str(v)) for c in df.columns if df[c].dtype == object}
+        return pa.Table.from_pandas(df.assign(**mistas))
+
+def _gravar_arrow(caminho, df, metadados):
+    import pyarrow as pa
+    tabela = _tabela_arrow(df)
+    tabela = tabela.replace_schema_metadata({**(tabela.schema.metadata or {}), **metadados})
+    def escrever(f):
+        with pa.ipc.new_file(f, tabela.schema) as writer: writer.write_table(tabela)
+    _gravar_atomico(caminho, escrever)
+
+def _ler_arrow(caminho):
+    import pyarrow as pa
+    try:
+        with pa.memory_map(caminho) as origem: return pa.ipc.open_file(origem).read_all()
+    except (OSError, pa.ArrowInvalid): return None
+
+def _limpar_arquivos_antigos(diretorio, manter=2):
+    # O anterior fica para quem acabou de ler a base.arrow da versão passada.
+    antigos = sorted((e for e in os.scandir(diretorio) if e.name.startswith(PREFIXO_ARQUIVO)), key=lambda e: e.stat().st_mtime, reverse=True)
+    for entrada in antigos[manter:]:
+        with contextlib.suppress(OSError): os.remove(entrada.path)
+
+def publicar(diretorio, base):
+    ativas, arquivo = particionar(base["dados"])
+    agregados = {"nome": None, **agregados_arquivo(arquivo)}
+    if len(arquivo):
+        agregados["nome"] = f"{PREFIXO_ARQUIVO}{hashlib.md5(base['versao'].encode()).hexdigest()[:16]}.arrow"
+        _gravar_arrow(os.path.join(diretorio, agregados["nome"]), arquivo, {b"versao": base["versao"].encode()})
+    _gravar_arrow(os.path.join(diretorio, NOME_BASE), ativas, {
+        b"versao": base["versao"].encode(), b"metas": json.dumps(base["metas"]).encode(),
+        b"taxonomia": json.dumps(base["taxonomia"]).encode(), b"arquivo": json.dumps(agregados).encode()})
+    _limpar_arquivos_antigos(diretorio)
+
+def ler_publicada(diretorio, historico=False):
+    """Base publicada no formato de carregar_planilha ({dados, metas, taxonomia, versao}) + agregados do arquivo;
+    com historico=True, as obras arquivadas vêm junto em dados. None se não houver."""
+    tabela = _ler_arrow(os.path.join(diretorio, NOME_BASE))
+    if tabela is None: return None
+    metadados = tabela.schema.metadata
+    df = tabela.to_pandas()
+    versao = metadados[b"versao"].decode()
+    arquivo = json.loads(metadados.get(b"arquivo", b"null"))
+    taxonomia = tuple(map(tuple, json.loads(metadados.get(b"taxonomia", b"null")) or PADRAO))
+    definir_taxonomia(taxonomia)
+    base = {"metas": json.loads(metadados[b"metas"]), "taxonomia": taxonomia, "arquivo": arquivo, "versao": versao, "publicada": versao}
+    if historico and arquivo and arquivo["nome"]:
+        tabela_arquivo = _ler_arrow(os.path.join(diretorio, arquivo["nome"]))
+        if tabela_arquivo is None: return None
+        df = pd.concat([df, tabela_arquivo.to_pandas()], ignore_index=True)
+        base.update(versao=f"{versao}+arquivo", historico=True)
+    df.attrs["versao"] = base["versao"]
+    return {"dados": df, **base}
+
+# --- atualização eleita ---
+@contextlib.contextmanager
+def _trava(diretorio, bloquear):
+    """True se este processo ficou com a vez de atualizar."""
+    if fcntl is None:
+        yield True
+        return
+    with open(os.path.join(diretorio, NOME_TRAVA), "a+b") as f:
+        try: fcntl.flock(f, fcntl.LOCK_EX | (0 if bloquear else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try: yield True
+        finally: fcntl.flock(f, fcntl.LOCK_UN)
+
+def _vencido(diretorio, selo):
+    if selo is None: return True
+    agora = time.time()
+    if len(chamadas_ultima_hora(selo, agora)) >= COTA_DRIVE_HORA: return False  # cota esgotada: segue com a versão atual
+    return agora - selo.get("verificado_em", 0) > intervalo_efetivo(diretorio, selo)
+
+def _selo_falha(selo, chamadas):
+    """Selo anterior (versão publicada intacta) com a tentativa registrada e o intervalo dobrado."""
+    selo = selo or {"versao": None}
+    intervalo = min(selo.get("intervalo", INTERVALO_INICIAL_S) * 2, INTERVALO_MAX_S)
+    return {**selo, "verificado_em": time.time(), "intervalo": max(intervalo, 3600 / max(COTA_DRIVE_HORA, 1)),
+            "chamadas": chamadas, "falhas": selo.get("falhas", 0) + 1}
+
+def _atualizar(diretorio, creds_info):
+    """Com a trava: confere a versão no Drive, só baixa/publica se mudou e recalcula o intervalo.
+    Grava o selo mesmo se falhar (ver _selo_falha)."""
+    selo = ler_selo(diretorio)
+    if not _vencido(diretorio, selo): return
+    agora = time.time()
+    chamadas = chamadas_ultima_hora(selo, agora) + [agora]
+    novo = None
+    try:
+        arquivo = cliente_drive(creds_info).localizar_arquivo(campos="id, md5Checksum, modifiedTime")
+        if arquivo is None: return
+        versao = arquivo.get('md5Checksum') or arquivo.get('modifiedTime')
+        mudou = selo is None or selo["versao"] != versao or not os.path.exists(os.path.join(diretorio, NOME_BASE))
+        if mudou:
+            chamadas += [agora] * CUSTO_DOWNLOAD
+            base = carregar_planilha(creds_info, limpar=limpar_incremental)
+            if base is None: return
+            publicar(diretorio, base)
+            versao = base["versao"]
+        sessoes = sessoes_ativas(diretorio, limpar=True)
+        anterior = INTERVALO_INICIAL_S if selo is None or selo.get("falhas") else selo.get("intervalo", INTERVALO_INICIAL_S)
+        intervalo = proximo_intervalo(anterior, mudou and selo is not None, sessoes)
+        novo = {"versao": versao, "verificado_em": time.time(), "intervalo": intervalo, "sessoes": sessoes,
+                "alterado_em": agora if mudou else selo.get("alterado_em", agora), "chamadas": chamadas}
+    finally:
+        _gravar_selo(diretorio, novo or _selo_falha(selo, chamadas))
+
+_local = {}
+_lock_local = threading.Lock()
+
+def obter_planilha(creds_info, historico=False):
+    """Base limpa, metas e versão vindas do cache compartilhado; atualiza pelo Drive se for a vez deste processo.
+    Só as obras ativas, a menos que historico=True (ver particao.py)."""
+    diretorio = diretorio_cache(creds_info)
+    selo = ler_selo(diretorio)
+    if _vencido(diretorio, selo):
+        with _trava(diretorio, bloquear=selo is None) as eleito:
+            try:
+                if eleito: _atualizar(diretorio, creds_info)
+            except Exception:
+                log.warning("Falha ao atualizar a base pelo Drive (%s)", diretorio, exc_info=True)
+                if selo is None: raise  # sem versão publicada não há o que servir
+        selo = ler_selo(diretorio)
+    if selo is None: return None
+    with _lock_local:
+        atual = _local.get((diretorio, historico))
+        if atual is None or atual["publicada"] != selo["versao"]:
+            atual = ler_publicada(diretorio, historico)
+            if atual is None: return None
+            _local[(diretorio, historico)] = atual
+        return atual
+
+def estado_atualizacao(creds_info):
+    """Intervalo atual, sessões ativas e uso da cota, para a página de Configurações."""
+    diretorio = diretorio_cache(creds_info)
+    selo = ler_selo(diretorio)
+    if selo is None: return None
+    return {"versao": selo["versao"], "verificado_em": selo["verificado_em"], "alterado_em": selo.get("alterado_em"),
+            "intervalo": intervalo_efetivo(diretorio, selo), "sessoes": sessoes_ativas(diretorio),
+            "chamadas_hora": len(chamadas_ultima_hora(selo)), "cota_hora": COTA_DRIVE_HORA, "falhas": selo.get("falhas", 0)}
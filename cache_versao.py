@@ -0,0 +1,26 @@
+import threading
+
+# ---------------------------------------------------------
+# MEMÓRIA POR VERSÃO DOS DADOS
+# ---------------------------------------------------------
+# Cálculos derivados da base (valor agregado, previsões...) só mudam quando o
+# arquivo muda. A chave é a versão gravada por ler_base em df.attrs['versao'],
+# o índice das linhas recebidas (recortes diferentes não se misturam) e os
+# parâmetros do cálculo. Compartilhado por todas as sessões do processo.
+MAX_ENTRADAS = 128  # cada escopo de usuário (escopo.py) tem as próprias entradas, pequenas
+
+_cache = {}
+_lock = threading.Lock()
+
+def memorizar(df, nome, calcular, *params):
+    """calcular() memorizado por (nome, versão, linhas, params); sem versão, só calcula."""
+    versao = df.attrs.get("versao")
+    if versao is None: return calcular()
+    chave = (nome, versao, hash(df.index.to_numpy().tobytes())) + params
+    with _lock:
+        if chave in _cache: return _cache[chave]
+    resultado = calcular()
+    with _lock:
+        if len(_cache) >= MAX_ENTRADAS: _cache.pop(next(iter(_cache)))
+        _cache[chave] = resultado
+    return resultado
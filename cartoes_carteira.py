@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+from cache_versao import memorizar
+from regras_saude import REGRAS_SAUDE, avaliar_regras
+from valor_agregado import valor_agregado
+
+# ---------------------------------------------------------
+# CARTÕES DA GESTÃO DA CARTEIRA (HTML PRONTO POR VERSÃO DOS DADOS)
+# ---------------------------------------------------------
+# Cores de status, percentuais e valores formatados são calculados por coluna
+# e o HTML de todos os cartões é montado uma vez por versão dos dados e meta
+# de margem, compartilhado pelas sessões do processo. No rerun a página só
+# pega, na ordem do filtro, os cartões já prontos.
+CORES_STATUS = {  # texto/barra, fundo do selo, cor do selo
+    "Finalizado": ("#3fb950", "rgba(63,185,80,0.2)", "#3fb950"),
+    "Apresentado": ("#a371f7", "rgba(163,113,247,0.2)", "#a371f7"),
+    "Em andamento": ("#d29922", "rgba(210,153,34,0.2)", "#e3b341"),
+}
+COR_STATUS_PADRAO = ("#da3633", "rgba(218,54,51,0.2)", "#f85149")
+VERMELHO, VERDE, NEUTRO = "#da3633", "#3fb950", "#e6edf3"
+
+MODELO = """
+            <div class="tile-header" style="border-left: 3px solid {cor_t}">
+                <div class="tile-title" title="{projeto}">{projeto} - {descricao}</div>
+                <div class="tile-sub">{cliente} | {cidade}</div>
+            </div>
+            <div class="data-strip">
+                <div class="data-col"><span class="data-lbl">Valor</span><span class="data-val">{valor}</span></div>
+                <div class="data-col"><span class="data-lbl">Margem</span><span class="data-val" style="color: {cor_margem}">{margem}%</span></div>
+                <div class="data-col"><span class="data-lbl">Horas</span><span class="data-val" style="color: {cor_horas}">{pct_horas}%</span></div>
+                <div class="data-col"><span class="data-lbl">Mat</span><span class="data-val" style="color: {cor_mat}">{pct_mat}%</span></div>
+            </div>
+            <div class="data-strip" style="border-top: none;">
+                <div class="data-col"><span class="data-lbl">CPI</span><span class="data-val" style="color: {cor_cpi}">{cpi}</span></div>
+                <div class="data-col"><span class="data-lbl">Prod h</span><span class="data-val" style="color: {cor_ip}">{ip}</span></div>
+                <div class="data-col"><span class="data-lbl">EAC</span><span class="data-val">{eac}</span></div>
+                <div class="data-col"><span class="data-lbl">VAC</span><span class="data-val" style="color: {cor_vac}">{vac}</span></div>
+            </div>
+            <div class="tile-footer">
+                <div class="progress-track"><div class="progress-fill" style="width: {pct}%; background-color: {cor_t};"></div></div>
+                <div class="footer-row">
+                    <span class="badge-status" style="background-color: {bg_b}; color: {cl_b}">{status}</span>
+                    <span class="footer-pct" style="color: {cl_b}">{pct}%</span>
+                </div>
+                <div class="rule-strip">{chips}</div>
+            </div>
+            """
+
+def _formatar(valores, fmt): return np.array([fmt.format(v) for v in valores], dtype=object)
+
+def brl_curto(valores):
+    """format_brl_short da Gestão para uma coluna inteira (R$ 1,2M / R$ 350,0k / R$ 900)."""
+    v = np.nan_to_num(np.asarray(valores, dtype=float))
+    milhoes, milhares = np.abs(v) >= 1_000_000, np.abs(v) >= 1_000
+    milhares &= ~milhoes
+    unidades = ~(milhoes | milhares)
+    saida = np.empty(len(v), dtype=object)
+    saida[milhoes] = [s.replace(".", ",") for s in _formatar(v[milhoes] / 1_000_000, "R$ {:.1f}M")]
+    saida[milhares] = [s.replace(".", ",") for s in _formatar(v[milhares] / 1_000, "R$ {:.1f}k")]
+    saida[unidades] = [s.replace(",", ".") for s in _formatar(v[unidades], "R$ {:,.0f}")]
+    return saida
+
+def indice(valores): return np.array([s.replace(".", ",") for s in _formatar(valores, "{:.2f}")], dtype=object)
+
+def _pct(num, den):
+    num, den = np.asarray(num, dtype=float), np.asarray(den, dtype=float)
+    return np.divide(num, den, out=np.zeros_like(num), where=den > 0) * 100
+
+def _cor(condicao, sim, nao): return np.where(condicao, sim, nao).astype(object)
+
+def _chips(regras):
+    chips = np.full(len(regras), "", dtype=object)
+    for r in REGRAS_SAUDE:
+        fundo, cor = ("rgba(218,54,51,0.2)", "#f85149") if r["critica"] else ("rgba(210,153,34,0.2)", "#e3b341")
+        chip = f'<span class="rule-chip" title="{r["descricao"]}" style="background-color: {fundo}; color: {cor}">{r["titulo"]}</span>'
+        chips = chips + np.where(regras[f"Regra_{r['id']}"].to_numpy(dtype=bool), chip, "").astype(object)
+    return chips
+
+def montar_cartoes(df, meta_margem):
+    status = df['Status'].astype(str).str.strip()
+    cor_t, bg_b, cl_b = (status.map(lambda s, i=i: CORES_STATUS.get(s, COR_STATUS_PADRAO)[i]).to_numpy(dtype=object) for i in range(3))
+    va = valor_agregado(df)
+    margem = df['Margem_%'].to_numpy(dtype=float)
+    pct_horas, pct_mat = _pct(df['HH_Real_Qtd'], df['HH_Orc_Qtd']), _pct(df['Mat_Real'], df['Mat_Orc'])
+    cpi, ip, vac = (va[c].to_numpy(dtype=float) for c in ('CPI', 'IP_HH', 'VAC'))
+    colunas = {
+        "projeto": df['Projeto'].to_numpy(dtype=object), "descricao": df['Descricao'].to_numpy(dtype=object),
+        "cliente": df['Cliente'].to_numpy(dtype=object), "cidade": df['Cidade'].to_numpy(dtype=object),
+        "cor_t": cor_t, "bg_b": bg_b, "cl_b": cl_b, "status": status.to_numpy(dtype=object),
+        "valor": brl_curto(df['Vendido']),
+        "margem": _formatar(margem, "{:.0f}"), "cor_margem": _cor(margem < meta_margem, VERMELHO, VERDE),
+        "pct_horas": _formatar(pct_horas, "{:.0f}"), "cor_horas": _cor(pct_horas > 100, VERMELHO, NEUTRO),
+        "pct_mat": _formatar(pct_mat, "{:.0f}"), "cor_mat": _cor(pct_mat > 100, VERMELHO, NEUTRO),
+        "cpi": indice(cpi), "cor_cpi": _cor(cpi < 1, VERMELHO, VERDE),
+        "ip": indice(ip), "cor_ip": _cor(ip < 1, VERMELHO, NEUTRO),
+        "eac": brl_curto(va['EAC']), "vac": brl_curto(vac), "cor_vac": _cor(vac < 0, VERMELHO, NEUTRO),
+        "pct": np.trunc(df['Conclusao_%'].to_numpy(dtype=float)).astype(int),
+        "chips": _chips(avaliar_regras(df, meta_margem=meta_margem)),
+    }
+    nomes = list(colunas)
+    html = [MODELO.format(**dict(zip(nomes, valores))) for valores in zip(*colunas.values())]
+    return pd.Series(html, index=df.index, dtype=object)
+
+def cartoes_carteira(df, meta_margem):
+    """HTML do cartão de cada projeto (índice do df), uma vez por versão dos dados e meta de margem."""
+    return memorizar(df, "cartoes_carteira", lambda: montar_cartoes(df, meta_margem), float(meta_margem))
@@ -0,0 +1,197 @@
+from google.oauth2 import service_account
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaIoBaseDownload
+import google_auth_httplib2
+import httplib2
+import contextlib
+import hashlib
+import io
+import os
+import queue
+import random
+import tempfile
+import threading
+import time
+
+# ---------------------------------------------------------
+# CONFIGURAÇÃO DO TRANSPORTE
+# ---------------------------------------------------------
+# O httplib2 (usado pelo googleapiclient) não é thread-safe e o Streamlit
+# atende cada sessão numa thread. Todas as chamadas ao Google passam por aqui:
+# conexões emprestadas de um pool, timeout por chamada, limite de taxa
+# compartilhado pelo processo e novas tentativas com backoff exponencial + jitter.
+# O download da planilha é feito em blocos de BLOCO_DOWNLOAD (requisições com
+# Range: uma falha repete só o bloco, continuando de onde parou), gravado num
+# arquivo que fica em memória até LIMITE_MEMORIA_DOWNLOAD e depois vai para
+# disco, com o md5 calculado no caminho e conferido com o md5Checksum do Drive.
+NOME_ARQUIVO = "dados_dashboard_obras.xlsx"
+ESCOPOS_DRIVE = ['https://www.googleapis.com/auth/drive.readonly']
+
+TIMEOUT_S = 20
+TAMANHO_POOL = 8
+MAX_TENTATIVAS = 5
+BACKOFF_BASE_S = 0.5
+BACKOFF_MAX_S = 16.0
+COTA_POR_MINUTO = 300  # requisições/min por processo (cota do Drive é por projeto)
+RAJADA_MAXIMA = 20
+BLOCO_DOWNLOAD = int(float(os.environ.get("DASHBOARD_BLOCO_DOWNLOAD_MB", 8)) * 1024 * 1024)
+LIMITE_MEMORIA_DOWNLOAD = 32 * 1024 * 1024
+
+STATUS_RETENTAVEIS = {408, 429, 500, 502, 503, 504}
+MOTIVOS_COTA = {"rateLimitExceeded", "userRateLimitExceeded", "quotaExceeded"}
+
+# ---------------------------------------------------------
+# LIMITE DE TAXA (TOKEN BUCKET)
+# ---------------------------------------------------------
+class LimiteTaxa:
+    def __init__(self, por_minuto=COTA_POR_MINUTO, rajada=RAJADA_MAXIMA):
+        self.taxa = por_minuto / 60.0
+        self.capacidade = float(rajada)
+        self.fichas = float(rajada)
+        self.ultimo = time.monotonic()
+        self.lock = threading.Lock()
+
+    def aguardar(self):
+        while True:
+            with self.lock:
+                agora = time.monotonic()
+                self.fichas = min(self.capacidade, self.fichas + (agora - self.ultimo) * self.taxa)
+                self.ultimo = agora
+                if self.fichas >= 1:
+                    self.fichas -= 1
+                    return
+                espera = (1 - self.fichas) / self.taxa
+            time.sleep(espera)
+
+limite_taxa = LimiteTaxa()
+
+def espera_backoff(tentativa, retry_after=None):
+    """Backoff exponencial com 'full jitter'; respeita Retry-After quando vier."""
+    if retry_after:
+        try: return min(float(retry_after), BACKOFF_MAX_S)
+        except ValueError: pass
+    return random.uniform(0, min(BACKOFF_MAX_S, BACKOFF_BASE_S * (2 ** tentativa)))
+
+def _retentavel_drive(erro):
+    if isinstance(erro, HttpError):
+        status = erro.resp.status
+        if status in STATUS_RETENTAVEIS: return True
+        if status == 403:
+            try: motivos = {d.get("reason") for d in erro.error_details or []}
+            except Exception: motivos = set()
+            return bool(motivos & MOTIVOS_COTA)
+        return False
+    return isinstance(erro, (OSError, httplib2.HttpLib2Error))
+
+# ---------------------------------------------------------
+# DRIVE (googleapiclient + pool de httplib2)
+# ---------------------------------------------------------
+class ErroIntegridade(IOError):
+    """Arquivo baixado com md5 diferente do md5Checksum informado pelo Drive."""
+
+class _EscritorMd5:
+    """Destino do MediaIoBaseDownload que calcula o md5 do que é gravado."""
+    def __init__(self, destino):
+        self.destino = destino
+        self.md5 = hashlib.md5()
+
+    def write(self, dados):
+        self.md5.update(dados)
+        return self.destino.write(dados)
+
+def md5_arquivo(file_io):
+    """md5 do conteúdo (o calculado no download, se houver) sem copiar o arquivo inteiro para a memória."""
+    md5 = getattr(file_io, "md5", None)
+    if md5: return md5
+    if isinstance(file_io, io.BytesIO): return hashlib.md5(file_io.getbuffer()).hexdigest()
+    posicao, h = file_io.tell(), hashlib.md5()
+    file_io.seek(0)
+    for bloco in iter(lambda: file_io.read(1024 * 1024), b""): h.update(bloco)
+    file_io.seek(posicao)
+    return h.hexdigest()
+
+class PoolHttp:
+    """Pool de AuthorizedHttp: cada chamada usa uma conexão exclusiva."""
+    def __init__(self, creds, tamanho=TAMANHO_POOL):
+        self.creds = creds
+        self.livres = queue.LifoQueue(maxsize=tamanho)
+
+    def _nova(self):
+        return google_auth_httplib2.AuthorizedHttp(self.creds, http=httplib2.Http(timeout=TIMEOUT_S))
+
+    @contextlib.contextmanager
+    def emprestar(self):
+        try: http = self.livres.get_nowait()
+        except queue.Empty: http = self._nova()
+        yield http
+        # Só volta ao pool se a chamada terminou sem erro (senão a conexão é descartada).
+        try: self.livres.put_nowait(http)
+        except queue.Full: pass
+
+class ClienteDrive:
+    def __init__(self, creds_info):
+        creds = service_account.Credentials.from_service_account_info(creds_info, scopes=ESCOPOS_DRIVE)
+        self.service = build('drive', 'v3', credentials=creds, cache_discovery=False)
+        self.pool = PoolHttp(creds)
+
+    def chamar(self, operacao):
+        """Executa operacao(http) com limite de taxa, pool e novas tentativas."""
+        for tentativa in range(MAX_TENTATIVAS):
+            limite_taxa.aguardar()
+            try:
+                with self.pool.emprestar() as http:
+                    return operacao(http)
+            except Exception as erro:
+                if tentativa == MAX_TENTATIVAS - 1 or not _retentavel_drive(erro): raise
+                retry_after = erro.resp.get("retry-after") if isinstance(erro, HttpError) else None
+                time.sleep(espera_backoff(tentativa, retry_after))
+
+    def executar(self, requisicao):
+        return self.chamar(lambda http: requisicao.execute(http=http))
+
+    def localizar_arquivo(self, nome=NOME_ARQUIVO, campos="id, name"):
+        resultado = self.executar(self.service.files().list(q=f"name='{nome}' and trashed=false", fields=f"files({campos})"))
+        arquivos = resultado.get('files', [])
+        return arquivos[0] if arquivos else None
+
+    def baixar(self, file_id, md5=None):
+        """Arquivo (posicionado no início, com .md5) baixado em blocos; confere com md5 (md5Checksum) se informado."""
+        requisicao = self.service.files().get_media(fileId=file_id)
+        file_io = tempfile.SpooledTemporaryFile(max_size=LIMITE_MEMORIA_DOWNLOAD)
+        escritor = _EscritorMd5(file_io)
+        downloader = MediaIoBaseDownload(escritor, requisicao, chunksize=BLOCO_DOWNLOAD)
+
+        def proximo_bloco(http):
+            requisicao.http = http
+            return downloader.next_chunk()
+
+        # O downloader guarda o progresso: uma nova tentativa continua do último bloco.
+        try:
+            done = False
+            while done is False: status, done = self.chamar(proximo_bloco)
+        except BaseException:
+            file_io.close()
+            raise
+        file_io.md5 = escritor.md5.hexdigest()
+        if md5 and file_io.md5 != md5:
+            # Arquivo trocado no meio do download (blocos de versões diferentes) ou corrompido.
+            file_io.close()
+            raise ErroIntegridade(f"md5 do download ({file_io.md5}) difere do Drive ({md5})")
+        file_io.seek(0)
+        return file_io
+
+# ---------------------------------------------------------
+# CLIENTES COMPARTILHADOS POR PROCESSO
+# ---------------------------------------------------------
+_clientes = {}
+_lock_clientes = threading.Lock()
+
+def _chave(tipo, creds_info):
+    return (tipo, creds_info.get("client_email"), creds_info.get("private_key_id"))
+
+def cliente_drive(creds_info):
+    chave = _chave("drive", creds_info)
+    with _lock_clientes:
+        if chave not in _clientes: _clientes[chave] = ClienteDrive(dict(creds_info))
+        return _clientes[chave]
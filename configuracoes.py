@@ -1,9 +1,8 @@
 import streamlit as st
 import pandas as pd
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
-import io
+from cache_compartilhado import obter_planilha, estado_atualizacao, TTL_LOCAL_S, INTERVALO_MIN_S, INTERVALO_MAX_S
+from perfil import usuario_admin
+from taxonomia import taxonomia_vigente, ABA_TAXONOMIA, CLASSE_PADRAO
 import time
 
 # ---------------------------------------------------------
@@ -31,62 +30,18 @@ st.title("Configurações")
 # ---------------------------------------------------------
 # FUNÇÃO: CARREGAR METAS DA PLANILHA EXCEL (Sheet2)
 # ---------------------------------------------------------
-@st.cache_data(ttl=30)
+@st.cache_data(ttl=TTL_LOCAL_S)
 def load_config_from_sheet():
     zeros = {"meta_vendas": 0.0, "meta_margem": 0.0, "meta_custo_adm": 0.0}
     try:
-        # 1. Autenticação
-        creds_dict = dict(st.secrets["gcp_service_account"])
-        creds = service_account.Credentials.from_service_account_info(
-            creds_dict,
-            scopes=['https://www.googleapis.com/auth/drive.readonly']
-        )
-        service = build('drive', 'v3', credentials=creds)
+        # 1. Base publicada no cache compartilhado entre processos (só um deles fala com o Drive)
+        base = obter_planilha(dict(st.secrets["gcp_service_account"]))
         
-        # 2. Buscar o arquivo Excel
-        results = service.files().list(
-            q="name='dados_dashboard_obras.xlsx' and trashed=false",
-            fields="files(id, name)"
-        ).execute()
-        files = results.get('files', [])
-        
-        if not files:
+        if base is None:
             return {"error": "Arquivo .xlsx não encontrado", **zeros}
-            
-        file_id = files[0]['id']
-        
-        # 3. Baixar para memória
-        request = service.files().get_media(fileId=file_id)
-        file_io = io.BytesIO()
-        downloader = MediaIoBaseDownload(file_io, request)
-        done = False
-        while done is False:
-            status, done = downloader.next_chunk()
-        file_io.seek(0)
         
-        # 4. Ler a aba 'Sheet2' com Pandas
-        df_config = pd.read_excel(file_io, sheet_name='Sheet2')
-        
-        if not df_config.empty:
-            # Pega a primeira linha de dados (índice 0)
-            row = df_config.iloc[0]
-            
-            # Função de limpeza
-            def parse_val(val):
-                if isinstance(val, (int, float)): return float(val)
-                s = str(val).replace('R$', '').replace('%', '').strip()
-                s = s.replace('.', '').replace(',', '.') # Formato BR para US
-                try: return float(s)
-                except: return 0.0
-
-            # Assume ordem das colunas: Vendas | Margem | Adm
-            return {
-                "meta_vendas": parse_val(row.iloc[0]),
-                "meta_margem": parse_val(row.iloc[1]),
-                "meta_custo_adm": parse_val(row.iloc[2])
-            }
-            
-        return zeros
+        # 2. Metas da aba 'Sheet2' (ordem das colunas: Vendas | Margem | Adm), lidas junto com a base
+        return base["metas"]
         
     except Exception as e:
         return {"error": str(e), **zeros}
@@ -129,15 +84,52 @@ with st.container(border=True):
     st.subheader("Status da Conexão")
     st.write("")
     
-    st.markdown("""
+    st.markdown(f"""
     **☁️ Sistema conectado ao Google Sheets (Excel)**
     
-    Os dados são atualizados automaticamente a cada **30 segundos**.
+    Os dados são conferidos no Drive automaticamente, em intervalo **adaptativo**: 
+    de {INTERVALO_MIN_S} segundos logo após uma edição até {INTERVALO_MAX_S // 60} minutos quando ninguém está usando.
     
     **Para atualizar:**
     1. Abra o arquivo **'dados_dashboard_obras.xlsx'** no Drive.
-    2. Edite a aba **Sheet1** para orçamentos ou a aba **Sheet2** para metas.
+    2. Edite a aba **Sheet1** para orçamentos, a aba **Sheet2** para metas ou a aba **Taxonomia** para as classes de projeto.
     3. As alterações aparecerão aqui automaticamente.
     """)
     
+    estado = estado_atualizacao(dict(st.secrets["gcp_service_account"]))
+    if estado:
+        st.write("")
+        e1, e2, e3, e4 = st.columns(4)
+        e1.metric("Intervalo atual", f"{estado['intervalo']:.0f}s")
+        e2.metric("Sessões ativas", estado['sessoes'])
+        e3.metric("Cota Drive (última hora)", f"{estado['chamadas_hora']} / {estado['cota_hora']}")
+        alterado = f"há {(time.time() - estado['alterado_em']) / 60:.0f} min" if estado['alterado_em'] else "—"
+        e4.metric("Última alteração", alterado)
+        versao = f"`{estado['versao'][:8]}`" if estado['versao'] else "nenhuma publicada"
+        st.caption(f"Cache compartilhado entre processos: versão {versao}, conferida no Drive há {time.time() - estado['verificado_em']:.0f}s.")
+        if estado['falhas']: st.warning(f"As últimas {estado['falhas']} conferências no Drive falharam; nova tentativa em até {estado['intervalo']:.0f}s.")
+    
+    st.write("")
+
+# ---------------------------------------------------------
+# 3. TAXONOMIA DOS PROJETOS (aba Taxonomia: Prefixo | Classe)
+# ---------------------------------------------------------
+st.write("")
+with st.container(border=True):
+    st.subheader("Taxonomia dos Projetos")
+    taxonomia = taxonomia_vigente()
+    st.dataframe(pd.DataFrame(taxonomia.regras, columns=["Prefixo", "Classe"]), hide_index=True, use_container_width=True)
+    st.caption(f"Classe pelo prefixo mais longo do código do projeto; sem prefixo cadastrado: **{CLASSE_PADRAO}**. "
+               f"Sem a aba **{ABA_TAXONOMIA}** na planilha, 5009, 5010 e 5011 são ADM.")
+
+# ---------------------------------------------------------
+# 4. DIAGNÓSTICO (SÓ ADMINS)
+# ---------------------------------------------------------
+if usuario_admin():
     st.write("")
+    with st.container(border=True):
+        st.subheader("Diagnóstico")
+        st.toggle("Gravar perfil de execução de cada página (amostragem)", value=st.session_state.get("perfil_sessao", False), key="perfil_toggle",
+                  on_change=lambda: st.session_state.update(perfil_sessao=st.session_state["perfil_toggle"]))
+        st.caption("Vale para esta sessão. Também pode ser ligado só numa página com `?perfil=1` na URL. "
+                   "Cada rerun grava um arquivo `.folded` (abre no speedscope.app ou flamegraph.pl); o resumo aparece na barra lateral.")
@@ -2,12 +2,12 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
-import io
-import json
-import os
+from exportacao import botoes_exportacao
+from cache_compartilhado import obter_planilha, TTL_LOCAL_S
+from escopo import recortar_sessao
+from alteracoes import ler_base_compartilhada
+from taxonomia import taxonomia_vigente, CLASSE_ADM
+from base_dados import metas_percentuais, mascaras_carteira, somar, agrupar_ranking, agrupar_segmentos, ranking_top_n, cliente_local
 
 # ---------------------------------------------------------
 # 1. CONFIGURAÇÃO VISUAL
@@ -30,125 +30,85 @@ st.markdown("""
 # ---------------------------------------------------------
 # 2. CARREGAR CONFIGURAÇÕES (SHEET2) - VIA PANDAS
 # ---------------------------------------------------------
-@st.cache_data(ttl=30)
+@st.cache_data(ttl=TTL_LOCAL_S)
 def load_config():
     zeros = {"meta_vendas": 0.0, "meta_margem": 0.0, "meta_custo_adm": 0.0}
     try:
-        creds_dict = dict(st.secrets["gcp_service_account"])
-        creds = service_account.Credentials.from_service_account_info(
-            creds_dict, scopes=['https://www.googleapis.com/auth/drive.readonly']
-        )
-        service = build('drive', 'v3', credentials=creds)
-        results = service.files().list(q="name='dados_dashboard_obras.xlsx' and trashed=false", fields="files(id)").execute()
-        files = results.get('files', [])
-        if not files: return zeros
-        
-        request = service.files().get_media(fileId=files[0]['id'])
-        file_io = io.BytesIO()
-        downloader = MediaIoBaseDownload(file_io, request)
-        done = False
-        while done is False: status, done = downloader.next_chunk()
-        file_io.seek(0)
-        
-        df_conf = pd.read_excel(file_io, sheet_name='Sheet2')
-        if df_conf.empty: return zeros
-        
-        row = df_conf.iloc[0]
-        def parse_val(val):
-            if isinstance(val, (int, float)): return float(val)
-            s = str(val).replace('R$', '').replace('%', '').strip()
-            s = s.replace('.', '').replace(',', '.')
-            try: return float(s)
-            except: return 0.0
-            
-        return {
-            "meta_vendas": parse_val(row.iloc[0]),
-            "meta_margem": parse_val(row.iloc[1]),
-            "meta_custo_adm": parse_val(row.iloc[2])
-        }
+        base = obter_planilha(dict(st.secrets["gcp_service_account"]))
+        if base is None: return zeros
+        return base["metas"]
     except: return zeros
 
 config = load_config()
-META_MARGEM = float(config["meta_margem"])
-if META_MARGEM <= 1.0: META_MARGEM *= 100
-
-META_ADM = float(config["meta_custo_adm"])
-if META_ADM <= 1.0: META_ADM *= 100
+metas = metas_percentuais(config)
+META_MARGEM = metas["META_MARGEM_BRUTA"]
+META_ADM = metas["META_CUSTO_ADM"]
 
 # ---------------------------------------------------------
 # 3. DADOS
 # ---------------------------------------------------------
-@st.cache_data(ttl=30)
+@st.cache_data(ttl=TTL_LOCAL_S)
 def load_data():
     try:
-        creds_dict = dict(st.secrets["gcp_service_account"])
-        creds = service_account.Credentials.from_service_account_info(creds_dict, scopes=['https://www.googleapis.com/auth/drive.readonly'])
-        service = build('drive', 'v3', credentials=creds)
-        results = service.files().list(q="name='dados_dashboard_obras.xlsx' and trashed=false", fields="files(id, name)").execute()
-        files = results.get('files', [])
-        if not files: return None
-        file_id = files[0]['id']
-        request = service.files().get_media(fileId=file_id)
-        file_io = io.BytesIO()
-        downloader = MediaIoBaseDownload(file_io, request)
-        done = False
-        while done is False: status, done = downloader.next_chunk()
-        file_io.seek(0)
-        return pd.read_excel(file_io)
+        base = obter_planilha(dict(st.secrets["gcp_service_account"]), historico=True)
+        if base is None: return None
+        return ler_base_compartilhada(base)
     except: return None
 
 df_raw = load_data()
 if df_raw is None: st.error("⚠️ Erro ao conectar com o Google Sheets."); st.stop()
+df_raw = recortar_sessao(df_raw)  # escopo do usuário (escopo.py)
 
-df_raw['Projeto'] = df_raw['Projeto'].astype(str)
-def clean_google_number(x):
-    if isinstance(x, (int, float)): return float(x)
-    if x is None: return 0.0
-    s = str(x).strip()
-    if s == "": return 0.0
-    try: s = s.replace('R$', '').replace('%', '').replace(' ', '').replace('.', '').replace(',', '.'); return float(s)
-    except: return 0.0
+# Recortes como máscaras sobre df_raw (calculadas uma vez por versão dos dados): nada é copiado por rerun.
+mascaras = mascaras_carteira(df_raw)
+mask_adm, mask_obras, mask_fin = mascaras["adm"], mascaras["obras"], mascaras["concluidas"]
 
-cols_numericas = ['Vendido', 'Mat_Real', 'Desp_Real', 'HH_Real_Vlr', 'Impostos']
-for col in cols_numericas:
-    if col in df_raw.columns: df_raw[col] = df_raw[col].apply(clean_google_number)
+def format_brl(valor): return f"R$ {valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".") if not pd.isna(valor) else "R$ 0,00"
 
-df_raw['Custo_Total'] = df_raw['Mat_Real'] + df_raw['Desp_Real'] + df_raw['HH_Real_Vlr'] + df_raw['Impostos']
-df_raw['Lucro'] = df_raw['Vendido'] - df_raw['Custo_Total']
-df_raw['Cliente_Local'] = df_raw.apply(lambda row: f"{row['Cliente']} ({row['Cidade']})" if pd.notna(row['Cidade']) and str(row['Cidade']).strip() != "" else row['Cliente'], axis=1)
-if 'Tipo' not in df_raw.columns: df_raw['Tipo'] = "Não Classificado"
-else: df_raw['Tipo'] = df_raw['Tipo'].replace("", "Não Classificado")
+# --- RANKINGS: TOP-N + "OUTROS", COM PAGINAÇÃO NO SERVIDOR ---
+def mover_ranking(chave, passo, total):
+    inicio = st.session_state.get(f"ranking_{chave}_inicio", 0) + passo
+    st.session_state[f"ranking_{chave}_inicio"] = min(max(inicio, 0), max(total - 1, 0))
 
-PREFIXOS_ADM = ("5009", "5010", "5011")
-mask_adm = df_raw['Projeto'].str.startswith(PREFIXOS_ADM)
-df_adm = df_raw[mask_adm].copy()
-df_obras = df_raw[~mask_adm].copy()
-df_finalizadas = df_obras[df_obras['Status'].isin(['Finalizado', 'Apresentado'])].copy()
+def ranking_slice(df_grp, coluna, chave, n_padrao):
+    """Só a fatia visível (N barras + 'Outros') vai para o navegador; o tamanho do gráfico não cresce com a carteira."""
+    total = len(df_grp)
+    if total <= n_padrao: return ranking_top_n(df_grp, coluna, n_padrao)
+    c_n, c_ant, c_info, c_prox = st.columns([1.2, 1, 2, 1], vertical_alignment="center")
+    with c_n: n = st.selectbox("Itens:", [n_padrao, n_padrao * 2, n_padrao * 4], key=f"ranking_{chave}_n", label_visibility="collapsed", format_func=lambda v: f"Top {v}", on_change=st.session_state.pop, args=(f"ranking_{chave}_inicio", None))
+    inicio = min(st.session_state.get(f"ranking_{chave}_inicio", 0), total - 1)
+    with c_ant: st.button("◀", key=f"ranking_{chave}_ant", on_click=mover_ranking, args=(chave, -n, total), disabled=inicio == 0, use_container_width=True)
+    with c_info: st.caption(f"Posições {inicio + 1}–{min(inicio + n, total)} de {total}")
+    with c_prox: st.button("▶", key=f"ranking_{chave}_prox", on_click=mover_ranking, args=(chave, n, total), disabled=inicio + n >= total, use_container_width=True)
+    return ranking_top_n(df_grp, coluna, n, inicio)
 
-def format_brl(valor): return f"R$ {valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".") if not pd.isna(valor) else "R$ 0,00"
+def plotar_ranking(df_top, coluna, labels, margem):
+    df_top = df_top.iloc[::-1]  # maior no topo do gráfico horizontal
+    fig = px.bar(df_top, y=coluna, x='Vendido', text_auto='.2s', orientation='h', color='Margem_%', color_continuous_scale=['#da3633', '#e3b341', '#3fb950'], labels=labels)
+    fig.update_layout(plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)', font=dict(color='white'), xaxis=dict(showgrid=True, gridcolor='#30363d'), yaxis=dict(type='category'), height=max(250, 28 * len(df_top) + 60), margin=margem)
+    return fig
 
 st.title("Dados & Insights")
 tab1, tab2, tab3 = st.tabs(["Cliente", "Segmentos", "Custos Internos"])
 
 # --- TAB 1: CLIENTES ---
 with tab1:
-    if df_finalizadas.empty: st.warning("⚠️ Nenhuma obra finalizada encontrada.")
+    if not mask_fin.any(): st.warning("⚠️ Nenhuma obra finalizada encontrada.")
     else:
-        total_vendido = df_finalizadas['Vendido'].sum(); total_lucro = df_finalizadas['Lucro'].sum()
+        total_vendido = somar(df_raw, 'Vendido', mask_fin); total_lucro = somar(df_raw, 'Lucro', mask_fin)
         margem_global = (total_lucro / total_vendido * 100) if total_vendido > 0 else 0
         c1, c2, c3 = st.columns(3)
         with c1: st.markdown(f'<div class="highlight-box" style="border-top: 4px solid #3fb950"><div class="highlight-lbl">Total Finalizado</div><div class="highlight-val">{format_brl(total_vendido)}</div></div>', unsafe_allow_html=True)
         with c2: cor_m = "#3fb950" if margem_global >= META_MARGEM else "#da3633"; st.markdown(f'<div class="highlight-box" style="border-top: 4px solid {cor_m}"><div class="highlight-lbl">Margem</div><div class="highlight-val" style="color:{cor_m}">{margem_global:.1f}%</div></div>', unsafe_allow_html=True)
-        with c3: st.markdown(f'<div class="highlight-box" style="border-top: 4px solid #8b949e"><div class="highlight-lbl">Obras Entregues</div><div class="highlight-val">{len(df_finalizadas)}</div></div>', unsafe_allow_html=True)
+        with c3: st.markdown(f'<div class="highlight-box" style="border-top: 4px solid #8b949e"><div class="highlight-lbl">Obras Entregues</div><div class="highlight-val">{int(mask_fin.sum())}</div></div>', unsafe_allow_html=True)
         st.divider(); st.subheader("Ranking por Planta") 
-        df_agrupado = df_finalizadas.groupby('Cliente_Local').agg({'Vendido': 'sum', 'Lucro': 'sum'}).reset_index()
-        df_agrupado['Margem_%'] = (df_agrupado['Lucro'] / df_agrupado['Vendido'] * 100).fillna(0); df_agrupado = df_agrupado.sort_values(by='Vendido', ascending=True)
-        fig_detalhe = px.bar(df_agrupado, y='Cliente_Local', x='Vendido', text_auto='.2s', orientation='h', color='Margem_%', color_continuous_scale=['#da3633', '#e3b341', '#3fb950'], labels={'Vendido': 'Valor Vendido (R$)', 'Cliente_Local': '', 'Margem_%': 'Margem %'})
-        fig_detalhe.update_layout(plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)', font=dict(color='white'), xaxis=dict(showgrid=True, gridcolor='#30363d'), height=500, margin=dict(t=0, l=0, r=0, b=0))
-        st.plotly_chart(fig_detalhe, use_container_width=True, config={'displayModeBar': False})
+        df_agrupado = agrupar_ranking(df_raw, 'Cliente_Local', mask_fin, chaves=cliente_local(df_raw))
+        st.plotly_chart(plotar_ranking(ranking_slice(df_agrupado, 'Cliente_Local', 'planta', 15), 'Cliente_Local', {'Vendido': 'Valor Vendido (R$)', 'Cliente_Local': '', 'Margem_%': 'Margem %'}, dict(t=0, l=0, r=0, b=0)), use_container_width=True, config={'displayModeBar': False})
+        _, col_exp_planta = st.columns([3, 1])
+        with col_exp_planta: botoes_exportacao(df_agrupado.sort_values(by='Vendido', ascending=False), "ranking_planta", "ranking_planta")
         st.write(""); col_cli, col_geo = st.columns(2)
-        with col_cli: st.subheader("Ranking por Cliente"); df_cli_only = df_finalizadas.groupby('Cliente').agg({'Vendido': 'sum', 'Lucro': 'sum'}).reset_index(); df_cli_only['Margem_%'] = (df_cli_only['Lucro'] / df_cli_only['Vendido'] * 100).fillna(0); df_cli_only = df_cli_only.sort_values(by='Vendido', ascending=True); fig_cli = px.bar(df_cli_only, y='Cliente', x='Vendido', text_auto='.2s', orientation='h', color='Margem_%', color_continuous_scale=['#da3633', '#e3b341', '#3fb950'], labels={'Vendido': 'R$', 'Cliente': ''}); fig_cli.update_layout(plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)', font=dict(color='white'), xaxis=dict(showgrid=True, gridcolor='#30363d'), height=350, margin=dict(l=10, r=10, t=10, b=0)); st.plotly_chart(fig_cli, use_container_width=True, config={'displayModeBar': False})
-        with col_geo: st.subheader("Ranking por Cidade"); df_geo = df_finalizadas.groupby('Cidade').agg({'Vendido': 'sum', 'Lucro': 'sum'}).reset_index(); df_geo['Margem_%'] = (df_geo['Lucro'] / df_geo['Vendido'] * 100).fillna(0); df_geo = df_geo.sort_values(by='Vendido', ascending=True); fig_geo = px.bar(df_geo, y='Cidade', x='Vendido', text_auto='.2s', orientation='h', color='Margem_%', color_continuous_scale=['#da3633', '#e3b341', '#3fb950'], labels={'Vendido': 'R$', 'Cidade': ''}); fig_geo.update_layout(plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)', font=dict(color='white'), xaxis=dict(showgrid=True, gridcolor='#30363d'), height=350, margin=dict(l=10, r=10, t=10, b=0)); st.plotly_chart(fig_geo, use_container_width=True, config={'displayModeBar': False})
+        with col_cli: st.subheader("Ranking por Cliente"); df_cli_only = agrupar_ranking(df_raw, 'Cliente', mask_fin); st.plotly_chart(plotar_ranking(ranking_slice(df_cli_only, 'Cliente', 'cliente', 10), 'Cliente', {'Vendido': 'R$', 'Cliente': ''}, dict(l=10, r=10, t=10, b=0)), use_container_width=True, config={'displayModeBar': False}); botoes_exportacao(df_cli_only.sort_values(by='Vendido', ascending=False), "ranking_cliente", "ranking_cliente")
+        with col_geo: st.subheader("Ranking por Cidade"); df_geo = agrupar_ranking(df_raw, 'Cidade', mask_fin); st.plotly_chart(plotar_ranking(ranking_slice(df_geo, 'Cidade', 'cidade', 10), 'Cidade', {'Vendido': 'R$', 'Cidade': ''}, dict(l=10, r=10, t=10, b=0)), use_container_width=True, config={'displayModeBar': False}); botoes_exportacao(df_geo.sort_values(by='Vendido', ascending=False), "ranking_cidade", "ranking_cidade")
         st.caption("ℹ️ **Nota:** Estas análises consideram apenas obras com status 'Finalizado' ou 'Apresentado'.")
 
 # --- TAB 2: SEGMENTOS (COM CORREÇÃO DE ERRO) ---
@@ -156,15 +116,14 @@ with tab2:
     st.write("")
     
     # [CORREÇÃO] Verifica se o DataFrame está vazio ANTES de acessar .iloc[0]
-    if df_finalizadas.empty:
+    df_tipo = agrupar_segmentos(df_raw, mask_fin)
+    if df_tipo.empty:
         st.info("ℹ️ Nenhuma obra finalizada encontrada para analisar por segmento.")
     
     # Se não está vazio, segue a lógica normal
-    elif df_finalizadas['Tipo'].iloc[0] == "Não Classificado" and len(df_finalizadas['Tipo'].unique()) == 1: 
+    elif len(df_tipo) == 1 and df_tipo['Tipo'].iloc[0] == "Não Classificado": 
         st.info("💡 Preencha a coluna 'Tipo' na planilha para ativar esta análise.")
     else:
-        df_tipo = df_finalizadas.groupby('Tipo').agg({'Vendido': 'sum', 'Lucro': 'sum', 'Projeto': 'count'}).reset_index()
-        df_tipo['Margem_Media'] = (df_tipo['Lucro'] / df_tipo['Vendido'] * 100).fillna(0)
         c1, c2 = st.columns(2)
         with c1: st.subheader("Participação na Receita"); fig_tree = px.treemap(df_tipo, path=['Tipo'], values='Vendido', color='Margem_Media', color_continuous_scale=['#da3633', '#e3b341', '#3fb950']); fig_tree.update_layout(margin=dict(t=10, l=10, r=10, b=10), coloraxis_showscale=False); fig_tree.update_traces(textinfo="label+value+percent root", textfont=dict(color='white', size=14)); st.plotly_chart(fig_tree, use_container_width=True, config={'displayModeBar': False})
         with c2: st.subheader("Matriz Rentabilidade x Receita"); fig_scat = px.scatter(df_tipo, x='Vendido', y='Margem_Media', size='Vendido', color='Tipo', text='Tipo', hover_name='Tipo', labels={'Vendido': 'Volume Vendido (R$)', 'Margem_Media': 'Rentabilidade (%)'}); fig_scat.add_hline(y=META_MARGEM, line_dash="dash", line_color="#8b949e", annotation_text=f"Meta"); fig_scat.update_traces(textposition='top center', marker=dict(line=dict(width=1, color='White'))); fig_scat.update_layout(plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)', font=dict(color='white'), xaxis=dict(showgrid=True, gridcolor='#30363d'), yaxis=dict(showgrid=True, gridcolor='#30363d'), showlegend=False); st.plotly_chart(fig_scat, use_container_width=True, config={'displayModeBar': False})
@@ -173,17 +132,14 @@ with tab2:
 # --- TAB 3: CUSTOS INTERNOS ---
 with tab3:
     st.write("")
-    if df_adm.empty: st.warning("⚠️ Nenhum projeto 5009, 5010 ou 5011 encontrado.")
+    if not mask_adm.any(): st.warning(f"⚠️ Nenhum projeto {CLASSE_ADM} ({', '.join(taxonomia_vigente().prefixos(CLASSE_ADM)) or 'sem prefixos na aba Taxonomia'}) encontrado.")
     else:
-        cols_soma = ['Mat_Real', 'Desp_Real', 'HH_Real_Vlr']
-        for col in cols_soma:
-            if col in df_adm.columns: df_adm[col] = pd.to_numeric(df_adm[col], errors='coerce').fillna(0)
-        df_adm['Total_Sem_Imp'] = df_adm['Mat_Real'] + df_adm['Desp_Real'] + df_adm['HH_Real_Vlr']
-        custo_adm_total = df_adm['Total_Sem_Imp'].sum()
+        # Colunas já numéricas desde limpar_base: só as somas mascaradas.
+        consumo_categoria = {'Pessoal': somar(df_raw, 'HH_Real_Vlr', mask_adm), 'Despesas': somar(df_raw, 'Desp_Real', mask_adm), 'Materiais': somar(df_raw, 'Mat_Real', mask_adm)}
+        custo_adm_total = sum(consumo_categoria.values())
         col_sel, _ = st.columns([1, 2])
         with col_sel: base_calculo = st.radio("Base de Faturamento:", ["Valor Concluído", "Valor Total"], horizontal=True)
-        if base_calculo == "Valor Total": faturamento_base = df_obras['Vendido'].sum()
-        else: faturamento_base = df_finalizadas['Vendido'].sum()
+        faturamento_base = somar(df_raw, 'Vendido', mask_obras if base_calculo == "Valor Total" else mask_fin)
         verba_permitida = faturamento_base * (META_ADM / 100.0)
         impacto_percentual = (custo_adm_total / faturamento_base * 100) if faturamento_base > 0 else 0
         saldo = verba_permitida - custo_adm_total
@@ -192,30 +148,40 @@ with tab3:
         with c2: cor_impacto = "#3fb950" if impacto_percentual <= META_ADM else "#da3633"; st.markdown(f'<div class="highlight-box" style="border-top: 4px solid {cor_impacto}"><div class="highlight-lbl">Overhead</div><div class="highlight-val" style="color: {cor_impacto}">{impacto_percentual:.1f}%</div></div>', unsafe_allow_html=True)
         with c3: cor_saldo = "#3fb950" if saldo >= 0 else "#da3633"; sinal = "+" if saldo >= 0 else "-"; st.markdown(f'<div class="highlight-box" style="border-top: 4px solid {cor_saldo}"><div class="highlight-lbl">Saldo</div><div class="highlight-val" style="color: {cor_saldo}">{sinal} {format_brl(abs(saldo)).replace("R$ ", "R$ ")}</div></div>', unsafe_allow_html=True)
         st.divider()
-        def plotar_consumo(df_input, group_col):
+        def agrupar_consumo(group_col):
             if group_col == 'Categoria':
-                vals = {'Pessoal': df_adm['HH_Real_Vlr'].sum(), 'Despesas': df_adm['Desp_Real'].sum(), 'Materiais': df_adm['Mat_Real'].sum()}
-                df_grouped = pd.DataFrame(list(vals.items()), columns=['Categoria', 'Valor'])
+                df_grouped = pd.DataFrame(list(consumo_categoria.items()), columns=['Categoria', 'Valor'])
                 df_grouped = df_grouped[df_grouped['Valor'] > 0]
-                col_val, col_name = 'Valor', 'Categoria'
+                col_val = 'Valor'
             else:
-                df_grouped = df_adm.groupby('Projeto').agg({'Total_Sem_Imp': 'sum', 'Descricao': 'first'}).reset_index()
-                col_val, col_name = 'Total_Sem_Imp', 'Projeto'
+                # Só as poucas linhas ADM, e só as colunas do gráfico.
+                df_grouped = df_raw.loc[mask_adm, ['Projeto', 'Descricao']].assign(Total_Sem_Imp=df_raw.loc[mask_adm, ['Mat_Real', 'Desp_Real', 'HH_Real_Vlr']].sum(axis=1))
+                df_grouped = df_grouped.groupby('Projeto').agg({'Total_Sem_Imp': 'sum', 'Descricao': 'first'}).reset_index()
+                col_val = 'Total_Sem_Imp'
             df_grouped = df_grouped.sort_values(by=col_val, ascending=False)
-            cores_seq = ['#001f3f', '#003366', '#00509d']
             total_deste_grafico = df_grouped[col_val].sum()
             df_grouped['Pct'] = (df_grouped[col_val] / total_deste_grafico * 100).fillna(0)
-            df_grouped['Rotulo'] = df_grouped.apply(lambda x: f"<b>{x[col_name]}</b><br>{format_brl(x[col_val])}<br>({x['Pct']:.1f}%)", axis=1)
+            return df_grouped
+        def plotar_consumo(df_grouped, group_col):
+            col_val, col_name = ('Valor', 'Categoria') if group_col == 'Categoria' else ('Total_Sem_Imp', 'Projeto')
+            cores_seq = ['#001f3f', '#003366', '#00509d']
             fig = go.Figure()
             for i, (idx, row) in enumerate(df_grouped.iterrows()):
                 cor = cores_seq[i % len(cores_seq)]
-                fig.add_trace(go.Bar(y=['Consumo'], x=[row[col_val]], name=str(row[col_name]), orientation='h', marker=dict(color=cor), text=[row['Rotulo']], textposition='inside', insidetextanchor='end', insidetextfont=dict(color='white', size=13, family="Arial Black")))
+                rotulo = f"<b>{row[col_name]}</b><br>{format_brl(row[col_val])}<br>({row['Pct']:.1f}%)"
+                fig.add_trace(go.Bar(y=['Consumo'], x=[row[col_val]], name=str(row[col_name]), orientation='h', marker=dict(color=cor), text=[rotulo], textposition='inside', insidetextanchor='end', insidetextfont=dict(color='white', size=13, family="Arial Black")))
             fig.update_layout(barmode='stack', height=200, margin=dict(l=0, r=0, t=10, b=10), paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', xaxis=dict(showgrid=True, gridcolor='#30363d', showticklabels=True, tickfont=dict(color='#8b949e'), tickprefix="R$ ", range=[0, max(verba_permitida, custo_adm_total) * 1.15]), yaxis=dict(showticklabels=False), showlegend=False)
             fig.add_vline(x=verba_permitida, line_width=3, line_dash="dash", line_color="#da3633", annotation_text=f"Limite: {format_brl(verba_permitida)}", annotation_position="top right", annotation_font=dict(color="#da3633"))
             return fig
+        df_consumo_projeto = agrupar_consumo('Projeto')
+        df_consumo_categoria = agrupar_consumo('Categoria')
         st.subheader("Por Centro de Custo")
-        st.plotly_chart(plotar_consumo(df_adm, 'Projeto'), use_container_width=True, config={'displayModeBar': False})
+        st.plotly_chart(plotar_consumo(df_consumo_projeto, 'Projeto'), use_container_width=True, config={'displayModeBar': False})
+        _, col_exp_cc = st.columns([3, 1])
+        with col_exp_cc: botoes_exportacao(df_consumo_projeto, "consumo_adm_centro_custo", "consumo_projeto")
         st.write("")
         st.subheader("Por Natureza do Gasto")
-        st.plotly_chart(plotar_consumo(df_adm, 'Categoria'), use_container_width=True, config={'displayModeBar': False})
+        st.plotly_chart(plotar_consumo(df_consumo_categoria, 'Categoria'), use_container_width=True, config={'displayModeBar': False})
+        _, col_exp_nat = st.columns([3, 1])
+        with col_exp_nat: botoes_exportacao(df_consumo_categoria, "consumo_adm_natureza", "consumo_categoria")
         st.caption("ℹ️ **Nota:** O cálculo de overhead e saldo varia conforme a base de faturamento selecionada acima.")
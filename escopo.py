@@ -0,0 +1,68 @@
+import streamlit as st
+import numpy as np
+import pandas as pd
+from cache_versao import memorizar
+from particao import agregados_arquivo
+
+# ---------------------------------------------------------
+# ESCOPO DE DADOS POR USUÁRIO
+# ---------------------------------------------------------
+# Declarado junto das credenciais no secrets.toml:
+#   [credentials.usernames.joao.escopo]
+#   clientes = ["Cliente A"]      cidades = ["Campinas"]      prefixos = ["62"]
+# Dentro de um campo vale qualquer valor da lista; entre campos, todos (Cliente
+# E Cidade E prefixo do Projeto). Sem 'escopo', o usuário vê tudo; 'escopo'
+# sem nenhum campo preenchido não vê nada. A máscara de cada escopo é
+# calculada uma vez por versão dos dados (códigos distintos de cada coluna) e
+# o recorte também fica memorizado: as páginas recebem sempre o mesmo df
+# recortado e os cálculos derivados (máscaras, tabela, cartões) caem no mesmo
+# cache por versão que os usuários sem escopo usam.
+CAMPOS = {"clientes": 'Cliente', "cidades": 'Cidade', "prefixos": 'Projeto'}
+
+def escopo_usuario(usuario):
+    """((campo, valores), ...) do usuário; None = sem restrição."""
+    try: dados = st.secrets["credentials"]["usernames"][usuario]
+    except (KeyError, FileNotFoundError): return None
+    escopo = dados.get("escopo")
+    if escopo is None: return None
+    return tuple((campo, tuple(sorted({str(v).strip() for v in escopo[campo]}))) for campo in CAMPOS if escopo.get(campo))
+
+def escopo_sessao(): return escopo_usuario(st.session_state.get("username"))
+
+def _valores(df, coluna):
+    """Códigos por linha e valores distintos da coluna (texto sem espaços nas pontas), uma vez por versão."""
+    return memorizar(df, "escopo_valores", lambda: pd.factorize(df[coluna].astype(str).str.strip().to_numpy(), use_na_sentinel=False), coluna)
+
+def _calcular_mascara(df, escopo):
+    mascara = np.ones(len(df), dtype=bool)
+    for campo, valores in escopo:
+        codigos, distintos = _valores(df, CAMPOS[campo])
+        if campo == "prefixos": permitidos = pd.Index(distintos).str.startswith(valores)
+        else: permitidos = pd.Index(distintos).isin(valores)
+        mascara &= np.asarray(permitidos, dtype=bool)[codigos]
+    if not escopo: mascara[:] = False
+    return mascara
+
+def mascara_escopo(df, escopo):
+    """Máscara booleana (numpy) das linhas do escopo, uma vez por versão dos dados."""
+    return memorizar(df, "mascara_escopo", lambda: _calcular_mascara(df, escopo), escopo)
+
+def recortar(df, escopo):
+    """df só com as linhas do escopo (o mesmo objeto a cada rerun); escopo None devolve o df inteiro."""
+    if escopo is None: return df
+    return memorizar(df, "recorte_escopo", lambda: df[mascara_escopo(df, escopo)], escopo)
+
+def agregados_arquivo_escopo(df_historico, qtd_arquivo, escopo):
+    """agregados_arquivo só das obras arquivadas do escopo (as qtd_arquivo últimas linhas da base com histórico)."""
+    def calcular():
+        inicio = len(df_historico) - qtd_arquivo
+        return agregados_arquivo(df_historico.iloc[inicio:][mascara_escopo(df_historico, escopo)[inicio:]])
+    return memorizar(df_historico, "arquivo_escopo", calcular, escopo)
+
+def recortar_sessao(df):
+    """recortar pelo escopo do usuário logado; para a página se não sobrar nenhum projeto."""
+    recorte = recortar(df, escopo_sessao())
+    if recorte.empty and not df.empty:
+        st.info("Nenhum projeto no seu escopo de acesso.")
+        st.stop()
+    return recorte
@@ -0,0 +1,70 @@
+import streamlit as st
+import pandas as pd
+from openpyxl import Workbook
+import csv
+import io
+import math
+import tempfile
+
+# ---------------------------------------------------------
+# EXPORTAÇÃO EM FLUXO (CSV / XLSX)
+# ---------------------------------------------------------
+# As tabelas são escritas em blocos de linhas direto num arquivo temporário
+# (que vai para o disco acima de LIMITE_MEMORIA), sem montar cópias completas
+# do DataFrame em memória. A geração é feita só no clique do botão, numa
+# thread separada, então não trava o rerun das outras sessões.
+TAMANHO_BLOCO = 5_000
+CASAS_DECIMAIS = 2  # valores em R$ e percentuais
+LIMITE_MEMORIA = 4 * 1024 * 1024
+
+MIME_CSV = "text/csv"
+MIME_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+def _valor_celula(x):
+    if x is None or (not isinstance(x, str) and pd.isna(x)): return None
+    if hasattr(x, "item"): x = x.item()  # numpy -> python
+    if isinstance(x, float) and not math.isfinite(x): return None  # inf (ex.: divisão por zero) vira célula vazia
+    return x
+
+def _valor_csv(x):
+    x = _valor_celula(x)
+    if x is None: return ""
+    if isinstance(x, float): return f"{round(x, CASAS_DECIMAIS) + 0.0:.{CASAS_DECIMAIS}f}".replace(".", ",")  # Excel pt-BR; + 0.0 evita "-0,00"
+    return x
+
+def _blocos(df, tamanho=TAMANHO_BLOCO):
+    for inicio in range(0, len(df), tamanho):
+        yield df.iloc[inicio:inicio + tamanho].itertuples(index=False, name=None)
+
+def exportar_csv(df):
+    arquivo = tempfile.SpooledTemporaryFile(max_size=LIMITE_MEMORIA, mode="w+b")
+    texto = io.TextIOWrapper(arquivo, encoding="utf-8-sig", newline="")
+    writer = csv.writer(texto, delimiter=";")
+    writer.writerow([str(c) for c in df.columns])
+    for bloco in _blocos(df):
+        writer.writerows([_valor_csv(v) for v in linha] for linha in bloco)
+    texto.flush()
+    texto.detach()
+    arquivo.seek(0)
+    return arquivo
+
+def exportar_xlsx(df, nome_aba="Dados"):
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=nome_aba[:31])
+    ws.append([str(c) for c in df.columns])
+    for bloco in _blocos(df):
+        for linha in bloco: ws.append([_valor_celula(v) for v in linha])
+    arquivo = tempfile.SpooledTemporaryFile(max_size=LIMITE_MEMORIA, mode="w+b")
+    wb.save(arquivo)
+    arquivo.seek(0)
+    return arquivo
+
+def botoes_exportacao(df, nome_arquivo, chave):
+    """Botões CSV/XLSX com geração adiada (roda só quando o usuário clica). df pode ser uma função que
+    monta a tabela: aí nem a tabela é montada no rerun, só no clique."""
+    montar = df if callable(df) else (lambda: df)
+    col_csv, col_xlsx = st.columns(2)
+    with col_csv:
+        st.download_button("⬇ CSV", data=lambda: exportar_csv(montar()), file_name=f"{nome_arquivo}.csv", mime=MIME_CSV, key=f"csv_{chave}", on_click="ignore", use_container_width=True)
+    with col_xlsx:
+        st.download_button("⬇ Excel", data=lambda: exportar_xlsx(montar(), nome_arquivo), file_name=f"{nome_arquivo}.xlsx", mime=MIME_XLSX, key=f"xlsx_{chave}", on_click="ignore", use_container_width=True)
@@ -1,12 +1,16 @@
 import streamlit as st
 import pandas as pd
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
-import io
-import json
-import os
-import datetime
+import numpy as np
+from exportacao import botoes_exportacao
+from cache_compartilhado import obter_planilha, TTL_LOCAL_S
+from alteracoes import ler_base_compartilhada, base_incremental, regras_de
+from base_dados import kpis_de_totais, mascaras_carteira, tabela_carteira, simular_totais, CATEGORIAS_CUSTO, STATUS_VENDA, STATUS_ABERTO, STATUS_CONCLUIDO
+from valor_agregado import valor_agregado, somas_valor_agregado, resumo_de_somas
+from particao import totais_com_arquivo, somas_com_arquivo, vendido_custo_arquivo, DIAS_ARQUIVO
+from previsao_margem import previsao_margem
+from graficos_obra import figura_previsao_projetos, figura_distribuicao_carteira
+from cartoes_carteira import cartoes_carteira
+from escopo import escopo_sessao, recortar, recortar_sessao, agregados_arquivo_escopo
 
 # ---------------------------------------------------------
 # 1. CONFIGURAÇÃO VISUAL
@@ -44,6 +48,8 @@ st.markdown("""
     .progress-fill { height: 100%; border-radius: 3px; transition: width 0.5s ease-in-out; } 
     .badge-status { font-size: 0.65rem; font-weight: 700; text-transform: uppercase; padding: 2px 8px; border-radius: 4px; }
     .footer-pct { font-size: 0.8rem; font-weight: 700; }
+    .rule-strip { display: flex; gap: 4px; flex-wrap: wrap; min-height: 18px; margin-top: 8px; }
+    .rule-chip { font-size: 0.6rem; font-weight: 700; text-transform: uppercase; padding: 1px 6px; border-radius: 4px; }
     div[data-testid="stVerticalBlockBorderWrapper"] button {background-color: transparent; color: #58a6ff; border: 1px solid #30363d; border-radius: 4px; font-size: 0.65rem !important; padding: 0px 0px !important; height: 24px !important; min-height: 24px !important; line-height: 1 !important; margin: 0; width: 100%;}
 </style>
 """, unsafe_allow_html=True)
@@ -51,178 +57,114 @@ st.markdown("""
 # ---------------------------------------------------------
 # 2. DADOS E TRATAMENTO
 # ---------------------------------------------------------
-@st.cache_data(ttl=30)
+@st.cache_data(ttl=TTL_LOCAL_S)
 def load_data():
     try:
-        creds_dict = dict(st.secrets["gcp_service_account"])
-        creds = service_account.Credentials.from_service_account_info(
-            creds_dict, scopes=['https://www.googleapis.com/auth/drive.readonly']
-        )
-        service = build('drive', 'v3', credentials=creds)
-        results = service.files().list(q="name='dados_dashboard_obras.xlsx' and trashed=false", fields="files(id, name)").execute()
-        files = results.get('files', [])
-        if not files: return None
-        file_id = files[0]['id']
-        request = service.files().get_media(fileId=file_id)
-        file_io = io.BytesIO()
-        downloader = MediaIoBaseDownload(file_io, request)
-        done = False
-        while done is False: status, done = downloader.next_chunk()
-        file_io.seek(0)
-        return pd.read_excel(file_io)
+        base = obter_planilha(dict(st.secrets["gcp_service_account"]))
+        if base is None: return None
+        return ler_base_compartilhada(base)
     except: return None
 
 df_raw = load_data()
 if df_raw is None: st.stop()
 
-# --- LIMPEZA ---
-df_raw.columns = df_raw.columns.str.strip() 
-df_raw['Projeto'] = df_raw['Projeto'].astype(str)
-
-def clean_google_number(x):
-    if isinstance(x, (int, float)): return float(x)
-    if x is None: return 0.0
-    s = str(x).strip()
-    if s == "": return 0.0
+# Obras arquivadas (particao.py): só os agregados entram nos KPIs; a base completa é aberta só se a lista pedir.
+@st.cache_data(ttl=TTL_LOCAL_S)
+def load_arquivo():
     try:
-        s = s.replace('R$', '').replace('%', '').replace(' ', '').replace('.', '').replace(',', '.')
-        return float(s)
-    except: return 0.0
+        base = obter_planilha(dict(st.secrets["gcp_service_account"]))
+        return None if base is None else base.get("arquivo")
+    except: return None
 
-def clean_excel_time(x):
+@st.cache_data(ttl=TTL_LOCAL_S)
+def load_historico():
     try:
-        if isinstance(x, (int, float)): return float(x) * 24.0
-        s = str(x).strip()
-        if s == "" or s.lower() in ["nan", "nat"]: return 0.0
-        if ":" in s:
-            if "day" in s: return pd.to_timedelta(s).total_seconds() / 3600.0
-            parts = s.split(":")
-            return float(parts[0]) + (float(parts[1])/60.0) + (float(parts[2])/3600.0)
-        return float(s.replace(',', '.')) * 24.0
-    except: return 0.0
-
-cols_numericas_padrao = ['Vendido', 'Faturado', 'Mat_Real', 'Desp_Real', 'HH_Real_Vlr', 'Impostos', 'Mat_Orc', 'Conclusao_%']
-for col in cols_numericas_padrao:
-    if col in df_raw.columns: df_raw[col] = df_raw[col].apply(clean_google_number)
-
-cols_horas = ['HH_Orc_Qtd', 'HH_Real_Qtd']
-for col in cols_horas:
-    if col in df_raw.columns: df_raw[col] = df_raw[col].astype(str).apply(clean_excel_time)
-
-def fix_percentage_scale(x): return x * 100 if 0 < x <= 1.5 else x
-if 'Conclusao_%' in df_raw.columns: df_raw['Conclusao_%'] = df_raw['Conclusao_%'].apply(fix_percentage_scale)
+        base = obter_planilha(dict(st.secrets["gcp_service_account"]), historico=True)
+        if base is None: return None
+        return ler_base_compartilhada(base)
+    except: return None
+
+arquivo = load_arquivo()
+
+# Escopo do usuário (escopo.py): recorte memorizado por versão; do arquivo entram só os agregados do escopo.
+escopo = escopo_sessao()
+df_raw = recortar_sessao(df_raw)
+if escopo is not None and arquivo and arquivo["qtd"]:
+    df_historico = load_historico()
+    arquivo = None if df_historico is None else agregados_arquivo_escopo(df_historico, arquivo["qtd"], escopo)
 
 def format_brl_full(valor): return f"R$ {valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".") if not pd.isna(valor) else "R$ 0,00"
+def format_indice(valor): return f"{valor:.2f}".replace(".", ",")
 def format_brl_short(valor):
     if pd.isna(valor): return "R$ 0"
-    if valor >= 1_000_000: return f"R$ {valor/1_000_000:.1f}M".replace(".", ",")
-    elif valor >= 1_000: return f"R$ {valor/1_000:.1f}k".replace(".", ",")
+    if abs(valor) >= 1_000_000: return f"R$ {valor/1_000_000:.1f}M".replace(".", ",")
+    elif abs(valor) >= 1_000: return f"R$ {valor/1_000:.1f}k".replace(".", ",")
     else: return f"R$ {valor:,.0f}".replace(",", ".")
 
-# ---------------------------------------------------------
-# 3. LÓGICA DE NEGÓCIO
-# ---------------------------------------------------------
-PREFIXOS_ADM = ("5009", "5010", "5011")
-mask_adm = df_raw['Projeto'].str.startswith(PREFIXOS_ADM)
-df_adm = df_raw[mask_adm].copy()
-df_obras = df_raw[~mask_adm].copy()
-
-cols_soma = ['Mat_Real', 'Desp_Real', 'HH_Real_Vlr']
-for col in cols_soma:
-    if col in df_adm.columns: df_adm[col] = pd.to_numeric(df_adm[col], errors='coerce').fillna(0)
-custo_adm_total = (df_adm['Mat_Real'] + df_adm['Desp_Real'] + df_adm['HH_Real_Vlr']).sum()
-
-def get_custo_total_row_obras(row): return row['Mat_Real'] + row['Desp_Real'] + row['HH_Real_Vlr'] + row['Impostos']
-
-status_venda = ['Não iniciado', 'Em andamento', 'Finalizado', 'Apresentado']
-df_carteira_total = df_obras[df_obras['Status'].isin(status_venda)]
-valor_vendido_total = df_carteira_total['Vendido'].sum()
-
-df_concluido = df_obras[df_obras['Status'].isin(['Finalizado', 'Apresentado'])]
-valor_concluido = df_concluido['Vendido'].sum()
-valor_faturado_total = df_obras['Faturado'].sum()
-
-overhead_pct = (custo_adm_total / valor_vendido_total * 100) if valor_vendido_total > 0 else 0
-
-def get_margem_ponderada(df_in):
-    if df_in.empty: return 0.0
-    venda = df_in['Vendido'].sum()
-    custo = df_in.apply(get_custo_total_row_obras, axis=1).sum()
-    return ((venda - custo) / venda * 100) if venda > 0 else 0
-
-mg_geral = get_margem_ponderada(df_obras)
-mg_concluida = get_margem_ponderada(df_concluido)
-
-custo_obras_total = df_obras.apply(get_custo_total_row_obras, axis=1).sum()
-lucro_bruto_total = valor_vendido_total - custo_obras_total
-lucro_liquido_final = lucro_bruto_total - custo_adm_total
-mg_liquida_pos_adm = (lucro_liquido_final / valor_vendido_total * 100) if valor_vendido_total > 0 else 0
-
-df_aberto = df_obras[df_obras['Status'].isin(['Em andamento', 'Não iniciado'])]
-qtd_aberto = len(df_aberto)
-qtd_total = len(df_obras)
-
 # --- CARREGAR METAS (SHEET2) - VIA PANDAS ---
-@st.cache_data(ttl=30)
+@st.cache_data(ttl=TTL_LOCAL_S)
 def load_config():
     zeros = {"meta_vendas": 0.0, "meta_margem": 0.0, "meta_custo_adm": 0.0}
     try:
-        # Autentica e baixa o arquivo Excel novamente (ou usa cache se separar a função de download)
-        # Para simplificar, fazemos o download direto aqui também.
-        creds_dict = dict(st.secrets["gcp_service_account"])
-        creds = service_account.Credentials.from_service_account_info(
-            creds_dict, scopes=['https://www.googleapis.com/auth/drive.readonly']
-        )
-        service = build('drive', 'v3', credentials=creds)
-        # Busca ID (pode otimizar hardcoding se o nome não muda)
-        results = service.files().list(q="name='dados_dashboard_obras.xlsx' and trashed=false", fields="files(id)").execute()
-        files = results.get('files', [])
-        if not files: return zeros
-        
-        request = service.files().get_media(fileId=files[0]['id'])
-        file_io = io.BytesIO()
-        downloader = MediaIoBaseDownload(file_io, request)
-        done = False
-        while done is False: status, done = downloader.next_chunk()
-        file_io.seek(0)
-        
-        # Lê a Sheet2
-        df_conf = pd.read_excel(file_io, sheet_name='Sheet2')
-        if df_conf.empty: return zeros
-        
-        row = df_conf.iloc[0]
-        def parse_val(val):
-            if isinstance(val, (int, float)): return float(val)
-            s = str(val).replace('R$', '').replace('%', '').strip()
-            s = s.replace('.', '').replace(',', '.')
-            try: return float(s)
-            except: return 0.0
-            
-        return {
-            "meta_vendas": parse_val(row.iloc[0]),
-            "meta_margem": parse_val(row.iloc[1]),
-            "meta_custo_adm": parse_val(row.iloc[2])
-        }
+        base = obter_planilha(dict(st.secrets["gcp_service_account"]))
+        if base is None: return zeros
+        return base["metas"]
     except: return zeros
 
 config = load_config()
-META_VENDAS = float(config["meta_vendas"])
-# Ajuste percentual se vier 0.25 (Excel) ou 25 (Inteiro)
-META_MARGEM_BRUTA = float(config["meta_margem"])
-if META_MARGEM_BRUTA <= 1.0: META_MARGEM_BRUTA *= 100
 
-META_CUSTO_ADM = float(config["meta_custo_adm"])
-if META_CUSTO_ADM <= 1.0: META_CUSTO_ADM *= 100
-
-META_MARGEM_LIQUIDA = META_MARGEM_BRUTA - META_CUSTO_ADM
+# ---------------------------------------------------------
+# 3. LÓGICA DE NEGÓCIO
+# ---------------------------------------------------------
+totais = totais_com_arquivo(base_incremental.totais_de(df_raw), arquivo)
+kpis = kpis_de_totais(totais, config)
+META_VENDAS = kpis["META_VENDAS"]
+META_MARGEM_BRUTA = kpis["META_MARGEM_BRUTA"]
+META_CUSTO_ADM = kpis["META_CUSTO_ADM"]
+META_MARGEM_LIQUIDA = kpis["META_MARGEM_LIQUIDA"]
+
+valor_vendido_total = kpis["valor_vendido_total"]
+valor_faturado_total = kpis["valor_faturado_total"]
+valor_concluido = kpis["valor_concluido"]
+custo_adm_total = kpis["custo_adm_total"]
+overhead_pct = kpis["overhead_pct"]
+mg_geral = kpis["mg_geral"]
+mg_concluida = kpis["mg_concluida"]
+mg_liquida_pos_adm = kpis["mg_liquida_pos_adm"]
+qtd_aberto = kpis["qtd_aberto"]
+qtd_total = kpis["qtd_total"]
+
+# Recortes como máscaras sobre df_raw (uma vez por versão dos dados); só os tiles exibidos viram DataFrame.
+mask_obras = mascaras_carteira(df_raw)["obras"]
 
 # ---------------------------------------------------------
 # 4. INTERFACE
 # ---------------------------------------------------------
 st.title("Gestão da Carteira")
 
+# --- O QUE MUDOU (desde a última versão que esta sessão viu) ---
+ultima_alteracao = base_incremental.sequencia
+alteracoes_vistas = st.session_state.setdefault("alteracoes_vistas", (max(ultima_alteracao - 1, 0), ultima_alteracao))
+if ultima_alteracao > alteracoes_vistas[1]:
+    alteracoes_vistas = st.session_state["alteracoes_vistas"] = (alteracoes_vistas[1], ultima_alteracao)
+alteracoes = base_incremental.alteracoes_desde(alteracoes_vistas[0]) if escopo is None else []  # o feed é da carteira inteira
+if alteracoes:
+    with st.expander(f"🔔 O que mudou desde a última atualização ({sum(len(a['alterados']) + len(a['novos']) + len(a['removidos']) for a in alteracoes)})"):
+        for alteracao in alteracoes:
+            quando = alteracao["quando"].strftime("%d/%m %H:%M:%S")
+            if alteracao["completa"]:
+                st.markdown(f"**{quando}** · estrutura da planilha mudou, base recarregada por completo")
+                continue
+            delta_vendido, delta_custo = alteracao["delta"].get("Vendido", 0.0), alteracao["delta"].get("Custo_Total", 0.0)
+            st.markdown(f"**{quando}** · {len(alteracao['alterados'])} alterados · {len(alteracao['novos'])} novos · {len(alteracao['removidos'])} removidos"
+                        f" · Vendido {'+' if delta_vendido >= 0 else '−'}{format_brl_full(abs(delta_vendido))} · Custo {'+' if delta_custo >= 0 else '−'}{format_brl_full(abs(delta_custo))}")
+            linhas = [f"- `{item['Projeto']}`: " + " · ".join(f"{col} {antes} → {depois}" for col, antes, depois in item["campos"][:6]) for item in alteracao["alterados"]]
+            linhas += [f"- `{projeto}`: novo projeto" for projeto in alteracao["novos"]]
+            linhas += [f"- `{projeto}`: removido da planilha" for projeto in alteracao["removidos"]]
+            st.markdown("\n".join(linhas))
+
 row1_c1, row1_c2, row1_c3 = st.columns(3)
-pct_meta_venda = (valor_vendido_total / META_VENDAS * 100) if META_VENDAS > 0 else 0
+pct_meta_venda = kpis["pct_meta_venda"]
 with row1_c1:
     st.markdown(f"""<div class="kpi-card" style="border-top: 4px solid #58a6ff;"><div class="kpi-title">Valor Vendido</div><div class="kpi-val">{format_brl_full(valor_vendido_total)}</div><div class="kpi-sub"><span>Meta: {pct_meta_venda:.0f}%</span><span class="txt-blue">{format_brl_full(valor_faturado_total)} faturados</span></div></div>""", unsafe_allow_html=True)
 
@@ -245,81 +187,151 @@ cor_m_liq = "txt-green" if mg_liquida_pos_adm >= META_MARGEM_LIQUIDA else "txt-r
 with row2_c3: st.markdown(f"""<div class="kpi-card" style="border-top: 4px solid #8b949e;"><div class="kpi-title">Margem líquida</div><div class="kpi-val {cor_m_liq}">{mg_liquida_pos_adm:.1f}%</div><div class="kpi-sub"><span>Descontado custos internos</span></div></div>""", unsafe_allow_html=True)
 with row2_c4: st.markdown(f"""<div class="kpi-card" style="border-top: 4px solid #8b949e;"><div class="kpi-title">Orçamentos</div><div class="kpi-val">{qtd_aberto} <span style='font-size:1.2rem; color:#8b949e'>/ {qtd_total}</span></div><div class="kpi-sub"><span>Quantidade em aberto/total</span></div></div>""", unsafe_allow_html=True)
 
+st.write("")
+df_va = valor_agregado(df_raw)
+va = resumo_de_somas(somas_com_arquivo(somas_valor_agregado(df_va, df_raw, mask_obras), arquivo))
+row3_c1, row3_c2, row3_c3, row3_c4 = st.columns(4)
+with row3_c1: st.markdown(f"""<div class="kpi-card" style="border-top: 4px solid #a371f7;"><div class="kpi-title">Valor agregado (EV)</div><div class="kpi-val">{format_brl_short(va['EV'])}</div><div class="kpi-sub"><span>Orçado: {format_brl_short(va['BAC'])}</span><span>Real: {format_brl_short(va['AC'])}</span></div></div>""", unsafe_allow_html=True)
+cor_cpi = "txt-green" if va['CPI'] >= 1 else "txt-red"
+with row3_c2: st.markdown(f"""<div class="kpi-card" style="border-top: 4px solid #a371f7;"><div class="kpi-title">CPI da carteira</div><div class="kpi-val {cor_cpi}">{format_indice(va['CPI'])}</div><div class="kpi-sub"><span>Valor agregado / custo real</span></div></div>""", unsafe_allow_html=True)
+cor_ip = "txt-green" if va['IP_HH'] >= 1 else "txt-red"
+with row3_c3: st.markdown(f"""<div class="kpi-card" style="border-top: 4px solid #a371f7;"><div class="kpi-title">Produtividade (horas)</div><div class="kpi-val {cor_ip}">{format_indice(va['IP_HH'])}</div><div class="kpi-sub"><span>Horas ganhas / horas gastas</span></div></div>""", unsafe_allow_html=True)
+cor_vac = "txt-green" if va['VAC'] >= 0 else "txt-red"
+with row3_c4: st.markdown(f"""<div class="kpi-card" style="border-top: 4px solid #a371f7;"><div class="kpi-title">Custo no término (EAC)</div><div class="kpi-val">{format_brl_short(va['EAC'])}</div><div class="kpi-sub"><span class="{cor_vac}">VAC: {format_brl_short(va['VAC'])}</span></div></div>""", unsafe_allow_html=True)
+
+st.write("")
+with st.expander("🎯 Previsão de margem no término (obras em aberto)"):
+    previsao_projetos, previsao_carteira = previsao_margem(df_raw, META_MARGEM_BRUTA, arquivadas=vendido_custo_arquivo(arquivo))
+    if previsao_projetos.empty:
+        st.info("Nenhuma obra em aberto para simular.")
+    else:
+        p1, p2, p3, p4 = st.columns(4)
+        cor_p50 = "txt-green" if previsao_carteira['p50'] >= META_MARGEM_BRUTA else "txt-red"
+        with p1: st.markdown(f"""<div class="kpi-card" style="border-top: 4px solid #8b949e;"><div class="kpi-title">Margem total hoje</div><div class="kpi-val">{previsao_carteira['margem_atual']:.1f}%</div><div class="kpi-sub"><span>Custos até agora</span></div></div>""", unsafe_allow_html=True)
+        with p2: st.markdown(f"""<div class="kpi-card" style="border-top: 4px solid #58a6ff;"><div class="kpi-title">Margem prevista (P50)</div><div class="kpi-val {cor_p50}">{previsao_carteira['p50']:.1f}%</div><div class="kpi-sub"><span>Meta: {META_MARGEM_BRUTA:.1f}%</span></div></div>""", unsafe_allow_html=True)
+        with p3: st.markdown(f"""<div class="kpi-card" style="border-top: 4px solid #58a6ff;"><div class="kpi-title">Faixa P10 – P90</div><div class="kpi-val">{previsao_carteira['p10']:.1f}% – {previsao_carteira['p90']:.1f}%</div><div class="kpi-sub"><span>80% dos cenários</span></div></div>""", unsafe_allow_html=True)
+        cor_prob = "txt-green" if previsao_carteira['prob_meta'] >= 50 else "txt-red"
+        with p4: st.markdown(f"""<div class="kpi-card" style="border-top: 4px solid #58a6ff;"><div class="kpi-title">Chance de bater a meta</div><div class="kpi-val {cor_prob}">{previsao_carteira['prob_meta']:.0f}%</div><div class="kpi-sub"><span>{previsao_carteira['qtd_simuladas']} obras · {previsao_carteira['sorteios']} cenários</span></div></div>""", unsafe_allow_html=True)
+        st.plotly_chart(figura_distribuicao_carteira(previsao_carteira), use_container_width=True, config={'displayModeBar': False})
+        st.plotly_chart(figura_previsao_projetos(previsao_projetos, META_MARGEM_BRUTA), use_container_width=True, config={'displayModeBar': False})
+
+# --- SIMULAÇÃO (E SE...?) ---
+# Fragmento: mexer num slider reroda só este bloco, sobre os totais por (ADM, Status) já em cache.
+@st.fragment
+def simulador_kpis(totais, kpis):
+    c_custos, c_metas = st.columns(2)
+    with c_custos:
+        st.markdown("**Custos**")
+        fatores = {col: 1 + st.slider(f"{rotulo} (%)", -30, 50, 0, 1, key=f"sim_{col}") / 100 for col, rotulo in CATEGORIAS_CUSTO.items()}
+        status_sim = st.multiselect("Aplicar nas obras:", STATUS_VENDA, default=STATUS_ABERTO, key="sim_status")
+        incluir_adm = st.checkbox("Aplicar também aos custos internos", key="sim_adm")
+    with c_metas:
+        st.markdown("**Metas (Sheet2)**")
+        meta_vendas = st.number_input("Meta de vendas (R$)", min_value=0.0, value=float(kpis["META_VENDAS"]), step=100_000.0, format="%.0f", key="sim_meta_vendas")
+        meta_margem = st.slider("Meta margem bruta (%)", 0.0, 60.0, min(float(kpis["META_MARGEM_BRUTA"]), 60.0), 0.5, key="sim_meta_margem")
+        meta_adm = st.slider("Meta custo adm. (%)", 0.0, 20.0, min(float(kpis["META_CUSTO_ADM"]), 20.0), 0.5, key="sim_meta_adm")
+
+    # Metas em fração: metas_percentuais trata valores <= 1 como fração do Excel.
+    sim = kpis_de_totais(simular_totais(totais, fatores, status_sim, incluir_adm),
+                         {"meta_vendas": meta_vendas, "meta_margem": meta_margem / 100, "meta_custo_adm": meta_adm / 100})
+    st.write("")
+    s1, s2, s3, s4, s5 = st.columns(5)
+    s1.metric("Margem total", f"{sim['mg_geral']:.1f}%", f"{sim['mg_geral'] - kpis['mg_geral']:+.1f} p.p.")
+    s2.metric("Margem concluída", f"{sim['mg_concluida']:.1f}%", f"{sim['mg_concluida'] - kpis['mg_concluida']:+.1f} p.p.")
+    s3.metric("Margem líquida", f"{sim['mg_liquida_pos_adm']:.1f}%", f"{sim['mg_liquida_pos_adm'] - kpis['mg_liquida_pos_adm']:+.1f} p.p.")
+    s4.metric("Overhead", f"{sim['overhead_pct']:.1f}%", f"{sim['overhead_pct'] - kpis['overhead_pct']:+.1f} p.p.", delta_color="inverse")
+    s5.metric("Meta de vendas", f"{sim['pct_meta_venda']:.0f}%", f"{sim['pct_meta_venda'] - kpis['pct_meta_venda']:+.0f} p.p.")
+    def situacao(valor, meta, menor_melhor=False): return "✅" if (valor <= meta if menor_melhor else valor >= meta) else "❌"
+    st.caption(f"{situacao(sim['mg_geral'], sim['META_MARGEM_BRUTA'])} Margem total vs meta {sim['META_MARGEM_BRUTA']:.1f}% · "
+               f"{situacao(sim['mg_liquida_pos_adm'], sim['META_MARGEM_LIQUIDA'])} Margem líquida vs meta {sim['META_MARGEM_LIQUIDA']:.1f}% · "
+               f"{situacao(sim['overhead_pct'], sim['META_CUSTO_ADM'], True)} Overhead vs meta {sim['META_CUSTO_ADM']:.1f}% · "
+               "Custos aplicados sobre o custo real lançado; nada é gravado na planilha.")
+
+with st.expander("🧪 Simulação: e se...?"):
+    simulador_kpis(totais, kpis)
+
 st.divider()
 
-def calcular_dados_extras(row):
-    vendido = row['Vendido']
-    custo = row['Mat_Real'] + row['Desp_Real'] + row['HH_Real_Vlr'] + row['Impostos']
-    lucro = vendido - custo
-    margem = (lucro / vendido * 100) if vendido > 0 else 0
-    hh_orc, hh_real = row['HH_Orc_Qtd'], row['HH_Real_Qtd']
-    hh_perc = (hh_real / hh_orc * 100) if hh_orc > 0 else 0
-    fisico = row['Conclusao_%']
-    critico = (margem < META_MARGEM_BRUTA and row['Status'] != 'Apresentado') or (hh_perc > fisico + 10)
-    return pd.Series([margem, critico, hh_perc])
-
-cols_extras = df_obras.apply(calcular_dados_extras, axis=1)
-df_obras['Margem_%'] = cols_extras[0]
-df_obras['E_Critico'] = cols_extras[1]
-df_obras['HH_Progresso'] = cols_extras[2]
-
-col_filtro, col_sort_criterio, col_sort_ordem = st.columns([3, 1, 1])
+mapa_sort = {"Projeto": "Projeto", "Valor Vendido": "Vendido", "Margem": "Margem_%", "Andamento": "Conclusao_%",
+             "Valor Faturado": "Faturado", "Horas": "HH_Progresso", "Materiais": "Mat_%", "CPI": "CPI", "Críticos": "E_Critico"}
+col_filtro, col_sort_criterio, col_sort_ordem, col_visao = st.columns([3, 1, 1, 1])
 with col_filtro:
     status_options = ["Não iniciado", "Em andamento", "Finalizado", "Apresentado"]
     status_selecionados = st.multiselect("Filtrar por:", options=status_options, default=status_options)
-with col_sort_criterio: criterio_sort = st.selectbox("Ordenar por:", ["Projeto", "Valor Vendido", "Margem", "Andamento"])
+with col_sort_criterio: criterio_sort = st.selectbox("Ordenar por:", list(mapa_sort))
 with col_sort_ordem: direcao_sort = st.selectbox("Ordem:", ["Decrescente", "Crescente"])
+with col_visao: visao = st.selectbox("Exibir:", ["Cartões", "Tabela"], key="visao_carteira")
 
 if not status_selecionados: st.info("Selecione pelo menos um status acima."); st.stop() 
 
-df_show = df_obras[df_obras['Status'].isin(status_selecionados)].copy()
-mapa_sort = {"Projeto": "Projeto", "Valor Vendido": "Vendido", "Margem": "Margem_%", "Andamento": "Conclusao_%"}
-df_show = df_show.sort_values(by=mapa_sort[criterio_sort], ascending=(direcao_sort == "Crescente"))
-
-st.write(f"**{len(df_show)}** projetos encontrados")
+df_lista, mask_lista, df_va_lista = df_raw, mask_obras, df_va
+qtd_arquivadas = (arquivo or {}).get("qtd", 0)
+if qtd_arquivadas and set(status_selecionados) & set(STATUS_CONCLUIDO):
+    if st.toggle(f"Incluir {qtd_arquivadas} obras arquivadas (concluídas há mais de {DIAS_ARQUIVO} dias)", key="incluir_arquivadas"):
+        df_historico = load_historico()
+        if df_historico is not None:
+            df_historico = recortar(df_historico, escopo)
+            df_lista, mask_lista, df_va_lista = df_historico, mascaras_carteira(df_historico)["obras"], valor_agregado(df_historico)
+
+# Filtro e ordenação sobre posições da tabela da versão atual; só o que é exibido vira DataFrame.
+tabela = tabela_carteira(df_lista, META_MARGEM_BRUTA)
+posicoes = np.flatnonzero(mask_lista & df_lista['Status'].isin(status_selecionados).to_numpy())
+linhas = tabela[mapa_sort[criterio_sort]].iloc[posicoes].sort_values(ascending=(direcao_sort == "Crescente")).index
+
+# --- VISÃO EM TABELA (paginada no servidor; a seleção de uma linha abre o Painel de Obra) ---
+if visao == "Tabela":
+    col_qtd, col_pag, col_tam, col_export = st.columns([2, 1, 1, 1], vertical_alignment="bottom")
+    tamanho = col_tam.selectbox("Linhas por página:", [50, 100, 250, 500], key="tabela_tamanho")
+    paginas = max(-(-len(linhas) // tamanho), 1)
+    pagina = col_pag.number_input(f"Página (de {paginas}):", min_value=1, max_value=paginas, value=1, step=1, key="tabela_pagina")
+    with col_qtd: st.write(f"**{len(linhas)}** projetos encontrados")
+    with col_export: botoes_exportacao(lambda: tabela.loc[linhas], "carteira_filtrada", "carteira")
+    df_pagina = tabela.loc[linhas[(pagina - 1) * tamanho: pagina * tamanho]]
+    evento = st.dataframe(
+        df_pagina, hide_index=True, use_container_width=True, height=min(35 * len(df_pagina) + 38, 720),
+        on_select="rerun", selection_mode="single-row", key="tabela_carteira",
+        column_config={
+            "Descricao": st.column_config.TextColumn("Descrição"),
+            "Vendido": st.column_config.NumberColumn("Vendido (R$)", format="compact"),
+            "Faturado": st.column_config.NumberColumn("Faturado (R$)", format="compact"),
+            "Custo_Total": st.column_config.NumberColumn("Custo (R$)", format="compact"),
+            "Lucro": st.column_config.NumberColumn("Lucro (R$)", format="compact"),
+            "Margem_%": st.column_config.NumberColumn("Margem", format="%.1f%%"),
+            "Conclusao_%": st.column_config.ProgressColumn("Andamento", format="%.0f%%", min_value=0, max_value=100),
+            "HH_Progresso": st.column_config.NumberColumn("Horas", format="%.0f%%"),
+            "Mat_%": st.column_config.NumberColumn("Mat", format="%.0f%%"),
+            "CPI": st.column_config.NumberColumn("CPI", format="%.2f"),
+            "IP_HH": st.column_config.NumberColumn("Prod h", format="%.2f"),
+            "EAC": st.column_config.NumberColumn("EAC (R$)", format="compact"),
+            "VAC": st.column_config.NumberColumn("VAC (R$)", format="compact"),
+            "E_Critico": st.column_config.CheckboxColumn("Crítico"),
+        },
+    )
+    if evento.selection.rows:
+        st.session_state["projeto_foco"] = df_pagina['Projeto'].iloc[evento.selection.rows[0]]
+        st.switch_page("painel_obra.py")
+    st.stop()
+
+def carteira_exportacao():
+    """Lista filtrada + regras + valor agregado; só montada no clique do download."""
+    df_show = df_lista.loc[linhas]
+    return pd.concat([df_show, regras_de(df_show, META_MARGEM_BRUTA), df_va_lista.loc[linhas]], axis=1)
+
+col_qtd, col_export = st.columns([4, 1], vertical_alignment="center")
+with col_qtd: st.write(f"**{len(linhas)}** projetos encontrados")
+with col_export: botoes_exportacao(carteira_exportacao, "carteira_filtrada", "carteira")
 st.write("")
 cols = st.columns(3)
 
-for i, (index, row) in enumerate(df_show.iterrows()):
+# HTML dos cartões pronto por versão dos dados (cartoes_carteira.py): aqui só a seleção, na ordem do filtro.
+cartoes = cartoes_carteira(df_lista, META_MARGEM_BRUTA).loc[linhas].to_numpy()
+projetos = df_lista['Projeto'].loc[linhas].to_numpy()
+for i, (html, projeto) in enumerate(zip(cartoes, projetos)):
     with cols[i % 3]:
-        pct = int(row['Conclusao_%'])
-        status_raw = str(row['Status']).strip()
-        if status_raw == "Finalizado": cor_t, bg_b, cl_b = "#3fb950", "rgba(63,185,80,0.2)", "#3fb950"
-        elif status_raw == "Apresentado": cor_t, bg_b, cl_b = "#a371f7", "rgba(163,113,247,0.2)", "#a371f7"
-        elif status_raw == "Em andamento": cor_t, bg_b, cl_b = "#d29922", "rgba(210,153,34,0.2)", "#e3b341"
-        else: cor_t, bg_b, cl_b = "#da3633", "rgba(218,54,51,0.2)", "#f85149"
-
-        cor_margem = "#da3633" if row['Margem_%'] < META_MARGEM_BRUTA else "#3fb950"
-        hh_real = row['HH_Real_Qtd']; hh_orc = row['HH_Orc_Qtd']
-        pct_horas = (hh_real / hh_orc * 100) if hh_orc > 0 else 0
-        cor_horas = "#da3633" if pct_horas > 100 else "#e6edf3"
-        mat_orc, mat_real = row['Mat_Orc'], row['Mat_Real']
-        pct_mat = (mat_real / mat_orc * 100) if mat_orc > 0 else 0
-        cor_mat = "#da3633" if pct_mat > 100 else "#e6edf3"
-        valor_formatado = format_brl_short(row['Vendido'])
-        
         with st.container(border=True):
-            st.markdown(f"""
-            <div class="tile-header" style="border-left: 3px solid {cor_t}">
-                <div class="tile-title" title="{row['Projeto']}">{row['Projeto']} - {row['Descricao']}</div>
-                <div class="tile-sub">{row['Cliente']} | {row['Cidade']}</div>
-            </div>
-            <div class="data-strip">
-                <div class="data-col"><span class="data-lbl">Valor</span><span class="data-val">{valor_formatado}</span></div>
-                <div class="data-col"><span class="data-lbl">Margem</span><span class="data-val" style="color: {cor_margem}">{row['Margem_%']:.0f}%</span></div>
-                <div class="data-col"><span class="data-lbl">Horas</span><span class="data-val" style="color: {cor_horas}">{pct_horas:.0f}%</span></div>
-                <div class="data-col"><span class="data-lbl">Mat</span><span class="data-val" style="color: {cor_mat}">{pct_mat:.0f}%</span></div>
-            </div>
-            <div class="tile-footer">
-                <div class="progress-track"><div class="progress-fill" style="width: {pct}%; background-color: {cor_t};"></div></div>
-                <div class="footer-row">
-                    <span class="badge-status" style="background-color: {bg_b}; color: {cl_b}">{status_raw}</span>
-                    <span class="footer-pct" style="color: {cl_b}">{pct}%</span>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
+            st.markdown(html, unsafe_allow_html=True)
             col_sp, col_btn = st.columns([2, 1])
             with col_btn:
-                if st.button("Abrir ↗", key=f"btn_{row['Projeto']}", use_container_width=True):
-                    st.session_state["projeto_foco"] = row['Projeto']
+                if st.button("Abrir ↗", key=f"btn_{projeto}", use_container_width=True):
+                    st.session_state["projeto_foco"] = projeto
                     st.switch_page("painel_obra.py")
@@ -0,0 +1,255 @@
+import pandas as pd
+import numpy as np
+import plotly.graph_objects as go
+from regras_saude import REGRAS_SAUDE
+
+# ---------------------------------------------------------
+# FIGURAS DO PAINEL DE OBRA (usadas pela página e pelo relatório em lote)
+# ---------------------------------------------------------
+def format_currency(value):
+    if pd.isna(value): return "R$ 0,00"
+    return f"R$ {value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+def format_percent(value):
+    if pd.isna(value): return "0,0%"
+    return f"{value:.1f}%".replace(".", ",")
+
+def cores_status(status):
+    if status == "Finalizado": return "#3fb950", "rgba(63, 185, 80, 0.2)"
+    elif status == "Apresentado": return "#a371f7", "rgba(163, 113, 247, 0.2)"
+    elif status == "Em andamento": return "#d29922", "rgba(210, 153, 34, 0.2)"
+    else: return "#da3633", "rgba(218, 54, 51, 0.2)"
+
+def html_kpi_card(titulo, valor, cor_borda, classe=""):
+    return f"""
+    <div class="kpi-card" style="border-top: 4px solid {cor_borda};">
+        <div class="kpi-title">{titulo}</div>
+        <div class="kpi-val {classe}">{valor}</div>
+    </div>
+    """
+
+def html_cabecalho(dados):
+    cor_status, bg_status = cores_status(dados['Status'])
+    return f"""
+<div class="header-box" style="border-top: 5px solid {cor_status};">
+    <div>
+        <div class="header-title">{dados['Projeto']} - {dados['Descricao']}</div>
+        <div class="header-subtitle">{dados['Cliente']} | {dados['Cidade']}</div>
+    </div>
+    <div class="header-status" style="background-color: {bg_status}; color: {cor_status}; border: 1px solid {cor_status};">
+        {dados['Status']}
+    </div>
+</div>
+"""
+
+def html_regras(saude):
+    """Uma linha com ✔/✖ por regra de saúde (saude = linha de avaliar_regras)."""
+    itens_regras = ""
+    for regra in REGRAS_SAUDE:
+        violada = bool(saude[f"Regra_{regra['id']}"])
+        cor_regra = ("#da3633" if regra['critica'] else "#d29922") if violada else "#3fb950"
+        itens_regras += f'<div class="rule-item" style="border-left: 4px solid {cor_regra};" title="{regra["descricao"]}"><span style="color: {cor_regra}; font-weight: 700;">{"✖" if violada else "✔"}</span> {regra["titulo"]}</div>'
+    return f'<div class="rule-row">{itens_regras}</div>'
+
+def figura_gauges(conclusao, perc_hh, hh_critico):
+    fig_gauge = go.Figure()
+
+    # Gauge 1
+    fig_gauge.add_trace(go.Indicator(
+        mode = "gauge+number", value = conclusao,
+        title = {'text': "Avanço Físico", 'font': {'size': 14, 'color': '#8b949e'}},
+        domain = {'x': [0, 0.45], 'y': [0, 1]},
+        number = {'suffix': "%", 'font': {'color': 'white'}},
+        gauge = {'axis': {'range': [0, 100], 'tickcolor': "#30363d"}, 'bar': {'color': "#3fb950"}, 'bgcolor': "#0d1117", 'borderwidth': 2, 'bordercolor': "#30363d"}
+    ))
+
+    cor_hh = "#da3633" if hh_critico else "#58a6ff"
+
+    # Gauge 2
+    fig_gauge.add_trace(go.Indicator(
+        mode = "gauge+number", value = perc_hh,
+        title = {'text': "Consumo Horas", 'font': {'size': 14, 'color': '#8b949e'}},
+        domain = {'x': [0.55, 1], 'y': [0, 1]},
+        number = {'suffix': "%", 'valueformat': ".1f", 'font': {'color': 'white'}},
+        gauge = {
+            'axis': {'range': [0, max(100, perc_hh)], 'tickcolor': "#30363d"},
+            'bar': {'color': cor_hh}, 'bgcolor': "#0d1117", 'borderwidth': 2, 'bordercolor': "#30363d",
+            'threshold': {'line': {'color': "white", 'width': 3}, 'thickness': 0.75, 'value': conclusao}
+        }
+    ))
+
+    fig_gauge.update_layout(height=220, margin=dict(t=40, b=20, l=30, r=30), paper_bgcolor='rgba(0,0,0,0)', font={'color': "white"}, xaxis={'fixedrange': True}, yaxis={'fixedrange': True})
+    return fig_gauge
+
+def diagnostico_hh(perc_hh, conclusao, hh_critico, saldo_hh):
+    """(cor, título, texto, saldo) do quadro de eficiência de horas."""
+    try: saldo_hh_int = int(saldo_hh)
+    except: saldo_hh_int = 0
+    if hh_critico:
+        return "#da3633", "Baixa Eficiência", "O consumo de horas está desproporcional ao avanço físico.", f"Excedente: {abs(saldo_hh_int)}h"
+    elif perc_hh < conclusao:
+        return "#3fb950", "Alta Eficiência", "A obra está avançada economizando horas.", f"Saldo Positivo: {saldo_hh_int}h"
+    return "#58a6ff", "Equilibrado", "O ritmo segue conforme o planejado.", f"Saldo: {saldo_hh_int}h"
+
+def html_diagnostico(border_c, titulo, texto, saldo_txt):
+    return f"""
+        <div style="background-color: #161b22; border-left: 4px solid {border_c}; padding: 15px; border-radius: 4px;">
+            <strong style="color: {border_c}; font-size: 1.1rem;">{titulo}</strong><br>
+            <span style="color: #8b949e; font-size: 0.9rem;">{texto}</span><br><br>
+            <strong style="color: white;">{saldo_txt}</strong>
+        </div>
+        """
+
+LABELS_CASCATA = ["Vendido", "Impostos", "Materiais", "Despesas", "Mão de Obra", "Lucro"]
+
+def figura_cascata(dados, lucro_liquido, em_valores):
+    if em_valores:
+        vals = [dados['Vendido'], -dados['Impostos'], -dados['Mat_Real'], -dados['Desp_Real'], -dados['HH_Real_Vlr'], lucro_liquido]
+        text_vals = [format_currency(v).replace("R$ ", "") for v in vals]
+    else:
+        base = dados['Vendido'] if dados['Vendido'] > 0 else 1
+        vals = [100, -(dados['Impostos']/base)*100, -(dados['Mat_Real']/base)*100, -(dados['Desp_Real']/base)*100, -(dados['HH_Real_Vlr']/base)*100, (lucro_liquido/base)*100]
+        text_vals = [format_percent(v) for v in vals]
+
+    fig_water = go.Figure(go.Waterfall(
+        orientation = "v", measure = ["relative"]*5 + ["total"],
+        x = LABELS_CASCATA, y = vals, text = text_vals, textposition = "outside",
+        connector = {"line":{"color":"#30363d"}},
+        decreasing = {"marker":{"color":"#da3633"}}, increasing = {"marker":{"color":"#3fb950"}}, totals = {"marker":{"color":"#58a6ff"}}, cliponaxis = False
+    ))
+    fig_water.update_layout(height=320, margin=dict(t=50, b=10, l=10, r=10), paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', yaxis=dict(showgrid=True, gridcolor='#30363d', zeroline=False, fixedrange=True), xaxis=dict(tickfont=dict(color='white'), fixedrange=True), font=dict(color='white'))
+    return fig_water
+
+def plot_row_fixed(titulo, orcado, real):
+    pct = (real / orcado * 100) if orcado > 0 else 0
+    cor_real = "#da3633" if real > orcado else "#58a6ff"
+
+    fig = go.Figure()
+    fig.add_trace(go.Bar(y=[titulo], x=[orcado], name='Orçado', orientation='h', marker_color='#30363d', text=[format_currency(orcado)], textposition='outside', cliponaxis=False))
+    fig.add_trace(go.Bar(y=[titulo], x=[real], name='Realizado', orientation='h', marker_color=cor_real, text=[format_currency(real)], textposition='outside', cliponaxis=False ))
+
+    max_val = max(orcado, real) * 1.35
+    fig.update_layout(
+        title=dict(text=f"<b>{titulo}</b> <span style='color:#8b949e; font-size:14px'>- Consumo: {format_percent(pct)}</span>", x=0),
+        barmode='group', height=140, margin=dict(l=0, r=20, t=30, b=10),
+        paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)',
+        xaxis=dict(showgrid=True, gridcolor='#262730', showticklabels=False, range=[0, max_val], fixedrange=True),
+        yaxis=dict(showticklabels=False, fixedrange=True),
+        font=dict(color='white'), showlegend=True,
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1, font=dict(size=12, color="#8b949e"), bgcolor="rgba(0,0,0,0)")
+    )
+    return fig
+
+CUSTOS_DETALHE = [("Materiais", 'Mat_Orc', 'Mat_Real'), ("Despesas", 'Desp_Orc', 'Desp_Real'), ("Mão de Obra (R$)", 'HH_Orc_Vlr', 'HH_Real_Vlr')]
+
+# ---------------------------------------------------------
+# MODO COMPARAÇÃO (várias obras numa figura; df = uma linha por projeto)
+# ---------------------------------------------------------
+CORES_COMPARACAO = ["#58a6ff", "#3fb950", "#d29922", "#a371f7", "#f778ba", "#39c5cf", "#ff7b72", "#e3b341"]
+
+def matriz_cascata(df, em_valores):
+    """Valores da cascata (projetos x etapas) calculados de uma vez."""
+    vals = np.column_stack([df['Vendido'], -df['Impostos'], -df['Mat_Real'], -df['Desp_Real'], -df['HH_Real_Vlr'], df['Lucro']]).astype(float)
+    if em_valores: return vals
+    base = df['Vendido'].to_numpy(dtype=float)
+    return vals / np.where(base > 0, base, 1.0)[:, None] * 100
+
+def figura_gauges_comparacao(df, por_linha=4):
+    """Um gauge de consumo de horas por obra, com o avanço físico como marcador."""
+    n = len(df)
+    linhas = -(-n // por_linha)
+    pos = np.arange(n)
+    x0 = (pos % por_linha) / por_linha
+    y1 = 1 - (pos // por_linha) / linhas
+    larg, alt = 1 / por_linha, 1 / linhas
+    eixo_max = np.maximum(100, df['HH_Progresso'].to_numpy(dtype=float))
+    cor_hh = np.where(df['Regra_hh'].to_numpy(dtype=bool), "#da3633", "#58a6ff")
+
+    fig = go.Figure()
+    for i, (projeto, conclusao, perc_hh) in enumerate(zip(df['Projeto'], df['Conclusao_%'], df['HH_Progresso'])):
+        fig.add_trace(go.Indicator(
+            mode = "gauge+number", value = perc_hh,
+            title = {'text': f"{projeto}<br><span style='font-size:11px;color:#8b949e'>Avanço {format_percent(conclusao)}</span>", 'font': {'size': 13, 'color': 'white'}},
+            domain = {'x': [x0[i] + larg * 0.08, x0[i] + larg * 0.92], 'y': [y1[i] - alt * 0.85, y1[i] - alt * 0.15]},
+            number = {'suffix': "%", 'valueformat': ".1f", 'font': {'color': 'white', 'size': 22}},
+            gauge = {
+                'axis': {'range': [0, eixo_max[i]], 'tickcolor': "#30363d"},
+                'bar': {'color': cor_hh[i]}, 'bgcolor': "#0d1117", 'borderwidth': 2, 'bordercolor': "#30363d",
+                'threshold': {'line': {'color': "white", 'width': 3}, 'thickness': 0.75, 'value': conclusao}
+            }
+        ))
+    fig.update_layout(height=220 * linhas, margin=dict(t=40, b=10, l=20, r=20), paper_bgcolor='rgba(0,0,0,0)', font={'color': "white"})
+    return fig
+
+def figura_cascata_comparacao(df, em_valores):
+    vals = matriz_cascata(df, em_valores)
+    fig = go.Figure()
+    for i, projeto in enumerate(df['Projeto']):
+        cor = CORES_COMPARACAO[i % len(CORES_COMPARACAO)]
+        text_vals = [format_currency(v).replace("R$ ", "") for v in vals[i]] if em_valores else [format_percent(v) for v in vals[i]]
+        fig.add_trace(go.Waterfall(
+            name = str(projeto), offsetgroup = str(i), orientation = "v", measure = ["relative"]*5 + ["total"],
+            x = LABELS_CASCATA, y = vals[i], hovertext = text_vals, hoverinfo = "name+x+text",
+            connector = {"line":{"color":"#30363d"}},
+            decreasing = {"marker":{"color":cor, "line":{"color":"#da3633", "width":1}}},
+            increasing = {"marker":{"color":cor}}, totals = {"marker":{"color":cor, "line":{"color":"white", "width":1}}}
+        ))
+    fig.update_layout(height=380, waterfallgroupgap=0.15, margin=dict(t=30, b=10, l=10, r=10), paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)',
+                      yaxis=dict(showgrid=True, gridcolor='#30363d', zeroline=False, fixedrange=True), xaxis=dict(tickfont=dict(color='white'), fixedrange=True),
+                      font=dict(color='white'), legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1, bgcolor="rgba(0,0,0,0)"))
+    return fig
+
+def figura_custos_comparacao(df, titulo, col_orc, col_real):
+    orcado = df[col_orc].to_numpy(dtype=float)
+    real = df[col_real].to_numpy(dtype=float)
+    pct = np.divide(real * 100, orcado, out=np.zeros_like(real), where=orcado > 0)
+    cor_real = np.where(real > orcado, "#da3633", "#58a6ff")
+    projetos = df['Projeto'].astype(str)
+
+    fig = go.Figure()
+    fig.add_trace(go.Bar(y=projetos, x=orcado, name='Orçado', orientation='h', marker_color='#30363d', text=[format_currency(v) for v in orcado], textposition='outside', cliponaxis=False))
+    fig.add_trace(go.Bar(y=projetos, x=real, name='Realizado', orientation='h', marker_color=cor_real,
+                         text=[f"{format_currency(v)} ({format_percent(p)})" for v, p in zip(real, pct)], textposition='outside', cliponaxis=False))
+    max_val = max(orcado.max(initial=0), real.max(initial=0)) * 1.45 or 1
+    fig.update_layout(
+        title=dict(text=f"<b>{titulo}</b>", x=0),
+        barmode='group', height=90 + 55 * len(df), margin=dict(l=0, r=20, t=30, b=10),
+        paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)',
+        xaxis=dict(showgrid=True, gridcolor='#262730', showticklabels=False, range=[0, max_val], fixedrange=True),
+        yaxis=dict(autorange="reversed", tickfont=dict(color='white'), fixedrange=True, type='category'),
+        font=dict(color='white'), showlegend=True,
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1, font=dict(size=12, color="#8b949e"), bgcolor="rgba(0,0,0,0)")
+    )
+    return fig
+
+# ---------------------------------------------------------
+# PREVISÃO DE MARGEM (saída de previsao_margem)
+# ---------------------------------------------------------
+def figura_previsao_projetos(por_projeto, meta_margem):
+    """Faixa P10–P90 e mediana da margem final de cada obra, com a meta como linha."""
+    df = por_projeto.sort_values('Margem_P50')
+    projetos = df['Projeto'].astype(str)
+    cor = np.where(df['Margem_P50'] >= meta_margem, "#3fb950", "#da3633")
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=df['Margem_P50'], y=projetos, mode='markers', name='P50', marker=dict(color=cor, size=9),
+        error_x=dict(type='data', symmetric=False, array=df['Margem_P90'] - df['Margem_P50'], arrayminus=df['Margem_P50'] - df['Margem_P10'], color='#8b949e', thickness=1.5),
+        customdata=np.column_stack([df['Margem_P10'], df['Margem_P90'], df['Margem_Atual'], df['Prob_Meta']]),
+        hovertemplate="<b>%{y}</b><br>P50: %{x:.1f}%<br>P10–P90: %{customdata[0]:.1f}% a %{customdata[1]:.1f}%<br>Atual: %{customdata[2]:.1f}%<br>Chance de bater a meta: %{customdata[3]:.0f}%<extra></extra>"))
+    fig.add_trace(go.Scatter(x=df['Margem_Atual'], y=projetos, mode='markers', name='Atual', marker=dict(color='#58a6ff', symbol='line-ns-open', size=12)))
+    fig.add_vline(x=meta_margem, line=dict(color='white', dash='dash', width=1), annotation_text="Meta", annotation_font_color="#8b949e")
+    fig.update_layout(height=120 + 26 * len(df), margin=dict(t=30, b=10, l=10, r=10), paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)',
+                      xaxis=dict(title="Margem final (%)", showgrid=True, gridcolor='#30363d', zeroline=False, fixedrange=True),
+                      yaxis=dict(type='category', tickfont=dict(color='white'), fixedrange=True), font=dict(color='white'),
+                      legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1, bgcolor="rgba(0,0,0,0)"))
+    return fig
+
+def figura_distribuicao_carteira(carteira):
+    bordas, contagens = carteira['histograma']['bordas'], carteira['histograma']['contagens']
+    fig = go.Figure(go.Bar(x=(bordas[:-1] + bordas[1:]) / 2, y=contagens, width=np.diff(bordas), marker_color='#58a6ff', opacity=0.8, hovertemplate="%{x:.1f}%: %{y} sorteios<extra></extra>"))
+    for valor, rotulo, cor in [(carteira['meta'], "Meta", "white"), (carteira['p10'], "P10", "#8b949e"), (carteira['p50'], "P50", "#3fb950"), (carteira['p90'], "P90", "#8b949e")]:
+        fig.add_vline(x=valor, line=dict(color=cor, dash='dash' if rotulo == "Meta" else 'dot', width=1), annotation_text=rotulo, annotation_font_color=cor)
+    fig.update_layout(height=260, margin=dict(t=30, b=10, l=10, r=10), paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', showlegend=False,
+                      xaxis=dict(title="Margem total da carteira no término (%)", showgrid=False, fixedrange=True),
+                      yaxis=dict(showgrid=True, gridcolor='#30363d', showticklabels=False, fixedrange=True), font=dict(color='white'))
+    return fig
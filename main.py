@@ -1,6 +1,9 @@
 import streamlit as st
 import streamlit_authenticator as stauth
 import yaml
+import uuid
+from cache_compartilhado import registrar_sessao
+from perfil import rodar_pagina, resumo_ultimo_perfil
 
 # ---------------------------------------------------------
 # 1. CONFIGURAÇÃO VISUAL
@@ -87,7 +90,8 @@ secrets = st.secrets
 config_dict = {
     "credentials": {
         "usernames": {
-            username: dict(user_data) 
+            # 'escopo' (recorte dos dados por usuário) é lido por escopo.py, não pelo autenticador
+            username: {campo: valor for campo, valor in user_data.items() if campo != "escopo"}
             for username, user_data in secrets['credentials']['usernames'].items()
         }
     },
@@ -132,10 +136,17 @@ if st.session_state.get("authentication_status"):
         st.Page("configuracoes.py", title="Configurações", icon="⚙️"),
     ])
     
-    # 2. Executa a Página
-    pg.run()
+    # 2. Marca a sessão como ativa (o intervalo de atualização dos dados se adapta ao uso)
+    try: registrar_sessao(dict(secrets["gcp_service_account"]), st.session_state.setdefault("sessao_id", uuid.uuid4().hex))
+    except OSError: pass
 
-    # 3. Botão de Desconectar (Rodapé)
+    # 3. Executa a Página (com perfil de amostragem se um admin pediu: ?perfil=1 ou Configurações)
+    rodar_pagina(pg)
+
+    # 4. Resumo do último perfil de amostragem (só para admins)
+    resumo_ultimo_perfil()
+
+    # 5. Botão de Desconectar (Rodapé)
     with st.sidebar:
         st.divider()
         authenticator.logout('Desconectar', 'sidebar') 
@@ -1,14 +1,13 @@
 import streamlit as st
-import pandas as pd
-import plotly.graph_objects as go
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
-import io
-import json
-import os
-import datetime
-import gspread 
+from valor_agregado import valor_agregado
+from previsao_margem import previsao_margem
+from cache_compartilhado import obter_planilha, TTL_LOCAL_S
+from escopo import recortar_sessao
+from alteracoes import ler_base_compartilhada, regras_de
+from base_dados import metas_percentuais, metricas_projetos
+from graficos_obra import (format_currency, format_percent, html_cabecalho, html_kpi_card, figura_gauges,
+                           diagnostico_hh, html_diagnostico, html_regras, figura_cascata, plot_row_fixed, CUSTOS_DETALHE,
+                           figura_gauges_comparacao, figura_cascata_comparacao, figura_custos_comparacao)
 
 # ---------------------------------------------------------
 # 1. ESTILO CSS
@@ -45,97 +44,105 @@ st.markdown("""
     .txt-blue { color: #58a6ff; font-weight: bold; }
     .txt-orange { color: #d29922; font-weight: bold; }
     .txt-purple { color: #a371f7; font-weight: bold; }
+    .rule-row { display: flex; gap: 10px; flex-wrap: wrap; margin-top: 15px; }
+    .rule-item { background-color: #161b22; border: 1px solid #30363d; border-radius: 6px; padding: 8px 12px; font-size: 0.8rem; color: #e6edf3; }
 </style>
 """, unsafe_allow_html=True)
 
 # ---------------------------------------------------------
 # FUNÇÕES E DADOS
 # ---------------------------------------------------------
-def format_currency(value):
-    if pd.isna(value): return "R$ 0,00"
-    return f"R$ {value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-
-def format_percent(value):
-    if pd.isna(value): return "0,0%"
-    return f"{value:.1f}%".replace(".", ",")
-
-@st.cache_data(ttl=30)
+@st.cache_data(ttl=TTL_LOCAL_S)
 def load_data():
     try:
-        creds_dict = dict(st.secrets["gcp_service_account"])
-        creds = service_account.Credentials.from_service_account_info(
-            creds_dict, scopes=['https://www.googleapis.com/auth/drive.readonly']
-        )
-        service = build('drive', 'v3', credentials=creds)
-        results = service.files().list(q="name='dados_dashboard_obras.xlsx' and trashed=false", fields="files(id, name)").execute()
-        files = results.get('files', [])
-        if not files: return None
-        file_id = files[0]['id']
-        request = service.files().get_media(fileId=file_id)
-        file_io = io.BytesIO()
-        downloader = MediaIoBaseDownload(file_io, request)
-        done = False
-        while done is False: status, done = downloader.next_chunk()
-        file_io.seek(0)
-        return pd.read_excel(file_io)
+        base = obter_planilha(dict(st.secrets["gcp_service_account"]), historico=True)
+        if base is None: return None
+        return ler_base_compartilhada(base)
     except: return None
 
 df_raw = load_data()
 if df_raw is None: 
     st.error("⚠️ Erro ao conectar com o Google Sheets.")
     st.stop()
+df_raw = recortar_sessao(df_raw)  # escopo do usuário (escopo.py)
 
-df_raw.columns = df_raw.columns.str.strip()
-df_raw['Projeto'] = df_raw['Projeto'].astype(str)
-
-def clean_google_number(x):
-    if isinstance(x, (int, float)): return float(x)
-    if x is None: return 0.0
-    s = str(x).strip()
-    if s == "": return 0.0
+# --- CARREGAR METAS (SHEET2) ---
+@st.cache_data(ttl=TTL_LOCAL_S)
+def load_config():
+    zeros = {"meta_vendas": 0.0, "meta_margem": 0.0, "meta_custo_adm": 0.0}
     try:
-        s = s.replace('R$', '').replace('%', '').replace(' ', '').replace('.', '').replace(',', '.')
-        return float(s)
-    except: return 0.0
+        # Sheet2 do mesmo arquivo, já lida pelo cache compartilhado (sem chamada extra ao Sheets).
+        base = obter_planilha(dict(st.secrets["gcp_service_account"]))
+        if base is None: return zeros
+        return base["metas"]
+    except: return zeros
 
-def clean_excel_time(x):
-    try:
-        if isinstance(x, (int, float)): return float(x) * 24.0
-        s = str(x).strip()
-        if s == "" or s.lower() in ["nan", "nat"]: return 0.0
-        if ":" in s:
-            if "day" in s: return pd.to_timedelta(s).total_seconds() / 3600.0
-            parts = s.split(":")
-            return float(parts[0]) + (float(parts[1])/60.0) + (float(parts[2])/3600.0)
-        return float(s.replace(',', '.')) * 24.0
-    except: return 0.0
-
-cols_numericas_padrao = ['Vendido', 'Faturado', 'Mat_Real', 'Desp_Real', 'HH_Real_Vlr', 'Impostos', 'Mat_Orc', 'Desp_Orc', 'HH_Orc_Vlr', 'Conclusao_%']
-for col in cols_numericas_padrao:
-    if col in df_raw.columns: df_raw[col] = df_raw[col].apply(clean_google_number)
-
-cols_horas = ['HH_Orc_Qtd', 'HH_Real_Qtd']
-for col in cols_horas:
-    if col in df_raw.columns: df_raw[col] = df_raw[col].astype(str).apply(clean_excel_time)
-
-def fix_percentage_scale(x):
-    if 0 < x <= 1.5: return x * 100
-    return x
-
-if 'Conclusao_%' in df_raw.columns: df_raw['Conclusao_%'] = df_raw['Conclusao_%'].apply(fix_percentage_scale)
+config = load_config()
+META_MARGEM_BRUTA = metas_percentuais(config)["META_MARGEM_BRUTA"]
 
 # ---------------------------------------------------------
 # SIDEBAR
 # ---------------------------------------------------------
 st.sidebar.markdown("### Seleção de Projeto:") 
-lista_projetos = sorted(df_raw['Projeto'].astype(str).unique())
+lista_projetos = sorted(df_raw['Projeto'].unique())
 index_padrao = 0
 if "projeto_foco" in st.session_state:
     try: index_padrao = lista_projetos.index(str(st.session_state["projeto_foco"]))
     except ValueError: index_padrao = 0
 id_projeto = st.sidebar.selectbox("Projeto:", lista_projetos, index=index_padrao, label_visibility="collapsed")
-df_raw['Projeto'] = df_raw['Projeto'].astype(str)
-dados = df_raw[df_raw['Projeto'] == id_projeto].iloc[0]
+modo_comparacao = st.sidebar.toggle("Comparar projetos", key="modo_comparacao")
+# Projeto já é texto desde limpar_base: busca a linha pela posição, sem reescrever a coluna.
+dados = df_raw.iloc[(df_raw['Projeto'].to_numpy() == id_projeto).argmax()]
+
+# ---------------------------------------------------------
+# MODO COMPARAÇÃO (métricas de todas as obras escolhidas de uma vez)
+# ---------------------------------------------------------
+if modo_comparacao:
+    criterio = st.sidebar.radio("Comparar:", ["Projetos escolhidos", "Todos de um cliente"], label_visibility="collapsed")
+    if criterio == "Projetos escolhidos":
+        selecionados = st.sidebar.multiselect("Projetos:", lista_projetos, default=[id_projeto])
+    else:
+        lista_clientes = sorted(df_raw['Cliente'].dropna().astype(str).unique())
+        cliente_atual = str(dados['Cliente'])
+        cliente = st.sidebar.selectbox("Cliente:", lista_clientes, index=lista_clientes.index(cliente_atual) if cliente_atual in lista_clientes else 0)
+        selecionados = sorted(df_raw.loc[df_raw['Cliente'].astype(str) == cliente, 'Projeto'].unique())
+
+    st.title("Painel de Obra · Comparação")
+    if not selecionados:
+        st.info("Selecione ao menos um projeto na barra lateral.")
+        st.stop()
+
+    df_comp = metricas_projetos(df_raw[df_raw['Projeto'].isin(selecionados)], config).sort_values('Projeto')
+    st.caption(f"{len(df_comp)} projetos comparados")
+
+    resumo = df_comp[['Projeto', 'Cliente', 'Status', 'Vendido', 'Faturado', 'Lucro', 'Margem_%', 'Conclusao_%', 'HH_Progresso', 'CPI', 'IP_HH', 'EAC', 'VAC']]
+    st.dataframe(resumo, hide_index=True, use_container_width=True, column_config={
+        "Vendido": st.column_config.NumberColumn("Vendido", format="R$ %.2f"),
+        "Faturado": st.column_config.NumberColumn("Faturado", format="R$ %.2f"),
+        "Lucro": st.column_config.NumberColumn("Lucro Líquido", format="R$ %.2f"),
+        "Margem_%": st.column_config.NumberColumn("Margem %", format="%.1f%%"),
+        "Conclusao_%": st.column_config.NumberColumn("Avanço Físico", format="%.1f%%"),
+        "HH_Progresso": st.column_config.NumberColumn("Consumo Horas", format="%.1f%%"),
+        "CPI": st.column_config.NumberColumn("CPI", format="%.2f"),
+        "IP_HH": st.column_config.NumberColumn("Produtividade (horas)", format="%.2f"),
+        "EAC": st.column_config.NumberColumn("EAC", format="R$ %.2f"),
+        "VAC": st.column_config.NumberColumn("VAC", format="R$ %.2f"),
+    })
+
+    st.write(""); st.divider(); st.subheader("⚙️ Eficiência Operacional")
+    with st.container(border=True):
+        st.plotly_chart(figura_gauges_comparacao(df_comp), use_container_width=True, config={'displayModeBar': False})
+
+    st.write(""); st.divider(); st.subheader("📊 Composição do Lucro")
+    with st.container(border=True):
+        modo_vis = st.radio("Unidade de Medida:", ["Percentual (%)", "Valores (R$)"], horizontal=True, label_visibility="collapsed")
+        st.plotly_chart(figura_cascata_comparacao(df_comp, modo_vis == "Valores (R$)"), use_container_width=True, config={'displayModeBar': False})
+
+    st.write(""); st.divider(); st.subheader("🔎 Detalhamento de Custos")
+    for titulo, col_orc, col_real in CUSTOS_DETALHE:
+        with st.container(border=True):
+            st.plotly_chart(figura_custos_comparacao(df_comp, titulo, col_orc, col_real), use_container_width=True, config={'displayModeBar': False})
+    st.stop()
 
 # ---------------------------------------------------------
 # TÍTULO E CÁLCULOS
@@ -145,200 +152,75 @@ custo_total = dados['Mat_Real'] + dados['Desp_Real'] + dados['HH_Real_Vlr'] + da
 lucro_liquido = dados['Vendido'] - custo_total
 margem_real_pct = (lucro_liquido / dados['Vendido']) * 100 if dados['Vendido'] > 0 else 0
 
-# --- CARREGAR METAS (SHEET2) ---
-@st.cache_data(ttl=30)
-def load_config():
-    zeros = {"meta_vendas": 0.0, "meta_margem": 0.0, "meta_custo_adm": 0.0}
-    try:
-        scopes = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
-        gc = gspread.service_account_from_dict(st.secrets["gcp_service_account"], scopes=scopes)
-        sh = gc.open("dados_dashboard_obras")
-        ws = sh.worksheet("Sheet2")
-        vals = ws.row_values(2)
-        if len(vals) >= 3:
-            def parse_pt_br(x):
-                if isinstance(x, (int, float)): return float(x)
-                clean = str(x).replace("R$", "").replace("%", "").strip()
-                clean = clean.replace(".", "").replace(",", ".")
-                try: return float(clean)
-                except: return 0.0
-            return {
-                "meta_vendas": parse_pt_br(vals[0]),
-                "meta_margem": parse_pt_br(vals[1]),
-                "meta_custo_adm": parse_pt_br(vals[2])
-            }
-        return zeros
-    except: return zeros
+df_saude = regras_de(df_raw, META_MARGEM_BRUTA)
+saude = df_saude.loc[dados.name]
 
-config = load_config()
-META_MARGEM_BRUTA = float(config["meta_margem"])
-if META_MARGEM_BRUTA <= 1.0: META_MARGEM_BRUTA *= 100
-
-status = dados['Status']
-if status == "Finalizado": cor_status, bg_status = "#3fb950", "rgba(63, 185, 80, 0.2)"
-elif status == "Apresentado": cor_status, bg_status = "#a371f7", "rgba(163, 113, 247, 0.2)"
-elif status == "Em andamento": cor_status, bg_status = "#d29922", "rgba(210, 153, 34, 0.2)"
-else: cor_status, bg_status = "#da3633", "rgba(218, 54, 51, 0.2)"
-
-st.markdown(f"""
-<div class="header-box" style="border-top: 5px solid {cor_status};">
-    <div>
-        <div class="header-title">{dados['Projeto']} - {dados['Descricao']}</div>
-        <div class="header-subtitle">{dados['Cliente']} | {dados['Cidade']}</div>
-    </div>
-    <div class="header-status" style="background-color: {bg_status}; color: {cor_status}; border: 1px solid {cor_status};">
-        {dados['Status']}
-    </div>
-</div>
-""", unsafe_allow_html=True)
+st.markdown(html_cabecalho(dados), unsafe_allow_html=True)
 
 k1, k2, k3, k4 = st.columns(4)
 
 with k1:
-    st.markdown(f"""
-    <div class="kpi-card" style="border-top: 4px solid #58a6ff;">
-        <div class="kpi-title">Valor Vendido</div>
-        <div class="kpi-val">{format_currency(dados['Vendido'])}</div>
-    </div>
-    """, unsafe_allow_html=True)
+    st.markdown(html_kpi_card("Valor Vendido", format_currency(dados['Vendido']), "#58a6ff"), unsafe_allow_html=True)
 
 with k2:
-    st.markdown(f"""
-    <div class="kpi-card" style="border-top: 4px solid #3fb950;">
-        <div class="kpi-title">Valor Faturado</div>
-        <div class="kpi-val">{format_currency(dados['Faturado'])}</div>
-    </div>
-    """, unsafe_allow_html=True)
+    st.markdown(html_kpi_card("Valor Faturado", format_currency(dados['Faturado']), "#3fb950"), unsafe_allow_html=True)
 
 # Cálculo de cores e bordas antes de usar no f-string
 cor_lucro = "txt-green" if lucro_liquido > 0 else "txt-red"
 border_lucro = "#3fb950" if lucro_liquido > 0 else "#da3633"
 
 with k3:
-    st.markdown(f"""
-    <div class="kpi-card" style="border-top: 4px solid {border_lucro};">
-        <div class="kpi-title">Lucro Líquido</div>
-        <div class="kpi-val {cor_lucro}">{format_currency(lucro_liquido)}</div>
-    </div>
-    """, unsafe_allow_html=True)
+    st.markdown(html_kpi_card("Lucro Líquido", format_currency(lucro_liquido), border_lucro, cor_lucro), unsafe_allow_html=True)
 
 cor_margem = "txt-green" if margem_real_pct >= META_MARGEM_BRUTA else "txt-red"
 border_margem = "#3fb950" if margem_real_pct >= META_MARGEM_BRUTA else "#da3633"
 
 with k4:
-    st.markdown(f"""
-    <div class="kpi-card" style="border-top: 4px solid {border_margem};">
-        <div class="kpi-title">Margem %</div>
-        <div class="kpi-val {cor_margem}">{format_percent(margem_real_pct)}</div>
-    </div>
-    """, unsafe_allow_html=True)
+    st.markdown(html_kpi_card("Margem %", format_percent(margem_real_pct), border_margem, cor_margem), unsafe_allow_html=True)
+
+st.markdown(html_regras(saude), unsafe_allow_html=True)
+
+st.write(""); st.divider(); st.subheader("📐 Valor Agregado")
+
+va = valor_agregado(df_raw).loc[dados.name]
+v1, v2, v3, v4, v5 = st.columns(5)
+with v1: st.markdown(html_kpi_card("Valor Agregado (EV)", format_currency(va['EV']), "#a371f7"), unsafe_allow_html=True)
+with v2: st.markdown(html_kpi_card("CPI", f"{va['CPI']:.2f}".replace(".", ","), "#3fb950" if va['CPI'] >= 1 else "#da3633", "txt-green" if va['CPI'] >= 1 else "txt-red"), unsafe_allow_html=True)
+with v3: st.markdown(html_kpi_card("Produtividade (horas)", f"{va['IP_HH']:.2f}".replace(".", ","), "#3fb950" if va['IP_HH'] >= 1 else "#da3633", "txt-green" if va['IP_HH'] >= 1 else "txt-red"), unsafe_allow_html=True)
+with v4: st.markdown(html_kpi_card("Custo no Término (EAC)", format_currency(va['EAC']), "#58a6ff"), unsafe_allow_html=True)
+with v5: st.markdown(html_kpi_card("Variação no Término (VAC)", format_currency(va['VAC']), "#3fb950" if va['VAC'] >= 0 else "#da3633", "txt-green" if va['VAC'] >= 0 else "txt-red"), unsafe_allow_html=True)
+st.caption(f"Orçamento (BAC): {format_currency(va['BAC'])} · Custo real (AC): {format_currency(va['AC'])} · Falta gastar (ETC): {format_currency(va['ETC'])}")
+previsao_projetos, _ = previsao_margem(df_raw, META_MARGEM_BRUTA)
+if dados.name in previsao_projetos.index:
+    prev = previsao_projetos.loc[dados.name]
+    st.caption(f"🎯 Margem prevista no término: **{format_percent(prev['Margem_P50'])}** (P10 {format_percent(prev['Margem_P10'])} – P90 {format_percent(prev['Margem_P90'])}) · chance de bater a meta de {format_percent(META_MARGEM_BRUTA)}: **{prev['Prob_Meta']:.0f}%**")
 
 st.write(""); st.divider(); st.subheader("⚙️ Eficiência Operacional")
 
 with st.container(border=True):
     col_gauges, col_spacer, col_diag = st.columns([5, 0.2, 3], vertical_alignment="center")
     
+    hh_real = dados['HH_Real_Qtd']
+    hh_orc = dados['HH_Orc_Qtd']
+    perc_hh = (hh_real / hh_orc * 100) if hh_orc > 0 else 0
+
     with col_gauges:
-        fig_gauge = go.Figure()
-        
-        # Gauge 1
-        fig_gauge.add_trace(go.Indicator(
-            mode = "gauge+number", value = dados['Conclusao_%'],
-            title = {'text': "Avanço Físico", 'font': {'size': 14, 'color': '#8b949e'}},
-            domain = {'x': [0, 0.45], 'y': [0, 1]},
-            number = {'suffix': "%", 'font': {'color': 'white'}},
-            gauge = {'axis': {'range': [0, 100], 'tickcolor': "#30363d"}, 'bar': {'color': "#3fb950"}, 'bgcolor': "#0d1117", 'borderwidth': 2, 'bordercolor': "#30363d"}
-        ))
-        
-        hh_real = dados['HH_Real_Qtd']
-        hh_orc = dados['HH_Orc_Qtd']
-        perc_hh = (hh_real / hh_orc * 100) if hh_orc > 0 else 0
-        cor_hh = "#da3633" if perc_hh > (dados['Conclusao_%'] + 10) else "#58a6ff"
-        
-        # Gauge 2
-        fig_gauge.add_trace(go.Indicator(
-            mode = "gauge+number", value = perc_hh,
-            title = {'text': "Consumo Horas", 'font': {'size': 14, 'color': '#8b949e'}},
-            domain = {'x': [0.55, 1], 'y': [0, 1]},
-            number = {'suffix': "%", 'valueformat': ".1f", 'font': {'color': 'white'}},
-            gauge = {
-                'axis': {'range': [0, max(100, perc_hh)], 'tickcolor': "#30363d"}, 
-                'bar': {'color': cor_hh}, 'bgcolor': "#0d1117", 'borderwidth': 2, 'bordercolor': "#30363d",
-                'threshold': {'line': {'color': "white", 'width': 3}, 'thickness': 0.75, 'value': dados['Conclusao_%']}
-            }
-        ))
-        
-        fig_gauge.update_layout(height=220, margin=dict(t=40, b=20, l=30, r=30), paper_bgcolor='rgba(0,0,0,0)', font={'color': "white"}, xaxis={'fixedrange': True}, yaxis={'fixedrange': True})
+        fig_gauge = figura_gauges(dados['Conclusao_%'], perc_hh, saude['Regra_hh'])
         st.plotly_chart(fig_gauge, use_container_width=True, config={'displayModeBar': False})
 
     with col_diag:
-        saldo_hh = hh_orc - hh_real
-        try: saldo_hh_int = int(saldo_hh)
-        except: saldo_hh_int = 0
-        
-        if perc_hh > (dados['Conclusao_%'] + 10): 
-            border_c = "#da3633"; titulo = "Baixa Eficiência"; texto = "O consumo de horas está desproporcional ao avanço físico."; saldo_txt = f"Excedente: {abs(saldo_hh_int)}h"
-        elif perc_hh < dados['Conclusao_%']: 
-            border_c = "#3fb950"; titulo = "Alta Eficiência"; texto = "A obra está avançada economizando horas."; saldo_txt = f"Saldo Positivo: {saldo_hh_int}h"
-        else: 
-            border_c = "#58a6ff"; titulo = "Equilibrado"; texto = "O ritmo segue conforme o planejado."; saldo_txt = f"Saldo: {saldo_hh_int}h"
-            
-        st.markdown(f"""
-        <div style="background-color: #161b22; border-left: 4px solid {border_c}; padding: 15px; border-radius: 4px;">
-            <strong style="color: {border_c}; font-size: 1.1rem;">{titulo}</strong><br>
-            <span style="color: #8b949e; font-size: 0.9rem;">{texto}</span><br><br>
-            <strong style="color: white;">{saldo_txt}</strong>
-        </div>
-        """, unsafe_allow_html=True)
+        diag = diagnostico_hh(perc_hh, dados['Conclusao_%'], saude['Regra_hh'], hh_orc - hh_real)
+        st.markdown(html_diagnostico(*diag), unsafe_allow_html=True)
 
 st.write(""); st.divider(); st.subheader("📊 Composição do Lucro")
 
 with st.container(border=True):
     modo_vis = st.radio("Unidade de Medida:", ["Percentual (%)", "Valores (R$)"], horizontal=True, label_visibility="collapsed")
-    labels = ["Vendido", "Impostos", "Materiais", "Despesas", "Mão de Obra", "Lucro"]
-    
-    if modo_vis == "Valores (R$)": 
-        vals = [dados['Vendido'], -dados['Impostos'], -dados['Mat_Real'], -dados['Desp_Real'], -dados['HH_Real_Vlr'], lucro_liquido]
-        text_vals = [format_currency(v).replace("R$ ", "") for v in vals]
-    else: 
-        base = dados['Vendido'] if dados['Vendido'] > 0 else 1
-        vals = [100, -(dados['Impostos']/base)*100, -(dados['Mat_Real']/base)*100, -(dados['Desp_Real']/base)*100, -(dados['HH_Real_Vlr']/base)*100, (lucro_liquido/base)*100]
-        text_vals = [format_percent(v) for v in vals]
-        
-    fig_water = go.Figure(go.Waterfall(
-        orientation = "v", measure = ["relative"]*5 + ["total"],
-        x = labels, y = vals, text = text_vals, textposition = "outside",
-        connector = {"line":{"color":"#30363d"}},
-        decreasing = {"marker":{"color":"#da3633"}}, increasing = {"marker":{"color":"#3fb950"}}, totals = {"marker":{"color":"#58a6ff"}}, cliponaxis = False
-    ))
-    fig_water.update_layout(height=320, margin=dict(t=50, b=10, l=10, r=10), paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', yaxis=dict(showgrid=True, gridcolor='#30363d', zeroline=False, fixedrange=True), xaxis=dict(tickfont=dict(color='white'), fixedrange=True), font=dict(color='white'))
+    fig_water = figura_cascata(dados, lucro_liquido, modo_vis == "Valores (R$)")
     st.plotly_chart(fig_water, use_container_width=True, config={'displayModeBar': False})
 
 st.write(""); st.divider(); st.subheader("🔎 Detalhamento de Custos")
 
-def plot_row_fixed(titulo, orcado, real):
-    pct = (real / orcado * 100) if orcado > 0 else 0
-    cor_real = "#da3633" if real > orcado else "#58a6ff"
-    
-    fig = go.Figure()
-    fig.add_trace(go.Bar(y=[titulo], x=[orcado], name='Orçado', orientation='h', marker_color='#30363d', text=[format_currency(orcado)], textposition='outside', cliponaxis=False))
-    fig.add_trace(go.Bar(y=[titulo], x=[real], name='Realizado', orientation='h', marker_color=cor_real, text=[format_currency(real)], textposition='outside', cliponaxis=False ))
-    
-    max_val = max(orcado, real) * 1.35 
-    fig.update_layout(
-        title=dict(text=f"<b>{titulo}</b> <span style='color:#8b949e; font-size:14px'>- Consumo: {format_percent(pct)}</span>", x=0), 
-        barmode='group', height=140, margin=dict(l=0, r=20, t=30, b=10), 
-        paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', 
-        xaxis=dict(showgrid=True, gridcolor='#262730', showticklabels=False, range=[0, max_val], fixedrange=True), 
-        yaxis=dict(showticklabels=False, fixedrange=True), 
-        font=dict(color='white'), showlegend=True, 
-        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1, font=dict(size=12, color="#8b949e"), bgcolor="rgba(0,0,0,0)")
-    )
-    return fig
-
-with st.container(border=True): 
-    st.plotly_chart(plot_row_fixed("Materiais", dados['Mat_Orc'], dados['Mat_Real']), use_container_width=True, config={'displayModeBar': False})
-with st.container(border=True): 
-    st.plotly_chart(plot_row_fixed("Despesas", dados['Desp_Orc'], dados['Desp_Real']), use_container_width=True, config={'displayModeBar': False})
-with st.container(border=True): 
-    st.plotly_chart(plot_row_fixed("Mão de Obra (R$)", dados['HH_Orc_Vlr'], dados['HH_Real_Vlr']), use_container_width=True, config={'displayModeBar': False})
+for titulo, col_orc, col_real in CUSTOS_DETALHE:
+    with st.container(border=True): 
+        st.plotly_chart(plot_row_fixed(titulo, dados[col_orc], dados[col_real]), use_container_width=True, config={'displayModeBar': False})
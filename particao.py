@@ -0,0 +1,56 @@
+import os
+import numpy as np
+import pandas as pd
+from base_dados import totais_grupo, mascaras_carteira
+from valor_agregado import valor_agregado, somas_valor_agregado
+
+# ---------------------------------------------------------
+# PARTIÇÃO ATIVA / ARQUIVO (OBRAS CONCLUÍDAS HÁ MAIS DE DIAS_ARQUIVO)
+# ---------------------------------------------------------
+# Obras Finalizado/Apresentado com Data_Conclusao (Sheet1) anterior ao corte
+# vão para o arquivo: publicado à parte pelo cache compartilhado, já limpo, e
+# só aberto por quem precisa do histórico (Dados & Insights, Painel de Obra,
+# API e a lista da Gestão com "Incluir arquivadas"). A Gestão soma aos KPIs
+# os agregados do arquivo, calculados uma vez na publicação. Sem a coluna
+# Data_Conclusao nada é arquivado.
+COLUNA_CONCLUSAO = "Data_Conclusao"
+DIAS_ARQUIVO = int(os.environ.get("DASHBOARD_DIAS_ARQUIVO", 365))
+
+def mascara_arquivo(df, hoje=None):
+    if COLUNA_CONCLUSAO not in df.columns: return np.zeros(len(df), dtype=bool)
+    datas = pd.to_datetime(df[COLUNA_CONCLUSAO], errors='coerce', dayfirst=True)
+    corte = (pd.Timestamp(hoje) if hoje else pd.Timestamp.now().normalize()) - pd.Timedelta(days=DIAS_ARQUIVO)
+    return mascaras_carteira(df)["concluidas"] & (datas < corte).to_numpy()
+
+def particionar(df, hoje=None):
+    """(ativas, arquivo), cada uma com índice 0..n-1 e versão própria (memorizar não confunde as duas)."""
+    arquivo = mascara_arquivo(df, hoje)
+    ativas, arquivadas = df[~arquivo].reset_index(drop=True), df[arquivo].reset_index(drop=True)
+    if "versao" in df.attrs:
+        ativas.attrs["versao"], arquivadas.attrs["versao"] = f"{df.attrs['versao']}:ativas", f"{df.attrs['versao']}:arquivo"
+    return ativas, arquivadas
+
+def agregados_arquivo(df_arquivo):
+    """Totais por (ADM, Status) e somas de valor agregado do arquivo (JSON), para os KPIs sem abrir o arquivo."""
+    totais = totais_grupo(df_arquivo)
+    return {"qtd": len(df_arquivo), "colunas": list(totais.columns),
+            "totais": [[bool(adm), status, *map(float, linha)] for (adm, status), linha in zip(totais.index, totais.to_numpy())],
+            "valor_agregado": somas_valor_agregado(valor_agregado(df_arquivo), df_arquivo)}
+
+def totais_com_arquivo(totais, agregados):
+    """totais_grupo das obras ativas + os do arquivo."""
+    if not agregados or not agregados["totais"]: return totais
+    indice = pd.MultiIndex.from_tuples([tuple(linha[:2]) for linha in agregados["totais"]], names=totais.index.names)
+    arquivo = pd.DataFrame([linha[2:] for linha in agregados["totais"]], index=indice, columns=agregados["colunas"])
+    return totais.add(arquivo, fill_value=0).astype({'Qtd': int})
+
+def somas_com_arquivo(somas, agregados):
+    """somas_valor_agregado das obras ativas + as do arquivo."""
+    if not agregados or not agregados["qtd"]: return somas
+    return {chave: valor + agregados["valor_agregado"].get(chave, 0.0) for chave, valor in somas.items()}
+
+def vendido_custo_arquivo(agregados):
+    """(Vendido, Custo_Total) das obras arquivadas, para previsao_margem."""
+    if not agregados or not agregados["totais"]: return (0.0, 0.0)
+    i, j = agregados["colunas"].index('Vendido') + 2, agregados["colunas"].index('Custo_Total') + 2
+    return (sum(l[i] for l in agregados["totais"] if not l[0]), sum(l[j] for l in agregados["totais"] if not l[0]))
@@ -0,0 +1,113 @@
+import streamlit as st
+from collections import Counter
+import datetime
+import os
+import re
+import sys
+import threading
+import time
+
+# ---------------------------------------------------------
+# PERFIL DE EXECUÇÃO POR RERUN (DIAGNÓSTICO EM PRODUÇÃO)
+# ---------------------------------------------------------
+# Só para admins ([perfil] admins = ["usuario"] no secrets.toml), ligado por
+# ?perfil=1 na URL ou pelo botão em Configurações (vale para a sessão).
+# Uma thread amostra a pilha da thread do rerun a cada INTERVALO_AMOSTRA_S e
+# grava as pilhas no formato "folded" (a;b;c N), que o speedscope.app e o
+# flamegraph.pl abrem direto. Desligado, o custo é uma consulta ao
+# session_state por rerun.
+INTERVALO_AMOSTRA_S = 0.005
+DIRETORIO_PADRAO = "perfis"
+
+def _rotulo(codigo):
+    return f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno})"
+
+class AmostradorPilha:
+    """with AmostradorPilha(): ... -> pilhas amostradas da thread que entrou no bloco."""
+    def __init__(self, intervalo_s=INTERVALO_AMOSTRA_S):
+        self.intervalo_s = intervalo_s
+        self.pilhas = Counter()
+        self.duracao_s = 0.0
+        self._parar = threading.Event()
+
+    def __enter__(self):
+        self._alvo = threading.get_ident()
+        self._raiz = sys._getframe(1)
+        self._thread = threading.Thread(target=self._amostrar, name="perfil-amostrador", daemon=True)
+        self._inicio = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.duracao_s = time.perf_counter() - self._inicio
+        self._parar.set()
+        self._thread.join()
+        return False
+
+    def _amostrar(self):
+        while not self._parar.wait(self.intervalo_s):
+            frame = sys._current_frames().get(self._alvo)
+            pilha = []
+            while frame is not None and frame is not self._raiz:
+                pilha.append(_rotulo(frame.f_code))
+                frame = frame.f_back
+            if pilha: self.pilhas[tuple(reversed(pilha))] += 1
+
+    @property
+    def amostras(self): return sum(self.pilhas.values())
+
+    def folded(self):
+        return "".join(f"{';'.join(pilha)} {n}\n" for pilha, n in self.pilhas.most_common())
+
+    def mais_quentes(self, n=8):
+        """(função, % próprio, % inclusivo) das funções com mais amostras no topo da pilha."""
+        total = self.amostras or 1
+        proprio, inclusivo = Counter(), Counter()
+        for pilha, qtd in self.pilhas.items():
+            proprio[pilha[-1]] += qtd
+            for rotulo in set(pilha): inclusivo[rotulo] += qtd
+        return [(rotulo, qtd * 100 / total, inclusivo[rotulo] * 100 / total) for rotulo, qtd in proprio.most_common(n)]
+
+def _config():
+    try: return dict(st.secrets.get("perfil", {}))
+    except (FileNotFoundError, KeyError): return {}
+
+def usuario_admin():
+    return st.session_state.get("username") in _config().get("admins", [])
+
+def perfil_ativo():
+    if not (st.session_state.get("perfil_sessao") or st.query_params.get("perfil") == "1"): return False
+    return usuario_admin()
+
+def salvar(amostrador, pagina):
+    diretorio = _config().get("diretorio", DIRETORIO_PADRAO)
+    os.makedirs(diretorio, exist_ok=True)
+    usuario = re.sub(r"[^\w.-]", "_", str(st.session_state.get("username")))
+    nome = f"{datetime.datetime.now():%Y%m%d-%H%M%S}_{pagina}_{usuario}.folded"
+    caminho = os.path.join(diretorio, nome)
+    with open(caminho, "w", encoding="utf-8") as f: f.write(amostrador.folded())
+    return caminho
+
+def rodar_pagina(pg):
+    """pg.run(), com amostragem e gravação do perfil quando ativo; o resumo fica em session_state['ultimo_perfil']."""
+    if not perfil_ativo():
+        pg.run()
+        return
+    pagina = pg.url_path or re.sub(r"\W+", "_", pg.title.lower())  # a página padrão não tem url_path
+    amostrador = AmostradorPilha()
+    try:
+        with amostrador: pg.run()
+    finally:
+        # st.stop/switch_page também passam por aqui: o perfil do rerun é gravado do mesmo jeito.
+        st.session_state["ultimo_perfil"] = {
+            "pagina": pagina, "arquivo": salvar(amostrador, pagina), "duracao_s": amostrador.duracao_s,
+            "amostras": amostrador.amostras, "quentes": amostrador.mais_quentes(),
+        }
+
+def resumo_ultimo_perfil():
+    """Expander na barra lateral com o último perfil gravado nesta sessão (só admins)."""
+    perfil = st.session_state.get("ultimo_perfil")
+    if perfil is None or not usuario_admin(): return
+    with st.sidebar.expander(f"⏱️ Perfil: {perfil['pagina']} · {perfil['duracao_s'] * 1000:.0f} ms"):
+        st.caption(f"{perfil['amostras']} amostras · `{perfil['arquivo']}`")
+        st.markdown("\n".join(f"- `{rotulo}` {proprio:.0f}% (incl. {incl:.0f}%)" for rotulo, proprio, incl in perfil["quentes"]))
@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+from cache_versao import memorizar
+from base_dados import mascara_adm, STATUS_ABERTO
+
+# ---------------------------------------------------------
+# PREVISÃO DE MARGEM NO TÉRMINO (MONTE CARLO)
+# ---------------------------------------------------------
+# Para cada obra em aberto (em andamento ou não iniciada) e cada categoria (Mat, Desp, HH em R$):
+#   custo final = real + orçado x (1 - avanço) x fator
+# O fator é o desempenho de custo da categoria (real / (orçado x avanço)),
+# puxado para 1,0 quando a obra está no início (peso = avanço), com ruído
+# lognormal que diminui conforme a obra avança. Parte do ruído é comum a
+# todas as obras (RHO), para a carteira não ficar otimista demais.
+# Obra não iniciada entra com avanço 0: o orçado inteiro, com o ruído máximo
+# (o Vendido dela já conta na carteira, o custo também precisa contar).
+# Impostos entram como já estão na planilha. Obras concluídas ficam com o
+# custo atual.
+STATUS_PREVISAO = STATUS_ABERTO
+CATEGORIAS = [('Mat_Orc', 'Mat_Real'), ('Desp_Orc', 'Desp_Real'), ('HH_Orc_Vlr', 'HH_Real_Vlr')]
+SORTEIOS = 20_000
+BLOCO_PROJETOS = 64   # obras simuladas de cada vez: pico de memória ~ BLOCO x SORTEIOS x float32 por matriz
+CLASSES_HISTOGRAMA = 60
+SIGMA_BASE = 0.35
+RHO = 0.3
+FATOR_MAX = 4.0
+SEMENTE = 7
+
+def _margem(vendido, custo):
+    return np.divide((vendido - custo) * 100, vendido, out=np.zeros_like(custo), where=vendido > 0)
+
+def _simular_bloco(df, comum, rng):
+    n, sorteios = len(df), comum.shape[1]
+    iniciada = (df['Status'] != 'Não iniciado').to_numpy()
+    avanco = np.where(iniciada, np.clip(df['Conclusao_%'].to_numpy(dtype=np.float32), 0, 100) / 100, np.float32(0))[:, None]
+    restante = 1 - avanco
+    sigma = SIGMA_BASE * np.sqrt(restante)
+
+    custo = np.repeat(df['Impostos'].to_numpy(dtype=np.float32)[:, None], sorteios, axis=1)
+    for col_orc, col_real in CATEGORIAS:
+        orc = df[col_orc].to_numpy(dtype=np.float32)[:, None]
+        real = df[col_real].to_numpy(dtype=np.float32)[:, None]
+        # Sem orçamento, o ritmo atual é a única referência do que falta gastar.
+        base = np.where(orc > 0, orc, np.divide(real, avanco, out=np.zeros_like(real), where=avanco > 0))
+        ganho = base * avanco
+        observado = np.divide(real, ganho, out=np.ones_like(real), where=ganho > 0)
+        fator = np.clip(avanco * observado + restante, 1 / FATOR_MAX, FATOR_MAX)
+        # Em float32 e no lugar (escalar float64 do numpy promoveria a matriz inteira).
+        z = rng.standard_normal((n, sorteios), dtype=np.float32)
+        z *= np.float32(np.sqrt(1 - RHO ** 2))
+        z += comum
+        z *= sigma
+        z -= sigma ** 2 / 2
+        np.exp(z, out=z)
+        z *= base * restante * fator
+        custo += z
+        custo += real
+    return custo
+
+def simular_custo_final(df, sorteios=SORTEIOS, semente=SEMENTE, bloco=BLOCO_PROJETOS):
+    """Custo final simulado das linhas do df, em blocos de até `bloco` projetos: gera (bloco do df, matriz
+    projetos x sorteios float32). O ruído comum é o mesmo para todos os blocos."""
+    rng = np.random.default_rng(semente)
+    comum = np.float32(RHO) * rng.standard_normal((1, sorteios), dtype=np.float32)
+    for inicio in range(0, len(df), bloco):
+        parte = df.iloc[inicio:inicio + bloco]
+        yield parte, _simular_bloco(parte, comum, rng)
+
+def calcular_previsao(df, meta_margem, sorteios=SORTEIOS, semente=SEMENTE, arquivadas=(0.0, 0.0)):
+    """P10/P50/P90 da margem final por obra em aberto e da carteira (obras sem ADM).
+    arquivadas = (Vendido, Custo_Total) das obras concluídas que não estão no df (particao.py)."""
+    df_obras = df[~mascara_adm(df)]
+    aberto = df_obras['Status'].isin(STATUS_PREVISAO).to_numpy()
+    df_aberto = df_obras[aberto]
+
+    # Bloco a bloco: percentis de cada obra e o custo da carteira somado por sorteio.
+    faixas, prob_meta = [np.empty((3, 0))], [np.empty(0)]
+    custo_abertas = np.zeros(sorteios)
+    for parte, custo_final in simular_custo_final(df_aberto, sorteios, semente):
+        margens = _margem(parte['Vendido'].to_numpy(dtype=np.float32)[:, None], custo_final)
+        faixas.append(np.percentile(margens, [10, 50, 90], axis=1))
+        prob_meta.append((margens >= meta_margem).mean(axis=1) * 100)
+        custo_abertas += custo_final.sum(axis=0, dtype=np.float64)
+    p10, p50, p90 = np.concatenate(faixas, axis=1)
+    por_projeto = pd.DataFrame({
+        'Projeto': df_aberto['Projeto'].to_numpy(),
+        'Margem_Atual': df_aberto['Margem_%'].to_numpy(dtype=float),
+        'Margem_P10': p10, 'Margem_P50': p50, 'Margem_P90': p90,
+        'Prob_Meta': np.concatenate(prob_meta),
+    }, index=df_aberto.index)
+
+    vendido_total = float(df_obras['Vendido'].sum()) + arquivadas[0]
+    custo_fixo = float(df_obras.loc[~aberto, 'Custo_Total'].sum()) + arquivadas[1]
+    margens_carteira = _margem(np.float64(vendido_total), custo_fixo + custo_abertas)
+    c10, c50, c90 = np.percentile(margens_carteira, [10, 50, 90])
+    contagens, bordas = np.histogram(margens_carteira, bins=CLASSES_HISTOGRAMA)
+    carteira = {
+        "margem_atual": _margem(np.float64(vendido_total), np.float64(df_obras['Custo_Total'].sum() + arquivadas[1])).item(),
+        "p10": float(c10), "p50": float(c50), "p90": float(c90),
+        "prob_meta": float((margens_carteira >= meta_margem).mean() * 100),
+        "meta": float(meta_margem), "qtd_simuladas": int(aberto.sum()), "sorteios": int(sorteios),
+        "histograma": {"contagens": contagens, "bordas": bordas},  # sorteios já agrupados: o navegador só recebe 60 barras
+    }
+    return por_projeto, carteira
+
+def previsao_margem(df, meta_margem, sorteios=SORTEIOS, semente=SEMENTE, arquivadas=(0.0, 0.0)):
+    """calcular_previsao memorizado por versão dos dados (passar a base completa, ou as ativas + arquivadas)."""
+    arquivadas = tuple(map(float, arquivadas))
+    return memorizar(df, "previsao_margem", lambda: calcular_previsao(df, meta_margem, sorteios, semente, arquivadas),
+                     float(meta_margem), sorteios, semente, arquivadas)
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import operator
+
+# ---------------------------------------------------------
+# REGRAS DE SAÚDE DOS PROJETOS
+# ---------------------------------------------------------
+# Cada regra compara uma coluna com uma referência (outra coluna, um parâmetro
+# "$nome" ou um número) mais uma folga. Regras "criticas" definem E_Critico;
+# as demais aparecem só como alerta. Para criar uma regra nova basta
+# acrescentar um item aqui: ela é compilada numa máscara vetorizada e avaliada
+# para a carteira inteira de uma vez.
+PARAMETROS_PADRAO = {
+    "meta_margem": 0.0,      # META_MARGEM_BRUTA (%), vem da Sheet2
+    "tolerancia_hh": 10.0,   # pontos % de horas acima do avanço físico
+}
+
+REGRAS_SAUDE = [
+    {"id": "margem", "titulo": "Margem", "descricao": "Margem abaixo da meta",
+     "coluna": "Margem_%", "operador": "<", "referencia": "$meta_margem",
+     "exceto_status": ["Apresentado"], "critica": True},
+    {"id": "hh", "titulo": "Horas", "descricao": "Consumo de horas acima do avanço físico",
+     "coluna": "HH_Progresso", "operador": ">", "referencia": "Conclusao_%", "folga": "$tolerancia_hh",
+     "critica": True},
+    {"id": "materiais", "titulo": "Materiais", "descricao": "Materiais acima do orçado",
+     "coluna": "Mat_Real", "operador": ">", "referencia": "Mat_Orc", "somente_com_orcamento": True,
+     "critica": False},
+    {"id": "despesas", "titulo": "Despesas", "descricao": "Despesas acima do orçado",
+     "coluna": "Desp_Real", "operador": ">", "referencia": "Desp_Orc", "somente_com_orcamento": True,
+     "critica": False},
+]
+
+OPERADORES = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge}
+
+# ---------------------------------------------------------
+# INDICADORES DERIVADOS (VETORIZADOS)
+# ---------------------------------------------------------
+def _razao_pct(num, den):
+    num = np.asarray(num, dtype=float); den = np.asarray(den, dtype=float)
+    return np.divide(num * 100.0, den, out=np.zeros_like(num), where=den > 0)
+
+def calcular_indicadores(df):
+    """Custo_Total, Margem_% e HH_Progresso para todas as linhas de uma vez."""
+    custo = (df['Mat_Real'] + df['Desp_Real'] + df['HH_Real_Vlr'] + df['Impostos']).to_numpy(dtype=float)
+    vendido = df['Vendido'].to_numpy(dtype=float)
+    df['Custo_Total'] = custo
+    df['Margem_%'] = _razao_pct(vendido - custo, vendido)
+    df['HH_Progresso'] = _razao_pct(df['HH_Real_Qtd'], df['HH_Orc_Qtd'])
+    return df
+
+# ---------------------------------------------------------
+# COMPILAÇÃO E AVALIAÇÃO
+# ---------------------------------------------------------
+def _valor(df, ref, params):
+    if isinstance(ref, str) and ref.startswith("$"): return float(params[ref[1:]])
+    if isinstance(ref, str): return df[ref].to_numpy(dtype=float) if ref in df.columns else None
+    return float(ref)
+
+def compilar_regra(regra):
+    """Transforma a declaração numa função df, params -> máscara booleana."""
+    op = OPERADORES[regra["operador"]]
+    def mascara(df, params):
+        if regra["coluna"] not in df.columns: return np.zeros(len(df), dtype=bool)
+        ref = _valor(df, regra["referencia"], params)
+        if ref is None: return np.zeros(len(df), dtype=bool)
+        alvo = df[regra["coluna"]].to_numpy(dtype=float)
+        m = op(alvo, ref + _valor(df, regra.get("folga", 0), params))
+        if regra.get("somente_com_orcamento"): m &= np.asarray(ref) > 0
+        if regra.get("exceto_status"): m &= ~df['Status'].isin(regra["exceto_status"]).to_numpy()
+        return m
+    return mascara
+
+REGRAS_COMPILADAS = [(r, compilar_regra(r)) for r in REGRAS_SAUDE]
+
+def avaliar_regras(df, **params):
+    """Uma coluna booleana por regra (Regra_<id>) + E_Critico, index alinhado ao df."""
+    params = {**PARAMETROS_PADRAO, **params}
+    resultado = pd.DataFrame(index=df.index)
+    critico = np.zeros(len(df), dtype=bool)
+    for regra, mascara in REGRAS_COMPILADAS:
+        m = mascara(df, params)
+        resultado[f"Regra_{regra['id']}"] = m
+        if regra["critica"]: critico |= m
+    resultado['E_Critico'] = critico
+    return resultado
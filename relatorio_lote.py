@@ -0,0 +1,170 @@
+"""Relatório estático (HTML) com o Painel de Obra de todos os projetos.
+
+Uso:
+    python relatorio_lote.py --secrets .streamlit/secrets.toml --saida relatorio.html
+    python relatorio_lote.py --projetos 4001 4002 --processos 4
+
+Gera um único arquivo com o resumo da carteira e uma seção por projeto
+(cards, gauges, cascata de lucro e detalhamento de custos). As seções são
+montadas em paralelo num pool de processos; o plotly.js entra uma vez só.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import datetime
+import html
+import os
+import time
+import tomllib
+from base_dados import carregar_planilha, kpis_carteira, metricas_projetos, agregados_insights
+from graficos_obra import (format_currency, format_percent, html_cabecalho, html_kpi_card, html_regras, figura_gauges,
+                           diagnostico_hh, html_diagnostico, figura_cascata, plot_row_fixed, CUSTOS_DETALHE)
+
+TAMANHO_LOTE = 25
+TOP_RANKING = 10
+
+CSS = """
+body {background-color: #0e1117; color: #e6edf3; font-family: "Source Sans Pro", sans-serif; margin: 0; padding: 20px 40px;}
+h1, h2 {color: white;}
+h3 {color: #e6edf3; margin-top: 25px;}
+a {color: #58a6ff;}
+.grid-kpi {display: grid; grid-template-columns: repeat(4, 1fr); gap: 15px;}
+.grid-2 {display: grid; grid-template-columns: 5fr 3fr; gap: 20px; align-items: center;}
+.kpi-card {background-color: #161b22; border: 1px solid #30363d; border-radius: 10px; padding: 20px 15px; display: flex; flex-direction: column; justify-content: center; align-items: center; text-align: center; min-height: 120px;}
+.kpi-title {color: #8b949e; font-size: 0.8rem; text-transform: uppercase; letter-spacing: 1px; font-weight: 600; margin-bottom: 10px;}
+.kpi-val {font-size: 1.8rem; font-weight: 800; color: white; margin: 0;}
+.header-box {background-color: #161b22; border: 1px solid #30363d; border-radius: 10px; padding: 25px; margin-bottom: 20px; margin-top: 10px; display: flex; justify-content: space-between; align-items: center;}
+.header-title {color: white; font-size: 1.5rem; font-weight: 700; margin: 0; line-height: 1.2;}
+.header-subtitle {color: #8b949e; font-size: 0.9rem; margin-top: 8px;}
+.header-status {font-weight: 700; padding: 6px 14px; border-radius: 6px; font-size: 0.8rem; text-transform: uppercase; letter-spacing: 1px;}
+.txt-green {color: #3fb950; font-weight: bold;}
+.txt-red {color: #da3633; font-weight: bold;}
+.rule-row {display: flex; gap: 10px; flex-wrap: wrap; margin-top: 15px;}
+.rule-item {background-color: #161b22; border: 1px solid #30363d; border-radius: 6px; padding: 8px 12px; font-size: 0.8rem; color: #e6edf3;}
+.bloco {border: 1px solid #30363d; border-radius: 8px; padding: 10px 15px; margin-top: 10px;}
+.projeto {page-break-before: always; border-top: 1px solid #30363d; margin-top: 40px; padding-top: 10px;}
+table {border-collapse: collapse; width: 100%; font-size: 0.85rem;}
+th, td {border-bottom: 1px solid #30363d; padding: 6px 10px; text-align: right;}
+th:first-child, td:first-child {text-align: left;}
+th {color: #8b949e; text-transform: uppercase; font-size: 0.75rem;}
+.indice {columns: 4; font-size: 0.85rem;}
+"""
+
+def _fig_html(fig):
+    return fig.to_html(full_html=False, include_plotlyjs=False, config={'displayModeBar': False})
+
+# ---------------------------------------------------------
+# SEÇÕES (rodam nos processos do pool)
+# ---------------------------------------------------------
+def secao_projeto(dados, meta_margem):
+    """Uma seção do relatório: mesmo conteúdo do Painel de Obra para um projeto."""
+    lucro_liquido, margem_real_pct = dados['Lucro'], dados['Margem_%']
+    cor_lucro, border_lucro = ("txt-green", "#3fb950") if lucro_liquido > 0 else ("txt-red", "#da3633")
+    cor_margem, border_margem = ("txt-green", "#3fb950") if margem_real_pct >= meta_margem else ("txt-red", "#da3633")
+    cards = (html_kpi_card("Valor Vendido", format_currency(dados['Vendido']), "#58a6ff")
+             + html_kpi_card("Valor Faturado", format_currency(dados['Faturado']), "#3fb950")
+             + html_kpi_card("Lucro Líquido", format_currency(lucro_liquido), border_lucro, cor_lucro)
+             + html_kpi_card("Margem %", format_percent(margem_real_pct), border_margem, cor_margem))
+
+    hh_real, hh_orc = dados['HH_Real_Qtd'], dados['HH_Orc_Qtd']
+    perc_hh = (hh_real / hh_orc * 100) if hh_orc > 0 else 0
+    gauges = _fig_html(figura_gauges(dados['Conclusao_%'], perc_hh, dados['Regra_hh']))
+    diag = html_diagnostico(*diagnostico_hh(perc_hh, dados['Conclusao_%'], dados['Regra_hh'], hh_orc - hh_real))
+    cascata = _fig_html(figura_cascata(dados, lucro_liquido, True))
+    custos = "".join(f'<div class="bloco">{_fig_html(plot_row_fixed(titulo, dados[col_orc], dados[col_real]))}</div>' for titulo, col_orc, col_real in CUSTOS_DETALHE)
+
+    return f"""
+<section class="projeto" id="p-{html.escape(str(dados['Projeto']))}">
+{html_cabecalho(dados)}
+<div class="grid-kpi">{cards}</div>
+{html_regras(dados)}
+<h3>⚙️ Eficiência Operacional</h3>
+<div class="bloco grid-2"><div>{gauges}</div><div>{diag}</div></div>
+<h3>📊 Composição do Lucro</h3>
+<div class="bloco">{cascata}</div>
+<h3>🔎 Detalhamento de Custos</h3>
+{custos}
+</section>
+"""
+
+def secoes_lote(linhas, meta_margem):
+    return [secao_projeto(dados, meta_margem) for dados in linhas]
+
+# ---------------------------------------------------------
+# RESUMO DA CARTEIRA
+# ---------------------------------------------------------
+def _tabela_ranking(df, titulo, coluna):
+    df = df.sort_values('Vendido', ascending=False).head(TOP_RANKING)
+    linhas = "".join(f"<tr><td>{html.escape(str(r[coluna]))}</td><td>{format_currency(r['Vendido'])}</td><td>{format_currency(r['Lucro'])}</td><td>{format_percent(r['Margem_%'])}</td></tr>"
+                     for _, r in df.iterrows())
+    return f"<h3>{titulo}</h3><table><tr><th>{coluna}</th><th>Vendido</th><th>Lucro</th><th>Margem</th></tr>{linhas}</table>"
+
+def resumo_carteira(df, metas):
+    k = kpis_carteira(df, metas)
+    cor_mg = "txt-green" if k["mg_geral"] >= k["META_MARGEM_BRUTA"] else "txt-red"
+    cor_liq = "txt-green" if k["mg_liquida_pos_adm"] >= k["META_MARGEM_LIQUIDA"] else "txt-red"
+    cards = (html_kpi_card("Valor Vendido", format_currency(k["valor_vendido_total"]), "#58a6ff")
+             + html_kpi_card("Valor Faturado", format_currency(k["valor_faturado_total"]), "#3fb950")
+             + html_kpi_card("Meta de Vendas", format_percent(k["pct_meta_venda"]), "#a371f7")
+             + html_kpi_card("Custo ADM", format_currency(k["custo_adm_total"]), "#d29922")
+             + html_kpi_card("Margem Bruta", format_percent(k["mg_geral"]), "#58a6ff", cor_mg)
+             + html_kpi_card("Margem Concluídas", format_percent(k["mg_concluida"]), "#58a6ff")
+             + html_kpi_card("Margem Líquida (pós ADM)", format_percent(k["mg_liquida_pos_adm"]), "#58a6ff", cor_liq)
+             + html_kpi_card("Projetos em Aberto", f"{k['qtd_aberto']} / {k['qtd_total']}", "#d29922"))
+    insights = agregados_insights(df)
+    return f"""
+<h2>Resumo da Carteira</h2>
+<div class="grid-kpi">{cards}</div>
+<div class="grid-2" style="align-items: start;">
+<div>{_tabela_ranking(insights["ranking_cliente"], "Top Clientes (concluídas)", "Cliente")}</div>
+<div>{_tabela_ranking(insights["ranking_cidade"], "Top Cidades (concluídas)", "Cidade")}</div>
+</div>
+"""
+
+# ---------------------------------------------------------
+# MONTAGEM
+# ---------------------------------------------------------
+def gerar_relatorio(base, projetos=None, processos=None):
+    from plotly.offline import get_plotlyjs
+    df, metas = base["dados"], base["metas"]
+    meta_margem = kpis_carteira(df, metas)["META_MARGEM_BRUTA"]
+    df_proj = metricas_projetos(df, metas).sort_values('Projeto')
+    if projetos: df_proj = df_proj[df_proj['Projeto'].isin([str(p) for p in projetos])]
+
+    linhas = df_proj.to_dict("records")
+    lotes = [linhas[i:i + TAMANHO_LOTE] for i in range(0, len(linhas), TAMANHO_LOTE)]
+    with ProcessPoolExecutor(max_workers=processos) as pool:
+        secoes = [s for lote in pool.map(secoes_lote, lotes, [meta_margem] * len(lotes)) for s in lote]
+
+    indice = "".join(f'<div><a href="#p-{html.escape(p)}">{html.escape(p)}</a></div>' for p in df_proj['Projeto'])
+    gerado_em = datetime.datetime.now().strftime("%d/%m/%Y %H:%M")
+    return f"""<!DOCTYPE html>
+<html lang="pt-BR"><head><meta charset="utf-8"><title>Relatório de Obras - {gerado_em}</title>
+<style>{CSS}</style><script type="text/javascript">{get_plotlyjs()}</script></head>
+<body>
+<h1>Relatório de Obras</h1>
+<div style="color: #8b949e;">Gerado em {gerado_em} · versão dos dados {html.escape(str(base["versao"]))} · {len(secoes)} projetos</div>
+{resumo_carteira(df, metas)}
+<h2>Projetos</h2>
+<div class="indice">{indice}</div>
+{"".join(secoes)}
+</body></html>
+"""
+
+def main():
+    parser = argparse.ArgumentParser(description="Relatório em lote do Painel de Obra")
+    parser.add_argument("--secrets", default=".streamlit/secrets.toml")
+    parser.add_argument("--saida", default="relatorio.html")
+    parser.add_argument("--processos", type=int, default=os.cpu_count())
+    parser.add_argument("--projetos", nargs="*", help="só estes projetos (padrão: todos)")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    with open(args.secrets, "rb") as f: secrets = tomllib.load(f)
+    base = carregar_planilha(dict(secrets["gcp_service_account"]))
+    if base is None: raise SystemExit("Arquivo .xlsx não encontrado no Drive")
+    conteudo = gerar_relatorio(base, args.projetos, args.processos)
+    with open(args.saida, "w", encoding="utf-8") as f: f.write(conteudo)
+    print(f"{args.saida} gerado em {time.perf_counter() - inicio:.1f}s")
+
+if __name__ == "__main__":
+    main()
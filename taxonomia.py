@@ -0,0 +1,77 @@
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+from cache_versao import memorizar
+
+# ---------------------------------------------------------
+# TAXONOMIA DOS PROJETOS (PREFIXO DO CÓDIGO -> CLASSE)
+# ---------------------------------------------------------
+# Aba "Taxonomia" da planilha, colunas Prefixo | Classe (ex.: 5009 | ADM,
+# 7 | Serviço, 81 | Garantia). Vale o prefixo mais longo; código sem prefixo
+# cadastrado é CLASSE_PADRAO. Sem a aba vale a regra antiga (5009, 5010 e
+# 5011 = ADM). A tabela é compilada uma vez (um índice de prefixos por
+# tamanho) e a classificação roda só sobre os códigos distintos, memorizada
+# por versão dos dados: cadastrar uma família nova de centro de custo não
+# custa nada na renderização.
+ABA_TAXONOMIA = "Taxonomia"
+CLASSE_ADM = "ADM"
+CLASSE_PADRAO = "Obra"
+PADRAO = (("5009", CLASSE_ADM), ("5010", CLASSE_ADM), ("5011", CLASSE_ADM))
+
+def _texto(valor):
+    s = "" if pd.isna(valor) else str(valor).strip()
+    return s[:-2] if s.endswith(".0") else s  # célula numérica do Excel (5009.0)
+
+def ler_taxonomia(planilha):
+    """Pares (prefixo, classe) da aba Taxonomia do pd.ExcelFile; PADRAO se a aba não existir ou estiver vazia."""
+    if ABA_TAXONOMIA not in planilha.sheet_names: return PADRAO
+    df_tax = planilha.parse(ABA_TAXONOMIA, dtype=str)
+    if df_tax.shape[1] < 2: return PADRAO
+    regras = tuple((_texto(p), _texto(c)) for p, c in zip(df_tax.iloc[:, 0], df_tax.iloc[:, 1]))
+    return tuple((p, c) for p, c in regras if p and c) or PADRAO
+
+class Taxonomia:
+    def __init__(self, regras):
+        # Prefixo repetido: vale a última linha da aba.
+        self.regras = tuple(dict((str(p), str(c)) for p, c in regras).items())
+        self.chave = hashlib.md5(repr(self.regras).encode()).hexdigest()
+        self.classes = pd.Index(sorted({c for _, c in self.regras} | {CLASSE_ADM, CLASSE_PADRAO}))
+        por_tamanho = {}
+        for prefixo, classe in self.regras: por_tamanho.setdefault(len(prefixo), {})[prefixo] = classe
+        # Do prefixo mais longo para o mais curto: o primeiro que casa é o mais específico.
+        self._niveis = [(n, pd.Index(list(d)), self.classes.get_indexer(list(d.values())))
+                        for n, d in sorted(por_tamanho.items(), reverse=True)]
+
+    def classificar(self, projetos):
+        """Categorical com a classe de cada código de projeto."""
+        codigos, distintos = pd.factorize(pd.Series(projetos).astype(str).to_numpy(), use_na_sentinel=False)
+        classe = np.full(len(distintos), self.classes.get_loc(CLASSE_PADRAO))
+        pendente = np.ones(len(distintos), dtype=bool)
+        distintos = pd.Index(distintos, dtype=str)
+        for n, prefixos, classes in self._niveis:
+            pos = prefixos.get_indexer(distintos.str[:n])
+            achou = pendente & (pos >= 0)
+            classe[achou] = classes[pos[achou]]
+            pendente &= ~achou
+        return pd.Categorical.from_codes(classe[codigos], categories=self.classes)
+
+    def prefixos(self, classe): return [p for p, c in self.regras if c == classe]
+
+# --- taxonomia em vigor no processo (a da última base carregada) ---
+_vigente = Taxonomia(PADRAO)
+_lock = threading.Lock()
+
+def definir_taxonomia(regras):
+    global _vigente
+    nova = Taxonomia(regras)
+    with _lock:
+        if nova.chave != _vigente.chave: _vigente = nova
+
+def taxonomia_vigente(): return _vigente
+
+def classes_projetos(df):
+    """Classe de cada linha (Series categórica, índice do df), uma vez por versão dos dados e taxonomia."""
+    tax = _vigente
+    classes = memorizar(df, "classes_projetos", lambda: tax.classificar(df['Projeto']), tax.chave)
+    return pd.Series(classes, index=df.index, name='Classe')
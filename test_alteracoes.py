@@ -0,0 +1,18 @@
+import pandas as pd
+from alteracoes import BaseIncremental
+
+def _base(projetos, vendido):
+    zeros = dict.fromkeys(['Faturado', 'Custo_Total', 'Mat_Real', 'Desp_Real', 'HH_Real_Vlr'], 0.0)
+    return pd.DataFrame({'Projeto': projetos, 'Status': 'Em andamento', 'Vendido': vendido, **zeros})
+
+def test_projeto_duplicado_nao_trava_as_versoes_seguintes():
+    base = BaseIncremental()
+    base.atualizar(_base(['6001', '6002'], [10.0, 20.0]), "v1")
+    duplicada = base.atualizar(_base(['6001', '6001', '6002'], [10.0, 11.0, 20.0]), "v2")
+    assert len(duplicada) == 3
+    corrigida = base.atualizar(_base(['6001', '6002'], [15.0, 20.0]), "v3")
+    assert corrigida['Vendido'].tolist() == [15.0, 20.0]
+    assert base.totais_de(corrigida)['Vendido'].sum() == 35.0
+    # e a versão seguinte volta ao caminho incremental
+    base.atualizar(_base(['6001', '6002'], [15.0, 25.0]), "v4")
+    assert base.feed[0]["completa"] is False and base.totais['Vendido'].sum() == 40.0
@@ -0,0 +1,313 @@
+"""Teste de carga: várias sessões autenticadas navegando pelo dashboard ao mesmo tempo.
+
+Uso:
+    python teste_carga.py --sessoes 20 --duracao 60
+    python teste_carga.py --sessoes 50 --projetos 800 --latencia-drive 300 --json carga.json
+    python teste_carga.py --planilha dados_dashboard_obras.xlsx
+
+Roda o main.py com o AppTest do Streamlit (sem navegador) e troca o Drive
+por um falso local (planilha sintética ou um .xlsx informado), com latência
+configurável. Cada sessão repete o roteiro: Gestão da Carteira -> filtros e
+ordenação -> "Abrir ↗" num projeto -> troca de unidade no Painel de Obra ->
+Dados & Insights e troca da base de faturamento em Custos Internos (o AppTest
+monta todas as abas, então o rádio está sempre disponível). Todas as sessões rodam
+em threads do mesmo processo, como no servidor do Streamlit, e compartilham o
+st.cache_data.
+
+Saída: por página, reruns, latência p50/p95/p99, vazão e pico de RSS.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter, defaultdict
+import argparse
+import hashlib
+import io
+import json
+import os
+import random
+import resource
+import tempfile
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+SECRETS_CARGA = {
+    "gcp_service_account": {"type": "service_account", "client_email": "carga@teste", "private_key_id": "carga"},
+    "credentials": {"usernames": {"carga": {"email": "carga@teste", "name": "Teste de Carga", "password": "-"}}},
+    "cookie": {"name": "dashboard_carga", "key": "carga", "expiry_days": 1},
+    "preauthorized": {"emails": []},
+}
+
+# ---------------------------------------------------------
+# BACKEND FALSO (DRIVE)
+# ---------------------------------------------------------
+def planilha_sintetica(n_projetos, semente=42):
+    """Sheet1/Sheet2 no mesmo layout da planilha real, com valores aleatórios."""
+    rng = np.random.default_rng(semente)
+    n_adm = 3
+    vendido = np.round(rng.uniform(10_000, 2_000_000, n_projetos), 2)
+    vendido[:n_adm] = 0.0
+    fator = lambda: rng.uniform(0.2, 1.3, n_projetos)
+    df = pd.DataFrame({
+        'Projeto': [f"{p}01" for p in ("5009", "5010", "5011")] + [str(6000 + i) for i in range(n_projetos - n_adm)],
+        'Descricao': [f"Obra {i}" for i in range(n_projetos)],
+        'Cliente': [f"Cliente {i}" for i in rng.integers(0, max(1, n_projetos // 8), n_projetos)],
+        'Cidade': [f"Cidade {i}" for i in rng.integers(0, 12, n_projetos)],
+        'Status': rng.choice(['Não iniciado', 'Em andamento', 'Finalizado', 'Apresentado'], n_projetos),
+        'Tipo': rng.choice(['Elétrica', 'Automação', 'Civil', ''], n_projetos),
+        'Vendido': vendido,
+        'Faturado': np.round(vendido * rng.random(n_projetos), 2),
+        'Mat_Orc': np.round(vendido * 0.3, 2), 'Mat_Real': np.round(vendido * 0.3 * fator(), 2),
+        'Desp_Orc': np.round(vendido * 0.1, 2), 'Desp_Real': np.round(vendido * 0.1 * fator(), 2),
+        'HH_Orc_Vlr': np.round(vendido * 0.2, 2), 'HH_Real_Vlr': np.round(vendido * 0.2 * fator(), 2),
+        'HH_Orc_Qtd': [f"{h}:00:00" for h in rng.integers(50, 900, n_projetos)],
+        'HH_Real_Qtd': [f"{h}:30:00" for h in rng.integers(10, 900, n_projetos)],
+        'Impostos': np.round(vendido * 0.08, 2),
+        'Conclusao_%': np.round(rng.random(n_projetos), 2),
+    })
+    # Os ADM também têm consumo real (é o overhead da carteira).
+    df.loc[:n_adm - 1, ['Mat_Real', 'Desp_Real', 'HH_Real_Vlr']] = np.round(rng.uniform(5_000, 80_000, (n_adm, 3)), 2)
+    # Concluídas nos últimos ~3 anos: parte vai para o arquivo (particao.py).
+    concluida = df['Status'].isin(['Finalizado', 'Apresentado'])
+    dias = pd.to_timedelta(rng.integers(0, 1100, n_projetos), unit='D')
+    df['Data_Conclusao'] = (pd.Timestamp.now().normalize() - dias).where(concluida)
+    saida = io.BytesIO()
+    with pd.ExcelWriter(saida, engine='openpyxl') as writer:
+        df.to_excel(writer, sheet_name='Sheet1', index=False)
+        pd.DataFrame([{'Meta Vendas': 20_000_000, 'Meta Margem': 0.25, 'Meta Adm': 0.05}]).to_excel(writer, sheet_name='Sheet2', index=False)
+    return saida.getvalue()
+
+class DriveFalso:
+    """Mesma interface usada do conexao_google.ClienteDrive, servindo bytes locais."""
+    def __init__(self, conteudo, latencia_s=0.0):
+        self.conteudo = conteudo
+        self.latencia_s = latencia_s
+        self.md5 = hashlib.md5(conteudo).hexdigest()
+        self.chamadas = Counter()
+        self.lock = threading.Lock()
+
+    def _chamada(self, nome):
+        with self.lock: self.chamadas[nome] += 1
+        if self.latencia_s: time.sleep(self.latencia_s)
+
+    def localizar_arquivo(self, nome=None, campos=None):
+        self._chamada("localizar")
+        return {'id': 'carga', 'name': nome, 'md5Checksum': self.md5, 'modifiedTime': '2026-01-01T00:00:00Z', 'size': str(len(self.conteudo))}
+
+    def baixar(self, file_id, md5=None):
+        self._chamada("baixar")
+        return io.BytesIO(self.conteudo)
+
+def instalar_backend(conteudo, latencia_s):
+    import conexao_google
+    import base_dados
+    import cache_compartilhado
+    # Cache compartilhado num diretório só deste teste (nada de versão de outra execução).
+    os.environ["DASHBOARD_CACHE_DIR"] = tempfile.mkdtemp(prefix="teste_carga_")
+    drive = DriveFalso(conteudo, latencia_s)
+    conexao_google.cliente_drive = base_dados.cliente_drive = cache_compartilhado.cliente_drive = lambda creds_info: drive
+    return drive
+
+# ---------------------------------------------------------
+# MEDIÇÃO
+# ---------------------------------------------------------
+def rss_atual_mb():
+    try:
+        with open("/proc/self/statm") as f: paginas = int(f.read().split()[1])
+        return paginas * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+class Medidor:
+    """Latência por rerun e pico de RSS observado enquanto cada página roda."""
+    def __init__(self, intervalo_s=0.05):
+        self.lock = threading.Lock()
+        self.latencias = defaultdict(list)
+        self.erros = Counter()
+        self.exemplo_erro = {}
+        self.rss_pico = defaultdict(float)
+        self.ativas = Counter()
+        self.intervalo_s = intervalo_s
+        self.parar = threading.Event()
+        self.amostrador = threading.Thread(target=self._amostrar, daemon=True)
+
+    def _amostrar(self):
+        while not self.parar.wait(self.intervalo_s):
+            rss = rss_atual_mb()
+            with self.lock:
+                for pagina, n in self.ativas.items():
+                    if n: self.rss_pico[pagina] = max(self.rss_pico[pagina], rss)
+
+    def rerun(self, at, pagina):
+        with self.lock: self.ativas[pagina] += 1
+        inicio = time.perf_counter()
+        try: at.run()
+        finally:
+            dt = time.perf_counter() - inicio
+            rss = rss_atual_mb()
+            with self.lock:
+                self.ativas[pagina] -= 1
+                self.latencias[pagina].append(dt)
+                self.rss_pico[pagina] = max(self.rss_pico[pagina], rss)
+                if at.exception:
+                    self.erros[pagina] += 1
+                    self.exemplo_erro.setdefault(pagina, str(at.exception[0].value)[:300])
+        return at
+
+    def relatorio(self, duracao_s):
+        linhas = []
+        todas = [dt for lat in self.latencias.values() for dt in lat]
+        for pagina, lat in list(self.latencias.items()) + [("TOTAL", todas)]:
+            if not lat: continue
+            p50, p95, p99 = np.percentile(np.asarray(lat) * 1000, [50, 95, 99])
+            linhas.append({
+                "pagina": pagina, "reruns": len(lat), "erros": sum(self.erros.values()) if pagina == "TOTAL" else self.erros[pagina],
+                "p50_ms": round(p50, 1), "p95_ms": round(p95, 1), "p99_ms": round(p99, 1),
+                "reruns_por_s": round(len(lat) / duracao_s, 2),
+                "rss_pico_mb": round(max(self.rss_pico.values(), default=0) if pagina == "TOTAL" else self.rss_pico[pagina], 1),
+            })
+        return linhas
+
+# ---------------------------------------------------------
+# ROTEIRO DE UMA SESSÃO
+# ---------------------------------------------------------
+def preparar_apptest_concorrente():
+    """O AppTest assume um teste por vez: cria e apaga o Runtime global a cada
+    run, liga a opção global.appTest só durante o run e recompila o script.
+    Com várias sessões em threads, quem termina desfaria o estado de quem
+    ainda está rodando, e o compile() concorrente do Python 3.11 falha. Aqui
+    o Runtime e a opção ficam fixos e a compilação dos scripts é serializada."""
+    from unittest.mock import MagicMock
+    import contextlib
+    from streamlit import config
+    from streamlit.testing.v1 import app_test
+    from streamlit.testing.v1.util import build_mock_config_get_option
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.dataframe_source_manager import DataframeSourceManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+
+    fixo = MagicMock(spec=Runtime)
+    fixo.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    fixo.dataframe_source_mgr = DataframeSourceManager()
+    fixo.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime.instance = classmethod(lambda cls: cls._instance or fixo)
+    Runtime.exists = classmethod(lambda cls: True)
+    config.get_option = build_mock_config_get_option({"global.appTest": True})
+    app_test.patch_config_options = lambda opcoes: contextlib.nullcontext()
+
+    lock_compilacao = threading.Lock()
+    get_bytecode = ScriptCache.get_bytecode
+    def get_bytecode_serializado(self, script_path):
+        with lock_compilacao: return get_bytecode(self, script_path)
+    ScriptCache.get_bytecode = get_bytecode_serializado
+
+def nova_sessao(usuario):
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(os.path.join(RAIZ, "main.py"), default_timeout=120)
+    for chave, valor in SECRETS_CARGA.items(): at.secrets[chave] = valor
+    # Sessão já autenticada (o cookie do streamlit-authenticator não existe no AppTest).
+    at.session_state["authentication_status"] = True
+    at.session_state["username"] = usuario
+    at.session_state["name"] = SECRETS_CARGA["credentials"]["usernames"][usuario]["name"]
+    return at
+
+def _widget(lista, rotulo):
+    return next((w for w in lista if w.label == rotulo), None)
+
+def roteiro(medidor, rnd, at):
+    """Uma volta pelas três páginas principais."""
+    at.switch_page("gestao_carteira.py")
+    medidor.rerun(at, "Gestão da Carteira")
+
+    filtro = _widget(at.multiselect, "Filtrar por:")
+    if filtro is not None and filtro.options:
+        filtro.set_value(rnd.sample(filtro.options, rnd.randint(1, len(filtro.options))))
+        medidor.rerun(at, "Gestão da Carteira")
+    ordem = _widget(at.selectbox, "Ordenar por:")
+    if ordem is not None:
+        ordem.set_value(rnd.choice(ordem.options))
+        medidor.rerun(at, "Gestão da Carteira")
+
+    abrir = [b for b in at.button if b.label.startswith("Abrir")]
+    if abrir:
+        rnd.choice(abrir).click()
+        medidor.rerun(at, "Painel de Obra")
+        unidade = _widget(at.radio, "Unidade de Medida:")
+        if unidade is not None:
+            unidade.set_value("Valores (R$)")
+            medidor.rerun(at, "Painel de Obra")
+
+    at.switch_page("dados_insights.py")
+    medidor.rerun(at, "Dados & Insights")
+    base = _widget(at.radio, "Base de Faturamento:")
+    if base is not None:
+        base.set_value(rnd.choice(base.options))
+        medidor.rerun(at, "Dados & Insights")
+
+def sessao(medidor, indice, prazo, voltas, semente):
+    rnd = random.Random(semente + indice)
+    at = nova_sessao("carga")
+    feitas = 0
+    while feitas < voltas and time.monotonic() < prazo:
+        roteiro(medidor, rnd, at)
+        feitas += 1
+    return feitas
+
+# ---------------------------------------------------------
+# EXECUÇÃO
+# ---------------------------------------------------------
+def imprimir(linhas, medidor, drive, args, duracao_s, voltas):
+    print(f"\n{args.sessoes} sessões · {duracao_s:.1f}s · {voltas} voltas · {args.projetos} projetos · latência Drive {args.latencia_drive} ms")
+    print(f"Chamadas ao backend falso: {dict(drive.chamadas)}")
+    cab = f"{'Página':<22}{'reruns':>8}{'erros':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'reruns/s':>10}{'RSS pico MB':>13}"
+    print(cab); print("-" * len(cab))
+    for l in linhas:
+        print(f"{l['pagina']:<22}{l['reruns']:>8}{l['erros']:>7}{l['p50_ms']:>10.1f}{l['p95_ms']:>10.1f}{l['p99_ms']:>10.1f}{l['reruns_por_s']:>10.2f}{l['rss_pico_mb']:>13.1f}")
+    for pagina, erro in medidor.exemplo_erro.items(): print(f"Primeiro erro em {pagina}: {erro}")
+
+def main():
+    from streamlit.logger import set_log_level
+    parser = argparse.ArgumentParser(description="Teste de carga do Dashboard Obras")
+    parser.add_argument("--sessoes", type=int, default=10, help="sessões simultâneas")
+    parser.add_argument("--duracao", type=float, default=60, help="segundos de teste (após o aquecimento)")
+    parser.add_argument("--voltas", type=int, default=10**9, help="máximo de voltas por sessão")
+    parser.add_argument("--projetos", type=int, default=200, help="tamanho da planilha sintética")
+    parser.add_argument("--planilha", help="usar este .xlsx em vez da planilha sintética")
+    parser.add_argument("--latencia-drive", type=float, default=150, help="ms por chamada ao Drive falso")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--json", help="grava o resultado neste arquivo")
+    args = parser.parse_args()
+
+    set_log_level("error")
+    os.chdir(RAIZ)
+    if args.planilha:
+        with open(args.planilha, "rb") as f: conteudo = f.read()
+    else:
+        conteudo = planilha_sintetica(args.projetos, args.semente)
+    drive = instalar_backend(conteudo, args.latencia_drive / 1000)
+    preparar_apptest_concorrente()
+
+    # Aquecimento: uma volta sozinha (imports, primeira carga do cache).
+    roteiro(Medidor(), random.Random(args.semente), nova_sessao("carga"))
+
+    medidor = Medidor()
+    medidor.amostrador.start()
+    inicio = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.sessoes) as pool:
+        futuros = [pool.submit(sessao, medidor, i, inicio + args.duracao, args.voltas, args.semente) for i in range(args.sessoes)]
+        voltas = sum(f.result() for f in futuros)
+    duracao_s = time.monotonic() - inicio
+    medidor.parar.set()
+
+    linhas = medidor.relatorio(duracao_s)
+    imprimir(linhas, medidor, drive, args, duracao_s, voltas)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"sessoes": args.sessoes, "duracao_s": duracao_s, "voltas": voltas, "paginas": linhas}, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
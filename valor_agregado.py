@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+from cache_versao import memorizar
+
+# ---------------------------------------------------------
+# VALOR AGREGADO (EVM) DA CARTEIRA
+# ---------------------------------------------------------
+# BAC = orçamento (Mat + Desp + HH em R$)      AC = custo real (Mat + Desp + HH em R$)
+# EV  = BAC x avanço físico                     CPI = EV / AC
+# IP_HH = horas ganhas / horas gastas (HH_Orc_Qtd x avanço / HH_Real_Qtd): índice de
+#         produtividade da mão de obra. Não é SPI: a planilha não tem cronograma
+#         (valor planejado), e um "SPI" pelo custo sem PV seria só EV / AC, o CPI.
+# EAC = BAC / CPI    ETC = EAC - AC    VAC = BAC - EAC
+# Sem custo real (ou sem horas) o índice fica 1,0: não há desvio para projetar.
+COLS_VALOR_AGREGADO = ['BAC', 'AC', 'EV', 'CPI', 'IP_HH', 'EAC', 'ETC', 'VAC']
+
+def _indice(num, den):
+    num = np.asarray(num, dtype=float); den = np.asarray(den, dtype=float)
+    return np.divide(num, den, out=np.ones_like(num), where=den > 0)
+
+def calcular_valor_agregado(df):
+    """Colunas de valor agregado para todas as linhas de uma vez (mesmo índice do df)."""
+    avanco = np.clip(df['Conclusao_%'].to_numpy(dtype=float), 0, 100) / 100
+    bac = (df['Mat_Orc'] + df['Desp_Orc'] + df['HH_Orc_Vlr']).to_numpy(dtype=float)
+    ac = (df['Mat_Real'] + df['Desp_Real'] + df['HH_Real_Vlr']).to_numpy(dtype=float)
+    ev = bac * avanco
+    cpi = _indice(ev, ac)
+    ip_hh = _indice(df['HH_Orc_Qtd'].to_numpy(dtype=float) * avanco, df['HH_Real_Qtd'])
+    eac = np.divide(bac, cpi, out=np.where(ac > bac, ac, bac), where=cpi > 0)
+    return pd.DataFrame({
+        'BAC': bac, 'AC': ac, 'EV': ev, 'CPI': cpi, 'IP_HH': ip_hh,
+        'EAC': eac, 'ETC': np.maximum(eac - ac, 0), 'VAC': bac - eac,
+    }, index=df.index)
+
+def valor_agregado(df):
+    """calcular_valor_agregado memorizado por versão dos dados."""
+    return memorizar(df, "valor_agregado", lambda: calcular_valor_agregado(df))
+
+def somas_valor_agregado(df_va, df_horas=None, mascara=None):
+    """Somas de BAC/AC/EV/EAC (e horas ganhas/gastas) nas linhas da máscara; somáveis entre partes da base."""
+    onde = True if mascara is None else mascara
+    def soma(df, col): return float(np.add.reduce(df[col].to_numpy(dtype=float), where=onde))
+    somas = {c: soma(df_va, c) for c in ('BAC', 'AC', 'EV', 'EAC')}
+    if df_horas is not None:
+        avanco = np.clip(df_horas['Conclusao_%'].to_numpy(dtype=float), 0, 100) / 100
+        somas["HH_Ganhas"] = float(np.add.reduce(df_horas['HH_Orc_Qtd'].to_numpy(dtype=float) * avanco, where=onde))
+        somas["HH_Gastas"] = soma(df_horas, 'HH_Real_Qtd')
+    return somas
+
+def resumo_de_somas(somas):
+    bac, ac, ev, eac = somas["BAC"], somas["AC"], somas["EV"], somas["EAC"]
+    resumo = {"BAC": bac, "AC": ac, "EV": ev, "EAC": eac, "VAC": bac - eac,
+              "CPI": (ev / ac) if ac > 0 else 1.0, "IP_HH": 1.0}
+    if "HH_Gastas" in somas:
+        resumo["IP_HH"] = (somas["HH_Ganhas"] / somas["HH_Gastas"]) if somas["HH_Gastas"] > 0 else 1.0
+    return resumo